@@ -6,22 +6,26 @@ from gym import spaces
 from gym.spaces import space
 from typing import Union
 from stable_baselines3.common.env_checker import check_env
-import yaml
 from rl_agent.utils.observation_collector import ObservationCollector
 from rl_agent.utils.reward import RewardCalculator
+from rl_agent.utils.robot_spec import load_robot_spec
 from rl_agent.utils.debug import timeit
+from rl_agent.utils.noise import sample_noise_setting
+from rl_agent.utils.step_profiler import StepProfiler
+from rl_agent.utils.rate_limited_logging import PeriodicSummary, get_logger
 from task_generator.tasks import ABSTask
 import numpy as np
 import rospy
 from geometry_msgs.msg import Twist
 from flatland_msgs.srv import StepWorld, StepWorldRequest
+import asyncio
 import time
 
 
 class FlatlandEnv(gym.Env):
     """Custom Environment that follows gym interface"""
 
-    def __init__(self, task: ABSTask, robot_yaml_path: str, settings_yaml_path: str, reward_fnc: str, is_action_space_discrete, safe_dist: float = None, goal_radius: float = 0.1, max_steps_per_episode=100):
+    def __init__(self, task: ABSTask, robot_yaml_path: str, settings_yaml_path: str, reward_fnc: str, is_action_space_discrete, safe_dist: float = None, goal_radius: float = 0.1, max_steps_per_episode=100, ns: str = "", num_stacked_scans: int = 1, noise_model=[0], noise_level: float = 1, scan_delay: int = 0, curriculum_noise: bool = True, profile_steps: bool = False):
         """Default env
         Flatland yaml node check the entries in the yaml file, therefore other robot related parameters cound only be saved in an other file.
         TODO : write an uniform yaml paser node to handel with multiple yaml files.
@@ -36,16 +40,29 @@ class FlatlandEnv(gym.Env):
             is_action_space_discrete (bool): [description]
             safe_dist (float, optional): [description]. Defaults to None.
             goal_radius (float, optional): [description]. Defaults to 0.1.
+            ns (str, optional): namespace of the simulation this env is connected to, e.g. "sim_1". Defaults to "".
+            num_stacked_scans (int, optional): number of consecutive laser scans in the observation. Defaults to 1.
+            noise_model (list, optional): noise modes added to the laser scan, see rl_agent/utils/noise.py. Defaults to [0] (no noise).
+            noise_level (float, optional): scales the gaussian noise. Defaults to 1.
+            scan_delay (int, optional): number of steps the observed laser scan lags behind. Defaults to 0.
+            curriculum_noise (bool, optional): noise model, level and scan delay are sampled at every reset from the
+                ranges of the task (the current stage of the training curriculum), if the task defines them. Tasks and stages
+                without ranges keep noise_model, noise_level and scan_delay. Defaults to True.
+            profile_steps (bool, optional): records the durations of the phases of step() and reset(), see pop_step_profile(). Defaults to False.
         """
         super(FlatlandEnv, self).__init__()
+        self.ns = ns
+        self.ns_prefix = "" if ns == "" else "/" + ns + "/"
         # Define action and observation space
         # They must be gym.spaces objects
 
         self._is_action_space_discrete = is_action_space_discrete
         self.setup_by_configuration(robot_yaml_path, settings_yaml_path)
+        self.profiler = StepProfiler(enabled=profile_steps)
         # observation collector
         self.observation_collector = ObservationCollector(
-            self._laser_num_beams, self._laser_max_range)
+            self._laser_num_beams, self._laser_max_range, noise_model=noise_model, ns=ns, num_stacked_scans=num_stacked_scans,
+            noise_level=noise_level, scan_delay=scan_delay, profiler=self.profiler)
         self.observation_space = self.observation_collector.get_observation_space()
 
         # reward calculator
@@ -56,16 +73,23 @@ class FlatlandEnv(gym.Env):
             robot_radius=self._robot_radius, safe_dist=1.1*self._robot_radius, goal_radius=goal_radius, rule=reward_fnc)
 
         # action agent publisher
-        self.agent_action_pub = rospy.Publisher('cmd_vel', Twist, queue_size=1)
+        self.agent_action_pub = rospy.Publisher(f'{self.ns_prefix}cmd_vel', Twist, queue_size=1)
         # service clients
         self._is_train_mode = rospy.get_param("train_mode")
         if self._is_train_mode:
-            self._service_name_step = '/step_world'
+            self._service_name_step = f'{self.ns_prefix}step_world'
             self._sim_step_client = rospy.ServiceProxy(
             self._service_name_step, StepWorld)
         self.task = task
         self._steps_curr_episode = 0
         self._max_steps_per_episode = max_steps_per_episode
+        self._curriculum_noise = curriculum_noise
+        self._default_noise = (noise_model, noise_level, scan_delay)
+        self._noise_sampled = False
+        # the rewards are logged as periodic summary instead of once per step
+        self._reward_summary = PeriodicSummary(get_logger("flatland_env"), "rewards", ns=ns or "/")
+        # observation requested by step_async() and not yet fetched by step_wait()
+        self._obs_future = None
         # # get observation
         # obs=self.observation_collector.get_observations()
 
@@ -75,47 +99,28 @@ class FlatlandEnv(gym.Env):
         Args:
             robot_yaml_path (str): [description]
         """
-        with open(robot_yaml_path, 'r') as fd:
-            robot_data = yaml.safe_load(fd)
-            # get robot radius
-            for body in robot_data['bodies']:
-                if body['name'] == "base_footprint":
-                    for footprint in body['footprints']:
-                        if footprint['type'] == 'circle':
-                            self._robot_radius = footprint.setdefault(
-                                'radius', 0.3)*1.04
-                        if footprint['radius']:
-                            self._robot_radius = footprint['radius']*1.04
-            # get laser related information
-            for plugin in robot_data['plugins']:
-                if plugin['type'] == 'Laser':
-                    laser_angle_min = plugin['angle']['min']
-                    laser_angle_max = plugin['angle']['max']
-                    laser_angle_increment = plugin['angle']['increment']
-                    self._laser_num_beams = int(
-                        round((laser_angle_max-laser_angle_min)/laser_angle_increment)+1)
-                    self._laser_max_range = plugin['range']
-
-        with open(settings_yaml_path, 'r') as fd:
-            setting_data = yaml.safe_load(fd)
-            if self._is_action_space_discrete:
-                # self._discrete_actions is a list, each element is a dict with the keys ["name", 'linear','angular']
-                self._discrete_acitons = setting_data['robot']['discrete_actions']
-                self.action_space = spaces.Discrete(
-                    len(self._discrete_acitons))
-            else:
-                linear_range = setting_data['robot']['continuous_actions']['linear_range']
-                angular_range = setting_data['robot']['continuous_actions']['angular_range']
-                self.action_space = spaces.Box(low=np.array([linear_range[0], angular_range[0]]),
-                                               high=np.array(
-                                                   [linear_range[1], angular_range[1]]),
-                                               dtype=np.float)
+        spec = load_robot_spec(robot_yaml_path, settings_yaml_path)
+        self._robot_radius = spec.radius*1.04
+        self._laser_num_beams = spec.laser_num_beams
+        self._laser_max_range = spec.laser_max_range
+        if self._is_action_space_discrete:
+            # self._discrete_actions is a tuple of DiscreteAction(name, linear, angular)
+            self._discrete_acitons = spec.discrete_actions
+            self.action_space = spaces.Discrete(
+                len(self._discrete_acitons))
+        else:
+            linear_range = spec.linear_range
+            angular_range = spec.angular_range
+            self.action_space = spaces.Box(low=np.array([linear_range[0], angular_range[0]]),
+                                           high=np.array(
+                                               [linear_range[1], angular_range[1]]),
+                                           dtype=np.float)
 
     def _pub_action(self, action):
         action_msg = Twist()
         if self._is_action_space_discrete:
-            action_msg.linear.x = self._discrete_acitons[action]['linear']
-            action_msg.angular.z = self._discrete_acitons[action]['angular']
+            action_msg.linear.x = self._discrete_acitons[action].linear
+            action_msg.angular.z = self._discrete_acitons[action].angular
         else:
             action_msg.linear.x = action[0]
             action_msg.angular.z = action[1]
@@ -127,20 +132,51 @@ class FlatlandEnv(gym.Env):
                         1   -   collision with obstacle
                         2   -   goal reached
         """
-        self._pub_action(action)
+        with self.profiler.phase("action_publish"):
+            self._pub_action(action)
         self._steps_curr_episode += 1
         # wait for new observations
-        s = time.time()
         merged_obs, obs_dict = self.observation_collector.get_observations()
-        # print("get observation: {}".format(time.time()-s))
+        return self._process_observations(merged_obs, obs_dict)
+
+    def step_async(self, action):
+        """ publishes the action and starts stepping the simulation for the next observation in a background thread.
+        The result has to be fetched with step_wait(), in between the caller is free to do its own bookkeeping.
+        """
+        with self.profiler.phase("action_publish"):
+            self._pub_action(action)
+        self._steps_curr_episode += 1
+        self._obs_future = self.observation_collector.get_observations_async()
+
+    def step_wait(self):
+        """ waits for the observation requested by step_async() and returns the same as step() """
+        merged_obs, obs_dict = self._obs_future.result()
+        self._obs_future = None
+        return self._process_observations(merged_obs, obs_dict)
 
+    async def astep(self, action):
+        """ asyncio version of step(). The event loop stays free while the simulation is stepped,
+        so several envs can be driven concurrently by one evaluation script.
+        """
+        self.step_async(action)
+        merged_obs, obs_dict = await asyncio.wrap_future(self._obs_future)
+        self._obs_future = None
+        return self._process_observations(merged_obs, obs_dict)
+
+    async def areset(self):
+        """ asyncio version of reset() """
+        return await asyncio.get_event_loop().run_in_executor(None, self.reset)
+
+    def _process_observations(self, merged_obs, obs_dict):
+        """ calculates reward and done state of the current step """
         # calculate reward
-        reward, reward_info = self.reward_calculator.get_reward(
-            obs_dict['laser_scan'], obs_dict['goal_in_robot_frame'])
+        with self.profiler.phase("reward"):
+            reward, reward_info = self.reward_calculator.get_reward(
+                obs_dict['laser_scan'], obs_dict['goal_in_robot_frame'], min_dist=obs_dict['laser_min'])
         done = reward_info['is_done']
 
-        print("reward:  {}".format(reward))
-        
+        self._reward_summary.add(reward=reward)
+
         # info
         info = {}
         if done:
@@ -159,14 +195,41 @@ class FlatlandEnv(gym.Env):
         self.agent_action_pub.publish(Twist())
         if self._is_train_mode:
             self._sim_step_client()
-        self.task.reset()
+        with self.profiler.phase("task_reset"):
+            self.task.reset()
+        if self._curriculum_noise:
+            self._sample_noise()
         self.reward_calculator.reset()
+        self.observation_collector.reset()
         self._steps_curr_episode = 0
         obs, _ = self.observation_collector.get_observations()
         return obs  # reward, done, info can't be included
 
+    def _sample_noise(self):
+        # the ranges are held in memory by the task and follow its stage, nothing is read from disk here
+        noise_config = self.task.get_noise_config()
+        if noise_config is not None:
+            self._set_noise(*sample_noise_setting(noise_config))
+            self._noise_sampled = True
+        elif self._noise_sampled:
+            # the new stage has no noise ranges, back to the noise the env was created with
+            self._set_noise(*self._default_noise)
+            self._noise_sampled = False
+
+    def _set_noise(self, noise_model, noise_level: float, scan_delay: int):
+        self.observation_collector.set_noise_model(noise_model)
+        self.observation_collector.set_noise_level(noise_level)
+        self.observation_collector.set_scan_delay(scan_delay)
+
+    def pop_step_profile(self) -> dict:
+        """ samples of the phases recorded since the last call, {phase: np.ndarray} with durations in seconds and the
+        number of simulation steps per observation ("sim_step_iterations"). Empty unless the env was created with
+        profile_steps=True. Can be called through the vec env with env_method().
+        """
+        return self.profiler.pop()
+
     def close(self):
-        pass
+        self.observation_collector.close()
 
 
 if __name__ == '__main__':
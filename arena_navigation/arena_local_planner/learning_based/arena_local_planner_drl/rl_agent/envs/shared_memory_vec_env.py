@@ -0,0 +1,174 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional
+
+import gym
+import numpy as np
+from stable_baselines3.common.vec_env import SubprocVecEnv, VecEnv
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+# every step alternates between two slots of the shared block, see SharedMemoryVecEnv
+_NUM_BUFFERS = 2
+
+
+def _is_wrapped(env: gym.Env, wrapper_class) -> bool:
+    while isinstance(env, gym.Wrapper):
+        if isinstance(env, wrapper_class):
+            return True
+        env = env.env
+    return False
+
+
+def _shared_arrays(shm: shared_memory.SharedMemory, n_envs: int, obs_shape: tuple, obs_dtype: np.dtype):
+    """ numpy views (obs, rewards, dones) on the shared block, each of shape (_NUM_BUFFERS, n_envs, ...) """
+    obs = np.ndarray((_NUM_BUFFERS, n_envs) + tuple(obs_shape), dtype=obs_dtype, buffer=shm.buf)
+    offset = obs.nbytes
+    rewards = np.ndarray((_NUM_BUFFERS, n_envs), dtype=np.float32, buffer=shm.buf, offset=offset)
+    offset += rewards.nbytes
+    dones = np.ndarray((_NUM_BUFFERS, n_envs), dtype=np.bool_, buffer=shm.buf, offset=offset)
+    return obs, rewards, dones
+
+
+def _shared_memory_size(n_envs: int, obs_shape: tuple, obs_dtype: np.dtype) -> int:
+    n_obs = _NUM_BUFFERS * n_envs * int(np.prod(obs_shape))
+    return n_obs * np.dtype(obs_dtype).itemsize + _NUM_BUFFERS * n_envs * (np.dtype(np.float32).itemsize + 1)
+
+
+def _worker(remote, parent_remote, env_fn_wrapper: CloudpickleWrapper, env_idx: int) -> None:
+    parent_remote.close()
+    env = env_fn_wrapper.var()
+    shm = None
+    obs_buf = rew_buf = done_buf = None
+    while True:
+        try:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                action, buf_idx = data
+                observation, reward, done, info = env.step(action)
+                if done:
+                    # save final observation where user can get it, then reset
+                    info["terminal_observation"] = observation
+                    observation = env.reset()
+                obs_buf[buf_idx, env_idx] = observation
+                rew_buf[buf_idx, env_idx] = reward
+                done_buf[buf_idx, env_idx] = done
+                # only the info dict has to be sent through the pipe
+                remote.send(info)
+            elif cmd == "reset":
+                obs_buf[data, env_idx] = env.reset()
+                remote.send(None)
+            elif cmd == "attach":
+                shm_name, n_envs, obs_shape, obs_dtype = data
+                shm = shared_memory.SharedMemory(name=shm_name)
+                obs_buf, rew_buf, done_buf = _shared_arrays(shm, n_envs, obs_shape, obs_dtype)
+                remote.send(None)
+            elif cmd == "seed":
+                remote.send(env.seed(data))
+            elif cmd == "render":
+                remote.send(env.render(data))
+            elif cmd == "close":
+                env.close()
+                # the views have to be released before the block can be closed
+                obs_buf = rew_buf = done_buf = None
+                if shm is not None:
+                    shm.close()
+                remote.close()
+                break
+            elif cmd == "get_spaces":
+                remote.send((env.observation_space, env.action_space))
+            elif cmd == "env_method":
+                method = getattr(env, data[0])
+                remote.send(method(*data[1], **data[2]))
+            elif cmd == "get_attr":
+                remote.send(getattr(env, data))
+            elif cmd == "set_attr":
+                remote.send(setattr(env, data[0], data[1]))
+            elif cmd == "is_wrapped":
+                remote.send(_is_wrapped(env, data))
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+        except EOFError:
+            break
+
+
+class SharedMemoryVecEnv(SubprocVecEnv):
+    """
+    Multiprocess vectorized env like SubprocVecEnv, but the observations, rewards and dones are not pickled
+    through the pipes. All workers write into their slot of one preallocated shared memory block and the learner
+    reads them without copying. Per step only the action and the (small) info dict are sent through the pipes.
+
+    The block holds two slots per env which are used alternately. The arrays returned by step() and reset()
+    are views on the shared block and stay valid until the next but one call of step()/reset(), which is exactly
+    what the on-policy algorithms of stable baselines need (the previous observation is stored after stepping).
+    Copy them if they have to be kept longer.
+
+    :param env_fns: Environments to run in subprocesses
+    :param start_method: method used to start the subprocesses, see SubprocVecEnv.
+        Defaults to 'forkserver' on available platforms, and 'spawn' otherwise.
+    """
+
+    def __init__(self, env_fns: List[Callable[[], gym.Env]], start_method: Optional[str] = None):
+        self.waiting = False
+        self.closed = False
+        n_envs = len(env_fns)
+
+        if start_method is None:
+            forkserver_available = "forkserver" in mp.get_all_start_methods()
+            start_method = "forkserver" if forkserver_available else "spawn"
+        ctx = mp.get_context(start_method)
+
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(n_envs)])
+        self.processes = []
+        for env_idx, (work_remote, remote, env_fn) in enumerate(zip(self.work_remotes, self.remotes, env_fns)):
+            args = (work_remote, remote, CloudpickleWrapper(env_fn), env_idx)
+            # daemon=True: if the main process crashes, we should not cause things to hang
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        self.remotes[0].send(("get_spaces", None))
+        observation_space, action_space = self.remotes[0].recv()
+        assert isinstance(observation_space, gym.spaces.Box), "SharedMemoryVecEnv only supports Box observation spaces"
+        VecEnv.__init__(self, n_envs, observation_space, action_space)
+
+        obs_shape, obs_dtype = observation_space.shape, observation_space.dtype
+        self._shm = shared_memory.SharedMemory(create=True, size=_shared_memory_size(n_envs, obs_shape, obs_dtype))
+        self._obs, self._rewards, self._dones = _shared_arrays(self._shm, n_envs, obs_shape, obs_dtype)
+        self._buf_idx = 0
+        for remote in self.remotes:
+            remote.send(("attach", (self._shm.name, n_envs, obs_shape, obs_dtype)))
+        for remote in self.remotes:
+            remote.recv()
+
+    def _next_buffer(self) -> int:
+        self._buf_idx = (self._buf_idx + 1) % _NUM_BUFFERS
+        return self._buf_idx
+
+    def step_async(self, actions: np.ndarray) -> None:
+        buf_idx = self._next_buffer()
+        for remote, action in zip(self.remotes, actions):
+            remote.send(("step", (action, buf_idx)))
+        self.waiting = True
+
+    def step_wait(self):
+        infos = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        buf_idx = self._buf_idx
+        return self._obs[buf_idx], self._rewards[buf_idx], self._dones[buf_idx], infos
+
+    def reset(self):
+        buf_idx = self._next_buffer()
+        for remote in self.remotes:
+            remote.send(("reset", buf_idx))
+        for remote in self.remotes:
+            remote.recv()
+        return self._obs[buf_idx]
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        super(SharedMemoryVecEnv, self).close()
+        self._obs = self._rewards = self._dones = None
+        self._shm.close()
+        self._shm.unlink()
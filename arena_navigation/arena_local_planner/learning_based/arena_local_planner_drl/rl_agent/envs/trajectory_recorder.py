@@ -0,0 +1,171 @@
+import json
+import os
+from typing import Dict, Iterator, Tuple
+
+import gym
+import numpy as np
+
+INDEX_FILE = "index.json"
+# field name -> dtype, every field is stored as one .npy file per chunk
+FIELDS = {
+    "obs": np.float32,
+    "actions": np.float32,
+    "rewards": np.float32,
+    "dones": np.bool_,
+    "episodes": np.int64,
+}
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    def __init__(self, env: gym.Env, directory: str, chunk_size: int = 10000):
+        """ records the transitions (obs, action, reward, done, episode) of the wrapped env to disk.
+        The transitions are written to preallocated memory mapped .npy files of chunk_size rows, so recording
+        costs a copy per step and the operating system writes the pages in the background. The number of valid
+        rows per chunk is kept in index.json, which is updated at the end of every episode and when a chunk is full.
+        An existing recording in the directory is continued. Use TrajectoryStore to read the recording.
+
+        Only step() and reset() are recorded, one recorder (and directory) per env.
+
+        Args:
+            env (gym.Env): env to record, e.g. FlatlandEnv
+            directory (str): directory the chunks are written to
+            chunk_size (int, optional): number of transitions per chunk. Defaults to 10000.
+        """
+        super(TrajectoryRecorder, self).__init__(env)
+        self._directory = directory
+        self._chunk_size = chunk_size
+        self._obs_dim = int(np.prod(env.observation_space.shape))
+        self._is_discrete = isinstance(env.action_space, gym.spaces.Discrete)
+        self._action_dim = 1 if self._is_discrete else int(np.prod(env.action_space.shape))
+        os.makedirs(directory, exist_ok=True)
+
+        self._index = _read_index(directory)
+        if self._index is None:
+            self._index = {"observation_dim": self._obs_dim, "action_dim": self._action_dim,
+                           "discrete_action_space": self._is_discrete, "chunks": []}
+        elif self._index["observation_dim"] != self._obs_dim or self._index["action_dim"] != self._action_dim:
+            raise ValueError("The recording in '%s' was made with another observation or action space" % directory)
+        # episode index of the next recorded transition
+        self._episode = 0
+        for chunk in self._index["chunks"]:
+            if chunk["length"] > 0:
+                episodes = np.load(os.path.join(directory, chunk["name"] + "_episodes.npy"), mmap_mode="r")
+                self._episode = int(episodes[chunk["length"] - 1]) + 1
+        self._arrays = None
+        self._row = 0
+        self._last_obs = None
+        self._episode_length = 0
+
+    def _open_chunk(self):
+        name = "chunk_%05d" % len(self._index["chunks"])
+        shapes = {"obs": (self._chunk_size, self._obs_dim), "actions": (self._chunk_size, self._action_dim)}
+        self._arrays = {
+            field: np.lib.format.open_memmap(os.path.join(self._directory, "%s_%s.npy" % (name, field)), mode="w+",
+                                             dtype=dtype, shape=shapes.get(field, (self._chunk_size,)))
+            for field, dtype in FIELDS.items()}
+        self._index["chunks"].append({"name": name, "length": 0})
+        self._row = 0
+
+    def _close_chunk(self):
+        self._index["chunks"][-1]["length"] = self._row
+        for array in self._arrays.values():
+            array.flush()
+        self._arrays = None
+        self._write_index()
+
+    def _write_index(self):
+        if self._arrays is not None:
+            self._index["chunks"][-1]["length"] = self._row
+        _write_index(self._directory, self._index)
+
+    def _record(self, obs, action, reward, done):
+        if self._arrays is None:
+            self._open_chunk()
+        row = self._row
+        self._arrays["obs"][row] = np.reshape(obs, -1)
+        self._arrays["actions"][row] = np.reshape(action, -1)
+        self._arrays["rewards"][row] = reward
+        self._arrays["dones"][row] = done
+        self._arrays["episodes"][row] = self._episode
+        self._row += 1
+        self._episode_length += 1
+        if self._row == self._chunk_size:
+            self._close_chunk()
+
+    def _end_episode(self):
+        if self._episode_length > 0:
+            self._episode += 1
+            self._episode_length = 0
+            self._write_index()
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        if self._last_obs is not None:
+            # the transition starts at the observation the action was chosen on
+            self._record(self._last_obs, action, reward, done)
+        self._last_obs = obs
+        if done:
+            self._end_episode()
+        return obs, reward, done, info
+
+    def reset(self, **kwargs):
+        # an episode aborted by reset() counts as finished
+        self._end_episode()
+        self._last_obs = self.env.reset(**kwargs)
+        return self._last_obs
+
+    def close(self):
+        if self._arrays is not None:
+            self._close_chunk()
+        return self.env.close()
+
+
+class TrajectoryStore:
+    def __init__(self, directory: str):
+        """ read access to the transitions written by TrajectoryRecorder
+
+        Args:
+            directory (str): directory of the recording
+        """
+        self._directory = directory
+        self._index = _read_index(directory)
+        if self._index is None:
+            raise FileNotFoundError("No recorded trajectories (%s) found in '%s'" % (INDEX_FILE, directory))
+        self.observation_dim = self._index["observation_dim"]
+        self.action_dim = self._index["action_dim"]
+        self.is_action_space_discrete = self._index["discrete_action_space"]
+
+    def __len__(self) -> int:
+        return sum(chunk["length"] for chunk in self._index["chunks"])
+
+    def chunks(self) -> Iterator[Dict[str, np.ndarray]]:
+        """ yields the chunks as {field: read only memory mapped array}, nothing is loaded before it is accessed """
+        for chunk in self._index["chunks"]:
+            if chunk["length"] > 0:
+                yield {field: np.load(os.path.join(self._directory, "%s_%s.npy" % (chunk["name"], field)),
+                                      mmap_mode="r")[:chunk["length"]] for field in FIELDS}
+
+    def load(self, *fields: str) -> Tuple[np.ndarray, ...]:
+        """ concatenates the given fields (default: all) of all chunks in memory, e.g. obs, actions = store.load("obs", "actions") """
+        fields = fields or tuple(FIELDS)
+        chunks = list(self.chunks())
+        if not chunks:
+            shapes = {"obs": (0, self.observation_dim), "actions": (0, self.action_dim)}
+            return tuple(np.zeros(shapes.get(field, (0,)), dtype=FIELDS[field]) for field in fields)
+        return tuple(np.concatenate([chunk[field] for chunk in chunks]) for field in fields)
+
+
+def _read_index(directory: str):
+    path = os.path.join(directory, INDEX_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def _write_index(directory: str, index: dict):
+    # written to a temporary file first, a reader never sees a half written index
+    path = os.path.join(directory, INDEX_FILE)
+    with open(path + ".tmp", "w") as file:
+        json.dump(index, file, indent=4)
+    os.replace(path + ".tmp", path)
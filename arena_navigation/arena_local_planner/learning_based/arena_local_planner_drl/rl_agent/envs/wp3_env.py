@@ -6,9 +6,9 @@ from gym import spaces
 from gym.spaces import space
 from typing import Union
 from stable_baselines3.common.env_checker import check_env
-import yaml
 from rl_agent.utils.observation_collector import ObservationCollector
 from rl_agent.utils.reward import RewardCalculator
+from rl_agent.utils.robot_spec import load_robot_spec
 from rl_agent.utils.debug import timeit
 from task_generator.tasks import ABSTask
 import numpy as np
@@ -107,38 +107,19 @@ class wp3Env(gym.Env):
         Args:
             robot_yaml_path (str): [description]
         """
-        with open(robot_yaml_path, 'r') as fd:
-            robot_data = yaml.safe_load(fd)
-            # get robot radius
-            for body in robot_data['bodies']:
-                if body['name'] == "base_footprint":
-                    for footprint in body['footprints']:
-                        if footprint['type'] == 'circle':
-                            self._robot_radius = footprint.setdefault(
-                                'radius', 0.3)*1.04
-                        if footprint['radius']:
-                            self._robot_radius = footprint['radius']*1.04
-            # get laser related information
-            for plugin in robot_data['plugins']:
-                if plugin['type'] == 'Laser':
-                    laser_angle_min = plugin['angle']['min']
-                    laser_angle_max = plugin['angle']['max']
-                    laser_angle_increment = plugin['angle']['increment']
-                    self._laser_num_beams = int(
-                        round((laser_angle_max-laser_angle_min)/laser_angle_increment)+1)
-                    self._laser_max_range = plugin['range']
-
-        with open(settings_yaml_path, 'r') as fd:
-            setting_data = yaml.safe_load(fd)
-            if self._is_action_space_discrete:
-                # self._discrete_actions is a list, each element is a dict with the keys ["name", 'linear','angular']
-                self._discrete_acitons = setting_data['robot']['discrete_actions']
-                self.action_space = spaces.Discrete(
-                    len(self._discrete_acitons))
-            else:
-                angular_range = setting_data['robot']['continuous_actions']['angular_range']
-                self.action_space = spaces.Box(low=np.array([angular_range[0]]),
-                                               high=np.array([angular_range[1]]), dtype=np.float)
+        spec = load_robot_spec(robot_yaml_path, settings_yaml_path)
+        self._robot_radius = spec.radius*1.04
+        self._laser_num_beams = spec.laser_num_beams
+        self._laser_max_range = spec.laser_max_range
+        if self._is_action_space_discrete:
+            # self._discrete_actions is a tuple of DiscreteAction(name, linear, angular)
+            self._discrete_acitons = spec.discrete_actions
+            self.action_space = spaces.Discrete(
+                len(self._discrete_acitons))
+        else:
+            angular_range = spec.angular_range
+            self.action_space = spaces.Box(low=np.array([angular_range[0]]),
+                                           high=np.array([angular_range[1]]), dtype=np.float)
 
     def _pub_action(self, action):
 
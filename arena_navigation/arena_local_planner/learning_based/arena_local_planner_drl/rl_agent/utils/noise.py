@@ -10,6 +10,11 @@ import numpy as np
 import csv
 import random
 
+from rl_agent.utils.rate_limited_logging import RateLimitedLog, get_logger
+
+# the noise is added at every step, the messages are only printed once per minute (at level DEBUG)
+_log = RateLimitedLog(get_logger("noise"), interval=60.0)
+
 class Noise:
     """
     This class adds noise to the received sensor data.
@@ -22,7 +27,8 @@ class Noise:
                  gauss_size = 0.015,  #0.015  
                  bias_noise = 0.1,   #0.1
                  offset_noise = 0.01, #0.01
-                 angle_noise = 0.122): #0.122
+                 angle_noise = 0.122, #0.122
+                 noise_level = 1):
         # Class variables
         self._noise_mode = noise_mode                      # Mode of noise
         self._max_value_of_data = max_value_of_data        # usually dont need to change,it will update itself. max value of the sensor data,prepare for standaraization.
@@ -32,9 +38,49 @@ class Noise:
         self._bias_noise = bias_noise
         self._offset_noise = offset_noise
         self._angle_noise = angle_noise
+        self._noise_level = noise_level                    # scales the gaussian noise, 0 means no gaussian noise
         
         self._noise_count = -1
+        self._batch_distance = None                        # state of the offset noise random walk of add_noise_batch()
         
+    def set_noise_level(self, noise_level):
+        self._noise_level = noise_level
+
+    def set_noise_mode(self, noise_mode):
+        self._noise_mode = noise_mode
+
+    def add_noise_batch(self, scans, max_value, rng=None):
+        '''
+        Vectorized version of add_noise() for recorded scans, e.g. to evaluate a policy offline.
+        input :
+            scans : array of shape [batch, ..., num_beams], the rows are treated as consecutive steps,
+                    the random walk of the offset noise continues over them (and over further calls)
+            max_value : maximum range of the laser scanner
+            rng : np.random.Generator, defaults to a new unseeded one
+        return:
+            noisy_scans : float32 array with the same shape as scans
+        '''
+        rng = np.random.default_rng() if rng is None else rng
+        scans = np.asarray(scans, dtype=np.float32)
+        noisy_scans = scans
+        # same order and clipping as add_noise()
+        if 1 in self._noise_mode:
+            noise = rng.normal(self._gauss_mean, self._gauss_sigma, scans.shape) * self._gauss_size * self._noise_level
+            noisy_scans = np.clip(noisy_scans + noise, 0, max_value)
+        if 2 in self._noise_mode:
+            noisy_scans = np.clip(noisy_scans + self._bias_noise, 0, max_value)
+        if 3 in self._noise_mode:
+            steps = np.where(rng.integers(0, 2, scans.shape), self._offset_noise, -self._offset_noise)
+            distance = np.cumsum(steps, axis=0)
+            if self._batch_distance is not None:
+                distance += self._batch_distance
+            self._batch_distance = distance[-1]
+            noisy_scans = np.clip(noisy_scans + distance, 0, max_value)
+        if 4 in self._noise_mode:
+            noise = rng.standard_normal(scans.shape) * noisy_scans * self._angle_noise * 0.01
+            noisy_scans = np.clip(noisy_scans + noise, 0, max_value)
+        return noisy_scans.astype(np.float32)
+
     def add_noise(self,scan_msg):
         #caculate the size sf msg,and create file to save data
         if self._noise_count == -1:
@@ -48,15 +94,15 @@ class Noise:
         if 2 in self._noise_mode:
             scan_noise_msg = self.__bias_noise(scan_msg_data)
             scan_msg_data = scan_noise_msg
-            print("bias noise has been added")
+            _log.debug("bias noise has been added", bias=self._bias_noise)
         if 3 in self._noise_mode:
             scan_noise_msg = self.__offset_noise(scan_msg_data)
             scan_msg_data = scan_noise_msg
-            print("offset noise has been added")
+            _log.debug("offset noise has been added", offset=self._offset_noise)
         if 4 in self._noise_mode:
             scan_noise_msg = self.__angle_noise(scan_msg_data)
             scan_msg_data = scan_noise_msg
-            print("angle noise has been added")
+            _log.debug("angle noise has been added", angle=self._angle_noise)
             
         #self.__save_data_for_plot(scan_msg.ranges,scan_noise_msg)
         return scan_noise_msg
@@ -70,11 +116,9 @@ class Noise:
         return:
             gaussian_out : Gaussian noise data 
         '''
-        self.__change_noise()
         # Generate Gaussian noise
         noise = np.random.normal(self._gauss_mean, self._gauss_sigma, scan_msg.shape)
-        noise = noise * self._gauss_size * self._noise_change
-        print(self._noise_change)
+        noise = noise * self._gauss_size * self._noise_level
         gaussian_out = scan_msg + noise
         # Set more than 1 to 1, and less than 0 to 0
         gaussian_out = np.clip(gaussian_out, 0,  self._max_value_of_data)
@@ -121,13 +165,9 @@ class Noise:
         return:
             bias_out : angle noise data
         '''
-        # standardization
-        angle_noise = [0] * len(scan_msg)
-        # Generate angle noise
-        for i in range(len(scan_msg)):
-            noise = np.random.normal(0, 1) *scan_msg[i] * self._angle_noise*0.01
-            angle_noise[i] = scan_msg[i] + noise 
-            angle_noise[i] = np.clip(angle_noise[i], 0, self._max_value_of_data)
+        # Generate angle noise, proportional to the range of every beam
+        noise = np.random.normal(0, 1, scan_msg.shape) * scan_msg * self._angle_noise*0.01
+        angle_noise = np.clip(scan_msg + noise, 0, self._max_value_of_data)
         return angle_noise
 
     def __save_data_for_plot(self,scan_msg,scan_noise_msg):
@@ -172,9 +212,22 @@ class Noise:
             Original_data.close()
         with open(self._Noise_data_address,'w') as Noise_data:
             Noise_data.close()  
-            
-    def __change_noise(self):
-        with open("noise_parameter",'r') as noise_data:
-            self._noise_change = int(noise_data.read())
-            noise_data.close()
 
+
+def sample_noise_setting(noise_config: dict, rng=np.random):
+    '''
+    Samples the noise of one episode from the ranges of a training curriculum stage.
+    input :
+        noise_config : {'modes': [0, 1, 3], 'level': [0.5, 4], 'delay': [0, 2]}, one mode is drawn from
+                       'modes' (0 - no noise), the gaussian noise level and the scan delay (in steps) are drawn
+                       uniformly from their [low, high] range or are fixed if a single number is given.
+                       Missing entries mean no noise, level 1 and no delay.
+        rng : np.random or a np.random.RandomState
+    return:
+        noise_model, noise_level, scan_delay
+    '''
+    modes = noise_config.get('modes', [0])
+    level_low, level_high = np.broadcast_to(noise_config.get('level', 1), (2,))
+    delay_low, delay_high = np.broadcast_to(noise_config.get('delay', 0), (2,))
+    noise_model = [int(modes[rng.randint(len(modes))])]
+    return noise_model, float(rng.uniform(level_low, level_high)), int(rng.randint(delay_low, delay_high + 1))
@@ -7,6 +7,7 @@ import random
 import numpy as np
 
 import time # for debuging
+from concurrent.futures import ThreadPoolExecutor
 
 # observation msgs
 from sensor_msgs.msg import LaserScan
@@ -29,19 +30,38 @@ import numpy as np
 
 #helper python
 from rl_agent.utils.noise import Noise
+from rl_agent.utils.scan_history import ScanDelay, ScanHistory
+from rl_agent.utils.step_profiler import StepProfiler
 
 
 class ObservationCollector():
-    def __init__(self,num_lidar_beams:int,lidar_range:float,noise_model = [0]):
+    def __init__(self,num_lidar_beams:int,lidar_range:float,noise_model = [0],ns:str = "",num_stacked_scans:int = 1,num_scan_sectors:int = 8,noise_level:float = 1,scan_delay:int = 0,profiler:StepProfiler = None):
         """ a class to collect and merge observations
 
         Args:
             num_lidar_beams (int): [description]
             lidar_range (float): [description]
+            ns (str): namespace of the simulation the topics and services belong to, e.g. "sim_1"
+            num_stacked_scans (int): number of consecutive scans (oldest first) in the observation
+            num_scan_sectors (int): number of equally sized sectors the scan is divided into, the minimum range of
+                every sector is provided in the obs_dict. 0 disables the sector minima.
+            noise_level (float): scales the gaussian noise of the noise model
+            scan_delay (int): number of steps the scan in the observation lags behind the simulation
+            profiler (StepProfiler): records the phases "sync_wait" (stepping the simulation until synchronized
+                observations arrived, in total), "sim_step" (a single step_world call), "sim_step_iterations" and "noise"
         """
+        self.ns = ns
+        self.ns_prefix = "" if ns == "" else "/"+ns+"/"
+        self._profiler = profiler if profiler is not None else StepProfiler(enabled=False)
+        self._num_stacked_scans = num_stacked_scans
+        if num_stacked_scans > 1:
+            self._scan_history = ScanHistory(num_stacked_scans, num_lidar_beams)
+        # first beam of every sector, see _get_scan_features()
+        self._sector_starts = np.linspace(
+            0, num_lidar_beams, min(num_scan_sectors, num_lidar_beams), endpoint=False).astype(np.intp)
         # define observation_space
         self.observation_space = ObservationCollector._stack_spaces((
-            spaces.Box(low=0, high=lidar_range, shape=(num_lidar_beams,), dtype=np.float32),
+            spaces.Box(low=0, high=lidar_range, shape=(num_stacked_scans*num_lidar_beams,), dtype=np.float32),
             spaces.Box(low=0, high=10, shape=(1,), dtype=np.float32) ,
             spaces.Box(low=-np.pi, high=np.pi, shape=(1,), dtype=np.float32) 
         ))
@@ -56,8 +76,8 @@ class ObservationCollector():
         
 
         # message_filter subscriber: laserscan, robot_pose
-        self._scan_sub = message_filters.Subscriber("scan", LaserScan)
-        self._robot_state_sub = message_filters.Subscriber('plan_manager/robot_state', RobotStateStamped)
+        self._scan_sub = message_filters.Subscriber(f"{self.ns_prefix}scan", LaserScan)
+        self._robot_state_sub = message_filters.Subscriber(f'{self.ns_prefix}plan_manager/robot_state', RobotStateStamped)
         
         # message_filters.TimeSynchronizer: call callback only when all sensor info are ready
         self.ts = message_filters.ApproximateTimeSynchronizer([self._scan_sub, self._robot_state_sub], 100,slop=0.05)#,allow_headerless=True)
@@ -65,17 +85,42 @@ class ObservationCollector():
         
         # topic subscriber: subgoal
         #TODO should we synchoronize it with other topics
-        self._subgoal_sub = message_filters.Subscriber('plan_manager/subgoal', PoseStamped) #self._subgoal_sub = rospy.Subscriber("subgoal", PoseStamped, self.callback_subgoal)
+        self._subgoal_sub = message_filters.Subscriber(f'{self.ns_prefix}plan_manager/subgoal', PoseStamped) #self._subgoal_sub = rospy.Subscriber("subgoal", PoseStamped, self.callback_subgoal)
         self._subgoal_sub.registerCallback(self.callback_subgoal)
         
         # service clients
-        self._service_name_step='step_world'
+        self._service_name_step=f'{self.ns_prefix}step_world'
         self._sim_step_client = rospy.ServiceProxy(self._service_name_step, StepWorld)
 
+        # worker thread for collecting observations in the background, see get_observations_async()
+        self._executor = None
+
         self._noise_model = noise_model                                        # 0 means no more noise
         #self._noise_model = [1]
+        self._noise_level = noise_level
         if 0 not in self._noise_model:                 
-            self.Noise_Generation = Noise(noise_mode = self._noise_model)
+            self.Noise_Generation = Noise(noise_mode = self._noise_model, noise_level = noise_level)
+        self.set_scan_delay(scan_delay)
+
+    def set_noise_level(self, noise_level: float):
+        """ changes the level of the gaussian noise, only has an effect if a noise model was given """
+        self._noise_level = noise_level
+        if 0 not in self._noise_model:
+            self.Noise_Generation.set_noise_level(noise_level)
+
+    def set_noise_model(self, noise_model):
+        """ changes the noise modes added to the scan, e.g. for every episode of a noise curriculum. [0] disables the noise """
+        self._noise_model = noise_model
+        if 0 not in noise_model:
+            if hasattr(self, 'Noise_Generation'):
+                self.Noise_Generation.set_noise_mode(noise_model)
+            else:
+                self.Noise_Generation = Noise(noise_mode = noise_model, noise_level = self._noise_level)
+
+    def set_scan_delay(self, scan_delay: int):
+        """ the agent gets the scan of scan_delay steps ago, the reward is still calculated on the current scan """
+        self._scan_delay = scan_delay
+        self._scan_delay_buffer = ScanDelay(scan_delay)
     
     def get_observation_space(self):
         return self.observation_space
@@ -86,22 +131,77 @@ class ObservationCollector():
         
         # sim a step forward until all sensor msg uptodate
         i=0
-        while(self._flag_all_received==False):
-            self.call_service_takeSimStep()
-            i+=1
-        # rospy.logdebug(f"Current observation takes {i} steps for Synchronization")
-        #print(f"Current observation takes {i} steps for Synchronization")
+        with self._profiler.phase("sync_wait"):
+            while(self._flag_all_received==False):
+                self.call_service_takeSimStep()
+                i+=1
+        self._profiler.record("sim_step_iterations", i)
         if 0 not in self._noise_model:
+            with self._profiler.phase("noise"):
                 self._scan.ranges = self.Noise_Generation.add_noise(self._scan)
         scan=self._scan.ranges.astype(np.float32)
         rho, theta = ObservationCollector._get_goal_pose_in_robot_frame(self._subgoal,self._robot_pose)
-        merged_obs = np.hstack([scan, np.array([rho,theta])])
         obs_dict = {}
+        obs_scan = scan
+        if self._scan_delay > 0:
+            obs_scan = self._scan_delay_buffer.append(scan)
+        if self._num_stacked_scans > 1:
+            self._scan_history.append(obs_scan)
+            # view on the history buffer, only copied once into merged_obs
+            scan_history = self._scan_history.get()
+            merged_obs = np.hstack([scan_history.reshape(-1), np.array([rho,theta])])
+            obs_dict["laser_scan_history"] = scan_history
+        else:
+            merged_obs = np.hstack([obs_scan, np.array([rho,theta])])
         obs_dict["laser_scan"] = scan
+        obs_dict.update(self._get_scan_features(scan))
         obs_dict['goal_in_robot_frame'] = [rho,theta]
         #print("THIS IS A TEST")
         return merged_obs, obs_dict
     
+    def _get_scan_features(self, scan: np.ndarray) -> dict:
+        """ features of the scan which are needed by the reward calculation and can be used by the policies.
+        They are computed once per step, so nobody else has to go over the full scan again.
+
+        Returns:
+            dict: "laser_min" (minimum range), "laser_argmin" (beam index of the minimum) and, if sectors are
+                enabled, "laser_sector_min" (minimum range per sector)
+        """
+        if len(self._sector_starts) == 0:
+            argmin = int(scan.argmin())
+            return {"laser_min": scan[argmin], "laser_argmin": argmin}
+        sector_min = np.minimum.reduceat(scan, self._sector_starts)
+        # the global minimum lies in the sector with the smallest minimum, only this sector is searched again
+        sector = int(sector_min.argmin())
+        start = self._sector_starts[sector]
+        end = self._sector_starts[sector + 1] if sector + 1 < len(self._sector_starts) else len(scan)
+        return {
+            "laser_min": sector_min[sector],
+            "laser_argmin": int(start + scan[start:end].argmin()),
+            "laser_sector_min": sector_min
+        }
+
+    def reset(self):
+        """ reset variables related to the episode """
+        self._scan_delay_buffer.reset()
+        if self._num_stacked_scans > 1:
+            self._scan_history.reset()
+
+    def get_observations_async(self):
+        """ steps the simulation until new observations arrived in a background thread.
+
+        Returns:
+            concurrent.futures.Future: resolves to the return value of get_observations()
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        return self._executor.submit(self.get_observations)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
     @staticmethod
     def _get_goal_pose_in_robot_frame(goal_pos:Pose2D,robot_pos:Pose2D):
          y_relative = goal_pos.y - robot_pos.y
@@ -114,7 +214,8 @@ class ObservationCollector():
     def call_service_takeSimStep(self):
         request=StepWorldRequest()
         try:
-            response=self._sim_step_client(request)
+            with self._profiler.phase("sim_step"):
+                response=self._sim_step_client(request)
             rospy.logdebug("step service=",response)
         except rospy.ServiceException as e:
             rospy.logdebug("step Service call failed: %s"%e)
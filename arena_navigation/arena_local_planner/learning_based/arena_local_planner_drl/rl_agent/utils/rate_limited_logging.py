@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+import time
+
+# all loggers of the package are children of this one, the level can be set with the environment
+# variable ARENA_DRL_LOG_LEVEL (e.g. DEBUG, INFO, WARNING), default is INFO
+ROOT_LOGGER_NAME = "arena_local_planner_drl"
+_setup_lock = threading.Lock()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """ logger of a part of the package, e.g. get_logger("flatland_env") """
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    with _setup_lock:
+        if not root.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("[%(levelname)s] [%(asctime)s] [%(name)s] %(message)s"))
+            root.addHandler(handler)
+            root.setLevel(os.environ.get("ARENA_DRL_LOG_LEVEL", "INFO").upper())
+            # rospy configures the root logger of the node, the messages are printed once
+            root.propagate = False
+    return root.getChild(name)
+
+
+def _format_fields(fields: dict) -> str:
+    return " ".join("%s=%s" % (key, "%.4g" % value if isinstance(value, float) else value) for key, value in fields.items())
+
+
+class RateLimitedLog():
+    def __init__(self, logger: logging.Logger, interval: float = 10.0):
+        """ logs every message at most once per interval, the repetitions in between are only counted and
+        reported with the next output of the message. Messages below the level of the logger cost a single check.
+
+        Args:
+            logger (logging.Logger): logger the messages are written to, see get_logger()
+            interval (float, optional): minimum time between two outputs of the same message in seconds. Defaults to 10.0.
+        """
+        self._logger = logger
+        self._interval = interval
+        # message -> [time of the last output, suppressed repetitions]
+        self._state = {}
+
+    def log(self, level: int, msg: str, **fields):
+        """ e.g. log(logging.DEBUG, "noise added", mode="bias"), the fields are appended as key=value """
+        if not self._logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        state = self._state.get(msg)
+        if state is not None and now - state[0] < self._interval:
+            state[1] += 1
+            return
+        suppressed = 0 if state is None else state[1]
+        self._state[msg] = [now, 0]
+        if suppressed > 0:
+            fields = dict(fields, repeated=suppressed)
+        self._logger.log(level, "%s %s" % (msg, _format_fields(fields)) if fields else msg)
+
+    def debug(self, msg: str, **fields):
+        self.log(logging.DEBUG, msg, **fields)
+
+    def info(self, msg: str, **fields):
+        self.log(logging.INFO, msg, **fields)
+
+    def warning(self, msg: str, **fields):
+        self.log(logging.WARNING, msg, **fields)
+
+
+class PeriodicSummary():
+    def __init__(self, logger: logging.Logger, name: str, interval: float = 30.0, level: int = logging.INFO, **context):
+        """ aggregates per step values (e.g. the reward) and logs their count, mean, min and max at most once
+        per interval instead of every single value. Adding a value costs a few additions.
+
+        Args:
+            logger (logging.Logger): logger the summaries are written to, see get_logger()
+            name (str): name of the summary, the first word of every output
+            interval (float, optional): time between two summaries in seconds. Defaults to 30.0.
+            level (int, optional): level of the summaries. Defaults to logging.INFO.
+            context: fields added to every summary, e.g. ns="sim_1"
+        """
+        self._logger = logger
+        self._name = name
+        self._interval = interval
+        self._level = level
+        self._context = context
+        self._stats = {}
+        self._last_output = time.monotonic()
+
+    def add(self, **values):
+        """ e.g. add(reward=0.3), the summary is logged if the interval has passed """
+        if not self._logger.isEnabledFor(self._level):
+            return
+        for key, value in values.items():
+            stats = self._stats.get(key)
+            if stats is None:
+                self._stats[key] = [1, value, value, value]
+            else:
+                stats[0] += 1
+                stats[1] += value
+                if value < stats[2]:
+                    stats[2] = value
+                if value > stats[3]:
+                    stats[3] = value
+        if time.monotonic() - self._last_output >= self._interval:
+            self.flush()
+
+    def flush(self):
+        """ logs the values aggregated since the last summary """
+        self._last_output = time.monotonic()
+        if not self._stats:
+            return
+        fields = dict(self._context)
+        for key, (count, total, min_value, max_value) in self._stats.items():
+            fields.update({key + "_count": count, key + "_mean": float(total) / count,
+                           key + "_min": float(min_value), key + "_max": float(max_value)})
+        self._stats = {}
+        self._logger.log(self._level, "%s %s" % (self._name, _format_fields(fields)))
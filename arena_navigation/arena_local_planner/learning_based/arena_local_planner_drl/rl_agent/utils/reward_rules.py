@@ -0,0 +1,131 @@
+import os
+import threading
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import yaml
+
+DEFAULT_REWARD_RULES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'configs', 'reward_rules.yaml')
+
+# compiled rule: (min_dist, goal_dist, last_goal_dist) -> (rewards, done_reasons), all arrays of shape [num_envs].
+# last_goal_dist is NaN at the first step of an episode, done_reasons is -1 if the episode is not done.
+RewardRule = Callable[[np.ndarray, np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+_TERM_BUILDERS = {}
+
+# (absolute path, mtime) -> rules loaded from the yaml
+_rules_cache: Dict[Tuple[str, int], Dict[str, List[dict]]] = {}
+_cache_lock = threading.Lock()
+
+
+def _term(name: str):
+    def register(builder):
+        _TERM_BUILDERS[name] = builder
+        return builder
+    return register
+
+
+@_term('goal_reached')
+def _goal_reached(params: dict, robot_radius: float, safe_dist: float, goal_radius: float):
+    reward = params.get('reward', 15)
+    threshold = params.get('threshold', goal_radius)
+
+    def term(features, rewards, done_reasons):
+        reached = features['goal_dist'] < threshold
+        rewards += reward * reached
+        done_reasons[reached] = 2
+    return term
+
+
+@_term('safe_dist')
+def _safe_dist(params: dict, robot_radius: float, safe_dist: float, goal_radius: float):
+    punishment = params.get('punishment', 0.15)
+    threshold = params.get('threshold', safe_dist)
+
+    def term(features, rewards, done_reasons):
+        rewards -= punishment * (features['min_dist'] < threshold)
+    return term
+
+
+@_term('collision')
+def _collision(params: dict, robot_radius: float, safe_dist: float, goal_radius: float):
+    punishment = params.get('punishment', 10)
+    threshold = params.get('threshold', robot_radius)
+
+    def term(features, rewards, done_reasons):
+        collision = features['min_dist'] <= threshold
+        rewards -= punishment * collision
+        done_reasons[collision] = 1
+    return term
+
+
+@_term('goal_approached')
+def _goal_approached(params: dict, robot_radius: float, safe_dist: float, goal_radius: float):
+    w_towards = params.get('w_towards', 0.25)
+    w_away = params.get('w_away', w_towards)
+    punishment_not_moving = params.get('punishment_not_moving', 0.0001)
+
+    def term(features, rewards, done_reasons):
+        delta = features['goal_dist_delta']
+        reward = np.round(np.where(delta < 0, w_away, w_towards) * delta, 3)
+        # punishment for not moving
+        reward[features['has_last_goal_dist'] & (delta == 0)] = -punishment_not_moving
+        rewards += reward
+    return term
+
+
+def compile_reward_rule(terms: List[dict], robot_radius: float, safe_dist: float, goal_radius: float) -> RewardRule:
+    """builds the function calculating the reward of a rule. The features shared by the terms
+    (laser minimum, goal distance and its change since the last step) are computed once per call,
+    every term only adds a vectorized expression on top of them.
+
+    Args:
+        terms (List[dict]): terms of the rule as in reward_rules.yaml, each dict has the key 'term' and the term parameters
+        robot_radius (float): default threshold of the collision term
+        safe_dist (float): default threshold of the safe_dist term
+        goal_radius (float): default threshold of the goal_reached term
+    """
+    term_fncs = []
+    for params in terms:
+        params = dict(params)
+        name = params.pop('term')
+        if name not in _TERM_BUILDERS:
+            raise ValueError(f"unknown reward term '{name}', available terms: {sorted(_TERM_BUILDERS)}")
+        term_fncs.append(_TERM_BUILDERS[name](params, robot_radius, safe_dist, goal_radius))
+
+    def rule(min_dist: np.ndarray, goal_dist: np.ndarray, last_goal_dist: np.ndarray):
+        has_last_goal_dist = ~np.isnan(last_goal_dist)
+        features = {
+            'min_dist': min_dist,
+            'goal_dist': goal_dist,
+            'has_last_goal_dist': has_last_goal_dist,
+            'goal_dist_delta': np.where(has_last_goal_dist, last_goal_dist - goal_dist, 0.0)
+        }
+        rewards = np.zeros(len(goal_dist))
+        done_reasons = np.full(len(goal_dist), -1, dtype=np.int64)
+        for term in term_fncs:
+            term(features, rewards, done_reasons)
+        return rewards, done_reasons
+    return rule
+
+
+def load_reward_rules(rules_yaml_path: str = DEFAULT_REWARD_RULES_PATH) -> Dict[str, List[dict]]:
+    """returns all rules of the yaml file, the file is only parsed again if it was modified"""
+    path = os.path.abspath(rules_yaml_path)
+    key = (path, os.stat(path).st_mtime_ns)
+    with _cache_lock:
+        rules = _rules_cache.get(key)
+        if rules is None:
+            with open(path, 'r') as fd:
+                rules = yaml.safe_load(fd)
+            _rules_cache[key] = rules
+    return rules
+
+
+def get_reward_rule(rule: str, robot_radius: float, safe_dist: float, goal_radius: float,
+                    rules_yaml_path: str = DEFAULT_REWARD_RULES_PATH) -> RewardRule:
+    rules = load_reward_rules(rules_yaml_path)
+    if rule not in rules:
+        raise ValueError(f"reward rule '{rule}' is not defined in {rules_yaml_path}, available rules: {sorted(rules)}")
+    return compile_reward_rule(rules[rule], robot_radius, safe_dist, goal_radius)
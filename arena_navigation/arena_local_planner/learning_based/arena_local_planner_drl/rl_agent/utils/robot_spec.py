@@ -0,0 +1,86 @@
+import os
+import threading
+from typing import Dict, NamedTuple, Tuple
+
+import yaml
+
+
+class DiscreteAction(NamedTuple):
+    name: str
+    linear: float
+    angular: float
+
+
+class RobotSpec(NamedTuple):
+    """ immutable summary of the robot model yaml (flatland) and the settings yaml (action space) """
+    # radius of the circular base footprint, without any safety margin
+    radius: float
+    laser_num_beams: int
+    laser_max_range: float
+    discrete_actions: Tuple[DiscreteAction, ...]
+    linear_range: Tuple[float, float]
+    angular_range: Tuple[float, float]
+
+
+# (robot yaml key, settings yaml key) -> RobotSpec, a key is (absolute path, mtime)
+_spec_cache: Dict[Tuple[Tuple[str, int], Tuple[str, int]], RobotSpec] = {}
+_cache_lock = threading.Lock()
+
+
+def _file_key(path: str) -> Tuple[str, int]:
+    path = os.path.abspath(path)
+    return path, os.stat(path).st_mtime_ns
+
+
+def _parse_robot_yaml(robot_yaml_path: str) -> Tuple[float, int, float]:
+    with open(robot_yaml_path, 'r') as fd:
+        robot_data = yaml.safe_load(fd)
+    radius = laser_num_beams = laser_max_range = None
+    # get robot radius
+    for body in robot_data['bodies']:
+        if body['name'] == "base_footprint":
+            for footprint in body['footprints']:
+                if footprint['type'] == 'circle':
+                    radius = footprint.get('radius') or 0.3
+    # get laser related information
+    for plugin in robot_data['plugins']:
+        if plugin['type'] == 'Laser':
+            laser_angle_min = plugin['angle']['min']
+            laser_angle_max = plugin['angle']['max']
+            laser_angle_increment = plugin['angle']['increment']
+            laser_num_beams = int(round((laser_angle_max-laser_angle_min)/laser_angle_increment)+1)
+            laser_max_range = plugin['range']
+    if radius is None or laser_num_beams is None:
+        raise ValueError(
+            f"{robot_yaml_path} must define a circular 'base_footprint' and a 'Laser' plugin")
+    return radius, laser_num_beams, laser_max_range
+
+
+def _parse_settings_yaml(settings_yaml_path: str):
+    with open(settings_yaml_path, 'r') as fd:
+        robot_settings = yaml.safe_load(fd)['robot']
+    discrete_actions = tuple(
+        DiscreteAction(action['name'], action['linear'], action['angular'])
+        for action in robot_settings.get('discrete_actions', []))
+    continuous_actions = robot_settings.get('continuous_actions', {})
+    linear_range = tuple(continuous_actions.get('linear_range', (0.0, 0.0)))
+    angular_range = tuple(continuous_actions.get('angular_range', (0.0, 0.0)))
+    return discrete_actions, linear_range, angular_range
+
+
+def load_robot_spec(robot_yaml_path: str, settings_yaml_path: str) -> RobotSpec:
+    """ returns the robot spec described by the two yaml files. The files are only parsed again if
+    one of them was modified since the last call, so creating many envs in one process is cheap and
+    all of them see the same configuration.
+
+    Args:
+        robot_yaml_path (str): path of the flatland robot model, e.g. simulator_setup/robot/myrobot.model.yaml
+        settings_yaml_path (str): path of the settings containing the action spaces, e.g. configs/default_settings.yaml
+    """
+    key = (_file_key(robot_yaml_path), _file_key(settings_yaml_path))
+    with _cache_lock:
+        spec = _spec_cache.get(key)
+        if spec is None:
+            spec = RobotSpec(*_parse_robot_yaml(robot_yaml_path), *_parse_settings_yaml(settings_yaml_path))
+            _spec_cache[key] = spec
+    return spec
@@ -0,0 +1,65 @@
+from collections import deque
+
+import numpy as np
+
+
+class ScanHistory():
+    def __init__(self, num_scans: int, num_beams: int, dtype=np.float32):
+        """ keeps the last num_scans laser scans in a preallocated circular buffer.
+        Every scan is written twice (at idx and idx + num_scans), therefore the newest num_scans scans
+        always form a contiguous block of the buffer and can be returned as a view without copying.
+
+        Args:
+            num_scans (int): number of scans to keep
+            num_beams (int): number of beams per scan
+        """
+        self._num_scans = num_scans
+        self._buffer = np.zeros((2 * num_scans, num_beams), dtype=dtype)
+        # row the next scan will be written to
+        self._idx = 0
+        self._is_empty = True
+
+    def reset(self):
+        """ forget all scans, e.g. at the beginning of a new episode """
+        self._idx = 0
+        self._is_empty = True
+
+    def append(self, scan: np.ndarray):
+        if self._is_empty:
+            # pad the history with the first scan of the episode
+            self._buffer[:] = scan
+            self._is_empty = False
+        self._buffer[self._idx] = scan
+        self._buffer[self._idx + self._num_scans] = scan
+        self._idx = (self._idx + 1) % self._num_scans
+
+    def get(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: view of shape (num_scans, num_beams) on the buffer, oldest scan first.
+                It is only valid until the next call of append().
+        """
+        return self._buffer[self._idx:self._idx + self._num_scans]
+
+
+class ScanDelay():
+    def __init__(self, delay: int):
+        """ delays the scans by a fixed number of steps. Until enough scans arrived in an episode,
+        the first scan of the episode is returned.
+
+        Args:
+            delay (int): number of steps the returned scan lags behind the appended one
+        """
+        self._scans = deque(maxlen=delay + 1)
+
+    def reset(self):
+        """ forget all scans, e.g. at the beginning of a new episode """
+        self._scans.clear()
+
+    def append(self, scan: np.ndarray) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: the scan appended delay steps ago
+        """
+        self._scans.append(scan)
+        return self._scans[0]
@@ -0,0 +1,61 @@
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict
+
+import numpy as np
+
+
+class StepProfiler():
+    def __init__(self, enabled: bool = True, max_samples: int = 10000):
+        """ records the durations of the phases of the env step pipeline (e.g. "action_publish", "sim_step",
+        "reward") with time.perf_counter(). The samples are collected until pop() is called, e.g. by the
+        StepProfilerCallback (tools/step_profiler_callback.py), which logs them as histograms to tensorboard.
+        A disabled profiler records nothing and costs a function call per phase.
+
+        Args:
+            enabled (bool, optional): records the durations. Defaults to True.
+            max_samples (int, optional): the latest samples kept per phase between two pop(). Defaults to 10000.
+        """
+        self.enabled = enabled
+        self._max_samples = max_samples
+        self._samples = defaultdict(self._new_buffer)
+
+    def _new_buffer(self) -> deque:
+        return deque(maxlen=self._max_samples)
+
+    @contextmanager
+    def _phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._samples[name].append(time.perf_counter() - start)
+
+    def phase(self, name: str):
+        """ context manager measuring the duration of its block, e.g. with profiler.phase("reward"): ... """
+        if not self.enabled:
+            return _NO_PHASE
+        return self._phase(name)
+
+    def record(self, name: str, value: float):
+        """ adds a sample measured elsewhere, e.g. a duration in seconds or the number of iterations of a loop """
+        if self.enabled:
+            self._samples[name].append(value)
+
+    def pop(self) -> Dict[str, np.ndarray]:
+        """ the samples recorded since the last call, {phase: array of samples} """
+        # swapped at once, phases may be recorded concurrently by the observation thread (step_async())
+        samples, self._samples = self._samples, defaultdict(self._new_buffer)
+        return {name: np.array(values) for name, values in samples.items()}
+
+
+class _NoPhase():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_PHASE = _NoPhase()
@@ -1,10 +1,7 @@
-import os
 from typing import Callable, Dict, List, Optional, Tuple, Type, Union
 
 import gym
-import rospkg
 import torch as th
-import yaml
 
 from torch import nn
 from stable_baselines3.common.policies import ActorCriticPolicy
@@ -12,18 +9,12 @@ from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
 
 _RS = 2  # robot state size
 
-ROBOT_SETTING_PATH = rospkg.RosPack().get_path('simulator_setup')
-yaml_ROBOT_SETTING_PATH = os.path.join(ROBOT_SETTING_PATH, 'robot', 'myrobot.model.yaml')
 
-with open(yaml_ROBOT_SETTING_PATH, 'r') as fd:
-    robot_data = yaml.safe_load(fd)
-    for plugin in robot_data['plugins']:
-        if plugin['type'] == 'Laser':
-            laser_angle_min = plugin['angle']['min']
-            laser_angle_max = plugin['angle']['max']
-            laser_angle_increment = plugin['angle']['increment']
-            _L = int(round((laser_angle_max - laser_angle_min) / laser_angle_increment) + 1)  # num of laser beams
-            break
+def _num_laser_beams(observation_space: gym.spaces.Box, num_stacked_scans: int) -> int:
+    """ number of beams per laser scan, the observation is [scan_1, ..., scan_k, robot state] """
+    num_beams, remainder = divmod(observation_space.shape[0] - _RS, num_stacked_scans)
+    assert remainder == 0, f"observation of size {observation_space.shape[0]} does not hold {num_stacked_scans} scans"
+    return num_beams
 
 
 class MLP_ARENA2D(nn.Module):
@@ -116,13 +107,17 @@ class DRL_LOCAL_PLANNER(BaseFeaturesExtractor):
     :param observation_space: (gym.Space)
     :param features_dim: (int) Number of features extracted.
         This corresponds to the number of unit for the last layer.
+    :param num_stacked_scans: (int) Number of consecutive laser scans in the observation,
+        each of them is fed as a separate input channel.
     """
 
-    def __init__(self, observation_space: gym.spaces.Box, features_dim: int = 128):
+    def __init__(self, observation_space: gym.spaces.Box, features_dim: int = 128, num_stacked_scans: int = 1):
         super(DRL_LOCAL_PLANNER, self).__init__(observation_space, features_dim)
+        self._num_stacked_scans = num_stacked_scans
+        self._num_beams = _num_laser_beams(observation_space, num_stacked_scans)
 
         self.cnn = nn.Sequential(
-            nn.Conv1d(1, 32, 5, 2),
+            nn.Conv1d(num_stacked_scans, 32, 5, 2),
             nn.ReLU(),
             nn.Conv1d(32, 32, 3, 2),
             nn.ReLU(),
@@ -132,7 +127,7 @@ class DRL_LOCAL_PLANNER(BaseFeaturesExtractor):
         # Compute shape by doing one forward pass
         with th.no_grad():
             # tensor_forward = th.as_tensor(observation_space.sample()[None]).float()
-            tensor_forward = th.randn(1, 1, _L)
+            tensor_forward = th.randn(1, num_stacked_scans, self._num_beams)
             n_flatten = self.cnn(tensor_forward).shape[1]
 
         self.fc_1 = nn.Sequential(
@@ -150,7 +145,7 @@ class DRL_LOCAL_PLANNER(BaseFeaturesExtractor):
         :return: (th.Tensor),
             extracted features by the network
         """
-        laser_scan = th.unsqueeze(observations[:, :-_RS], 1)
+        laser_scan = observations[:, :-_RS].reshape(-1, self._num_stacked_scans, self._num_beams)
         robot_state = observations[:, -_RS:]
 
         extracted_features = self.fc_1(self.cnn(laser_scan))
@@ -177,13 +172,17 @@ class CNN_NAVREP(BaseFeaturesExtractor):
     :param observation_space: (gym.Space)
     :param features_dim: (int) Number of features extracted.
         This corresponds to the number of unit for the last layer.
+    :param num_stacked_scans: (int) Number of consecutive laser scans in the observation,
+        each of them is fed as a separate input channel.
     """
 
-    def __init__(self, observation_space: gym.spaces.Box, features_dim: int = 32):
+    def __init__(self, observation_space: gym.spaces.Box, features_dim: int = 32, num_stacked_scans: int = 1):
         super(CNN_NAVREP, self).__init__(observation_space, features_dim)
+        self._num_stacked_scans = num_stacked_scans
+        self._num_beams = _num_laser_beams(observation_space, num_stacked_scans)
 
         self.cnn = nn.Sequential(
-            nn.Conv1d(1, 32, 8, 4),
+            nn.Conv1d(num_stacked_scans, 32, 8, 4),
             nn.ReLU(),
             nn.Conv1d(32, 64, 9, 4),
             nn.ReLU(),
@@ -196,7 +195,7 @@ class CNN_NAVREP(BaseFeaturesExtractor):
 
         # Compute shape by doing one forward pass
         with th.no_grad():
-            tensor_forward = th.randn(1, 1, _L)
+            tensor_forward = th.randn(1, num_stacked_scans, self._num_beams)
             n_flatten = self.cnn(tensor_forward).shape[1]
 
         self.fc = nn.Sequential(
@@ -209,7 +208,7 @@ class CNN_NAVREP(BaseFeaturesExtractor):
             extracted features by the network
         """
 
-        laser_scan = th.unsqueeze(observations[:, :-_RS], 1)
+        laser_scan = observations[:, :-_RS].reshape(-1, self._num_stacked_scans, self._num_beams)
         robot_state = observations[:, -_RS:]
 
         extracted_features = self.fc(self.cnn(laser_scan))
@@ -0,0 +1,82 @@
+"""
+Compares the dynamically int8 quantized policy of an agent with its float32 policy on the CPU:
+inference time for single observations and batches, and how often both choose the same action.
+
+    python benchmark_quantization.py --load DRL_LOCAL_PLANNER_2021_01_25__22_56 --observations obs.npy
+
+The observations have to be raw observations of the env (as recorded), the normalization of the agent is
+applied by both policies.
+"""
+import os
+import time
+
+import numpy as np
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.argsparser import parse_benchmark_quantization_args
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.ros_paths import get_package_path
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.train_agent_utils import VEC_NORMALIZE_FILE, agent_hyperparams, load_hyperparameters_json
+
+
+def time_per_call(predict, observations: np.ndarray, repeats: int = 3) -> float:
+    """ best of 'repeats' runs of the mean time of predict() per element of observations """
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for obs in observations:
+            predict(obs)
+        best = min(best, (time.perf_counter() - start) / len(observations))
+    return best
+
+
+if __name__ == "__main__":
+    args, _ = parse_benchmark_quantization_args()
+
+    import torch as th
+    from stable_baselines3 import PPO
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.policy_export import load_vec_normalize
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.quantization import QuantizedPolicy
+    th.set_num_threads(1)
+
+    dir = get_package_path('arena_local_planner_drl')
+    PATHS = {'model': os.path.join(dir, 'agents', args.load)}
+    params = load_hyperparameters_json(agent_hyperparams, PATHS)
+    vec_normalize = None
+    vec_normalize_path = os.path.join(PATHS['model'], VEC_NORMALIZE_FILE)
+    if params['normalize'] and os.path.isfile(vec_normalize_path):
+        vec_normalize = load_vec_normalize(vec_normalize_path)
+
+    model = PPO.load(os.path.join(PATHS['model'], "best_model"), device="cpu")
+    quantized_policy = QuantizedPolicy(model.policy, vec_normalize)
+
+    if args.observations is not None:
+        observations = np.load(args.observations).astype(np.float32)
+    else:
+        print("No recorded observations given, %d observations are sampled from the observation space" % args.n)
+        observations = np.stack([model.observation_space.sample() for _ in range(args.n)]).astype(np.float32)
+    observations = observations.reshape(len(observations), -1)
+
+    def predict_float(obs):
+        if vec_normalize is not None:
+            obs = vec_normalize.normalize_obs(obs)
+        return model.predict(obs, deterministic=True)[0]
+
+    def predict_quantized(obs):
+        return quantized_policy.predict(obs)[0]
+
+    actions_float = predict_float(observations)
+    actions_quantized = predict_quantized(observations)
+    if params['discrete_action_space']:
+        agreement = np.mean(actions_float == actions_quantized)
+        deviation = "-"
+    else:
+        agreement = np.mean(np.all(np.isclose(actions_float, actions_quantized, atol=0.05), axis=1))
+        deviation = "%.4f" % np.mean(np.abs(actions_float - actions_quantized))
+
+    batches = np.array_split(observations, max(1, len(observations) // 32))
+    print("\n%s on %d observations (1 cpu thread)" % (args.load, len(observations)))
+    print("                        float32     int8 dynamic")
+    print("single observation  %9.3f ms  %9.3f ms" % (time_per_call(predict_float, observations) * 1000,
+                                                     time_per_call(predict_quantized, observations) * 1000))
+    print("batch of ~32        %9.3f ms  %9.3f ms" % (time_per_call(predict_float, batches) * 1000,
+                                                     time_per_call(predict_quantized, batches) * 1000))
+    print("action agreement: %.1f%%, mean absolute action deviation: %s" % (agreement * 100, deviation))
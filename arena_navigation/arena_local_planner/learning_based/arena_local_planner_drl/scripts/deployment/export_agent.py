@@ -0,0 +1,61 @@
+"""
+Exports the policy of a trained agent including its observation normalization to TorchScript or ONNX.
+The exported policy can be run with tools/policy_runtime.py, e.g.:
+
+    python export_agent.py --load CNN_NAVREP_2021_01_15__23_28 --format onnx
+
+    policy = ExportedPolicy(".../agents/CNN_NAVREP_2021_01_15__23_28/policy.onnx")
+    action = policy.predict(obs)
+"""
+import os
+import time
+
+import numpy as np
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.argsparser import parse_export_agent_args
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.ros_paths import get_package_path
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.train_agent_utils import VEC_NORMALIZE_FILE, agent_hyperparams, load_hyperparameters_json
+
+if __name__ == "__main__":
+    args, _ = parse_export_agent_args()
+
+    dir = get_package_path('arena_local_planner_drl')
+    PATHS = {'model': os.path.join(dir, 'agents', args.load)}
+    assert os.path.isfile(
+        os.path.join(PATHS['model'], 'best_model.zip')), "No model file found in %s" % PATHS['model']
+    output = args.output
+    if output is None:
+        output = os.path.join(PATHS['model'], "policy.onnx" if args.format == "onnx" else "policy.pt")
+
+    params = load_hyperparameters_json(agent_hyperparams, PATHS)
+
+    from stable_baselines3 import PPO
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.policy_export import export_policy, load_vec_normalize
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.policy_runtime import ExportedPolicy
+
+    vec_normalize = None
+    if params['normalize']:
+        vec_normalize_path = os.path.join(PATHS['model'], VEC_NORMALIZE_FILE)
+        if os.path.isfile(vec_normalize_path):
+            vec_normalize = load_vec_normalize(vec_normalize_path)
+        else:
+            print("No observation statistics (%s) found, the policy is exported without normalization" % VEC_NORMALIZE_FILE)
+
+    model = PPO.load(os.path.join(PATHS['model'], "best_model"), device="cpu")
+    export_policy(model.policy, output, vec_normalize, args.format)
+
+    # compare the exported policy with the original one on random observations
+    exported_policy = ExportedPolicy(output)
+    observations = np.stack([model.observation_space.sample() for _ in range(100)]).astype(np.float32)
+    normalized_observations = vec_normalize.normalize_obs(observations) if vec_normalize is not None else observations
+    actions, _ = model.predict(normalized_observations, deterministic=True)
+    exported_actions = exported_policy.predict(observations)
+    agreement = np.mean(np.all(np.isclose(np.reshape(actions, (100, -1)), np.reshape(exported_actions, (100, -1)), atol=1e-4), axis=1))
+
+    start = time.perf_counter()
+    for obs in observations:
+        exported_policy.predict(obs)
+    latency = (time.perf_counter() - start) / len(observations)
+
+    print("exported policy of %s to %s" % (args.load, output))
+    print("action agreement with the original policy: %.1f%%, inference time per observation: %.3f ms" % (agreement * 100, latency * 1000))
@@ -1,18 +1,54 @@
+import asyncio
 import os
 import rospy
-import rospkg
+import sys
 import json
 import numpy as np
 import time
 
 from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import SubprocVecEnv, DummyVecEnv, VecNormalize
+from stable_baselines3.common.vec_env import DummyVecEnv
 
 from task_generator.task_generator.tasks import get_predefined_task
 from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.envs.flatland_gym_env import FlatlandEnv
 from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.argsparser import parse_run_agent_args
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.policy_export import FusedPolicy, load_vec_normalize
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.quantization import QuantizedPolicy
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.ros_paths import get_package_path
 from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.train_agent_utils import *
 
+DONE_REASONS = {0: "exceeded max steps", 1: "collision", 2: "goal reached"}
+
+
+async def run_agent_async(agent, env: FlatlandEnv, params: dict, verbose: str):
+    """ drives the env through its asyncio interface (FlatlandEnv.astep/areset). The event loop stays free
+    while the simulation is stepped.
+
+    :param agent: policy acting on the raw observations, e.g. FusedPolicy
+    """
+    stand_still = 6 if params['discrete_action_space'] else np.array([0.0, 0.0])
+    await env.areset()
+    # send action 'stand still' in order to get first obs
+    obs, _, _, _ = await env.astep(stand_still)
+    cum_reward = 0.0
+    while not rospy.is_shutdown():
+        action, _ = agent.predict(obs, deterministic=True)
+
+        # clip action
+        if not params['discrete_action_space']:
+            action = np.maximum(np.minimum(agent.action_space.high, action), agent.action_space.low)
+
+        obs, reward, done, info = await env.astep(action)
+        cum_reward += reward
+
+        if done:
+            if verbose == '1':
+                print("Episode finished with reward of %f (finish reason: %s)" % (cum_reward, DONE_REASONS[info['done_reason']]))
+            await env.areset()
+            obs, _, _, _ = await env.astep(stand_still)
+            cum_reward = 0.0
+    print('shutdown')
+
 
 if __name__ == "__main__":
     args, _ = parse_run_agent_args()
@@ -20,12 +56,12 @@ if __name__ == "__main__":
     rospy.init_node("run_node")
 
     # get paths
-    dir = rospkg.RosPack().get_path('arena_local_planner_drl')
+    dir = get_package_path('arena_local_planner_drl')
     PATHS={
         'model': os.path.join(dir, 'agents', args.load),
-        'robot_setting' : os.path.join(rospkg.RosPack().get_path('simulator_setup'), 'robot', 'myrobot.model.yaml'),
-        'robot_as' : os.path.join(rospkg.RosPack().get_path('arena_local_planner_drl'), 'configs', 'default_settings.yaml'),
-        'scenerios_json_path' : os.path.join(rospkg.RosPack().get_path('simulator_setup'), 'scenerios', args.scenario+'.json')
+        'robot_setting' : os.path.join(get_package_path('simulator_setup'), 'robot', 'myrobot.model.yaml'),
+        'robot_as' : os.path.join(dir, 'configs', 'default_settings.yaml'),
+        'scenerios_json_path' : os.path.join(get_package_path('simulator_setup'), 'scenerios', args.scenario+'.json')
     }
     assert os.path.isfile(
         os.path.join(PATHS['model'], 'best_model.zip')), "No model file found in %s" % PATHS['model']
@@ -41,13 +77,30 @@ if __name__ == "__main__":
     # initialize task manager
     task_manager = get_predefined_task(mode='ScenerioTask', PATHS=PATHS)
     # initialize gym env
-    env = DummyVecEnv([lambda: FlatlandEnv(
-        task_manager, PATHS.get('robot_setting'), PATHS.get('robot_as'), params['reward_fnc'], params['discrete_action_space'], goal_radius=0.50, max_steps_per_episode=350)])
+    flatland_env = FlatlandEnv(
+        task_manager, PATHS.get('robot_setting'), PATHS.get('robot_as'), params['reward_fnc'], params['discrete_action_space'], goal_radius=0.50, max_steps_per_episode=350, num_stacked_scans=params['num_stacked_scans'])
+    env = DummyVecEnv([lambda: flatland_env])
+
+    # observation statistics of the training, frozen at the time of the best model
+    vec_normalize = None
     if params['normalize']:
-        env = VecNormalize(env, training=False, norm_obs=True, norm_reward=False, clip_reward=15)
+        vec_normalize_path = os.path.join(PATHS['model'], VEC_NORMALIZE_FILE)
+        if os.path.isfile(vec_normalize_path):
+            vec_normalize = load_vec_normalize(vec_normalize_path)
+        else:
+            print("No observation statistics (%s) found, the agent runs without normalization" % VEC_NORMALIZE_FILE)
 
-    # load agent
+    # load agent, the normalization is fused into the network instead of wrapping the env into VecNormalize
     agent = PPO.load(os.path.join(PATHS['model'], "best_model.zip"), env)
+    if args.quantized:
+        agent = QuantizedPolicy(agent.policy, vec_normalize)
+    else:
+        agent = FusedPolicy(agent.policy, vec_normalize)
+
+    if args.async_mode:
+        asyncio.get_event_loop().run_until_complete(
+            run_agent_async(agent, flatland_env, params, args.verbose))
+        sys.exit()
     
     env.reset()
     first_obs = True
@@ -75,13 +128,8 @@ if __name__ == "__main__":
         
         if done:
             if args.verbose == '1':
-                if info[0]['done_reason'] == 0:
-                    done_reason = "exceeded max steps"
-                elif info[0]['done_reason'] == 1:
-                    done_reason = "collision"
-                else:
-                    done_reason = "goal reached"
-                
+                done_reason = DONE_REASONS[info[0]['done_reason']]
+
                 print("Episode finished with reward of %f (finish reason: %s)"% (cum_reward, done_reason))
             env.reset()
             first_obs = True
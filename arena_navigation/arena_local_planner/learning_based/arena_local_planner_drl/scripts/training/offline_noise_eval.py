@@ -0,0 +1,99 @@
+"""
+Offline noise robustness evaluation: corrupts recorded observations (train_agent.py --record) with every noise
+mode and level and measures how much the decisions of the agent change. It needs neither ROS nor a GPU and is
+meant as a cheap first pass before the noise robustness sweep of test_agent.py, e.g.:
+
+    python offline_noise_eval.py --load DRL_LOCAL_PLANNER_2021_01_25__22_56 --noise_levels 1 5 10
+"""
+import csv
+import os
+
+from datetime import datetime as dt
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.argsparser import parse_offline_noise_eval_args
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.ros_paths import get_package_path
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.train_agent_utils import VEC_NORMALIZE_FILE, agent_hyperparams, load_hyperparameters_json
+
+robot = "myrobot"
+
+
+def get_paths(args) -> dict:
+    """ Function to generate the paths needed by the evaluation
+
+    :param args (argparse.Namespace): Object containing the program arguments
+    """
+    dir = get_package_path('arena_local_planner_drl')
+
+    PATHS = {
+        'model' : os.path.join(dir, 'agents', args.load),
+        'robot_setting' : os.path.join(get_package_path('simulator_setup'), 'robot', robot + '.model.yaml'),
+        'robot_as' : os.path.join(dir, 'configs', 'default_settings.yaml'),
+        'trajectories' : args.trajectories,
+        'results' : args.output
+    }
+    if not os.path.isfile(os.path.join(PATHS['model'], "best_model.zip")):
+        raise FileNotFoundError("Couldn't find 'best_model.zip' in '%s'" % PATHS['model'])
+    if PATHS['trajectories'] is None:
+        # one recording per training env
+        recordings_dir = os.path.join(dir, 'training_logs', 'trajectories', args.load)
+        if not os.path.isdir(recordings_dir):
+            raise FileNotFoundError("No trajectories of %s found in '%s', train with --record or pass --trajectories" % (args.load, recordings_dir))
+        PATHS['trajectories'] = sorted(os.path.join(recordings_dir, name) for name in os.listdir(recordings_dir))
+    if PATHS['results'] is None:
+        results_dir = os.path.join(dir, 'training_logs', 'offline_noise_eval')
+        os.makedirs(results_dir, exist_ok=True)
+        PATHS['results'] = os.path.join(results_dir, args.load + "_" + dt.now().strftime("%Y_%m_%d__%H_%M") + ".csv")
+
+    return PATHS
+
+
+if __name__ == "__main__":
+    args, _ = parse_offline_noise_eval_args()
+    PATHS = get_paths(args)
+
+    import numpy as np
+    from stable_baselines3 import PPO
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.envs.trajectory_recorder import TrajectoryStore
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.utils.robot_spec import load_robot_spec
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.offline_noise_eval import RESULT_FIELDS, build_noise_cells, evaluate_noise_offline
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.policy_export import load_vec_normalize
+
+    # the first max_obs observations, in recording order
+    observations = []
+    num_observations = 0
+    for path in PATHS['trajectories']:
+        for chunk in TrajectoryStore(path).chunks():
+            observations.append(np.asarray(chunk['obs'][:args.max_obs - num_observations]))
+            num_observations += len(observations[-1])
+            if num_observations >= args.max_obs:
+                break
+        if num_observations >= args.max_obs:
+            break
+    if num_observations == 0:
+        raise ValueError("The recorded trajectories in %s are empty" % PATHS['trajectories'])
+    observations = np.concatenate(observations)
+
+    params = load_hyperparameters_json(agent_hyperparams, PATHS)
+    vec_normalize = None
+    vec_normalize_path = os.path.join(PATHS['model'], VEC_NORMALIZE_FILE)
+    if params['normalize']:
+        if os.path.isfile(vec_normalize_path):
+            vec_normalize = load_vec_normalize(vec_normalize_path)
+        else:
+            print("No observation statistics (%s) found, the observations are evaluated without normalization" % VEC_NORMALIZE_FILE)
+    max_range = load_robot_spec(PATHS['robot_setting'], PATHS['robot_as']).laser_max_range
+    model = PPO.load(os.path.join(PATHS['model'], "best_model"), device="cpu")
+
+    cells = build_noise_cells(args.noise_modes, args.noise_levels)
+    print("evaluate %s on %d recorded observations with %d noise settings" % (args.load, len(observations), len(cells)))
+    results = evaluate_noise_offline(model.policy, observations, cells, max_range, vec_normalize,
+                                     batch_size=args.batch_size, seed=args.seed)
+
+    with open(PATHS['results'], 'w', newline='') as result_file:
+        writer = csv.DictWriter(result_file, fieldnames=['agent'] + RESULT_FIELDS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(dict(result, agent=args.load))
+            print("noise mode %d, level %4.1f: kl %.4f, action agreement %5.1f%%, value drift %.4f" % (
+                result['noise_mode'], result['noise_level'], result['kl'], result['action_agreement'] * 100, result['value_drift']))
+    print("results written to %s" % PATHS['results'])
@@ -1,20 +1,12 @@
 import os
-import rospy
 
 from datetime import datetime as dt
 
-from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import SubprocVecEnv, DummyVecEnv, VecNormalize
-from stable_baselines3.common.monitor import Monitor
-from stable_baselines3.common.callbacks import EvalCallback
-
-from task_generator.task_generator.tasks import get_predefined_task
-from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.scripts.custom_policy import *
-from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.envs.flatland_gym_env import FlatlandEnv
+# only light modules are imported here, ros, torch and stable baselines are imported after the
+# arguments are parsed, so that e.g. --help doesn't have to wait for them (see tools/check_import_time.py)
 from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.argsparser import parse_training_args
-from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.train_agent_utils import *
-from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.custom_mlp_utils import *
-from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.staged_train_callback import InitiateNewTrainStage
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.ros_paths import get_package_path
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.train_agent_utils import CHECKPOINT_DIR, VEC_NORMALIZE_FILE, agent_hyperparams, find_latest_checkpoint, get_hyperparameters_store, get_next_stage_topic, initialize_hyperparameters, load_checkpoint_state, make_envs, update_total_timesteps_json
 
 ##### HYPERPARAMETER #####
 """ will be used upon initializing new agent """
@@ -35,6 +27,7 @@ normalize = True
 start_stage = 1
 task_mode = "staged"    # custom, random or staged
 normalize = True
+num_stacked_scans = 1   # number of consecutive laser scans the agent observes
 ##########################
 
 
@@ -62,22 +55,27 @@ def get_paths(agent_name: str, args) -> dict:
     :param agent_name: Precise agent name (as generated by get_agent_name())
     :param args (argparse.Namespace): Object containing the program arguments
     """
-    dir = rospkg.RosPack().get_path('arena_local_planner_drl')
+    dir = get_package_path('arena_local_planner_drl')
 
     PATHS = {
         'model' : os.path.join(dir, 'agents', agent_name),
         'tb' : os.path.join(dir, 'training_logs', 'tensorboard', agent_name),
         'eval' : os.path.join(dir, 'training_logs', 'train_eval_log', agent_name),
-        'robot_setting' : os.path.join(rospkg.RosPack().get_path('simulator_setup'), 'robot', robot + '.model.yaml'),
-        'robot_as' : os.path.join(rospkg.RosPack().get_path('arena_local_planner_drl'), 'configs', 'default_settings.yaml'),
-        'curriculum' : os.path.join(rospkg.RosPack().get_path('arena_local_planner_drl'), 'configs', 'training_curriculum.yaml')
+        'robot_setting' : os.path.join(get_package_path('simulator_setup'), 'robot', robot + '.model.yaml'),
+        'robot_as' : os.path.join(dir, 'configs', 'default_settings.yaml'),
+        'curriculum' : os.path.join(dir, 'configs', 'training_curriculum.yaml'),
+        'trajectories' : os.path.join(dir, 'training_logs', 'trajectories', agent_name) if args.record else None,
+        'checkpoints' : os.path.join(dir, 'agents', agent_name, CHECKPOINT_DIR)
     }
     # check for mode
     if args.load is None:
         os.makedirs(PATHS.get('model'))
     else:
-        if not os.path.isfile(os.path.join(PATHS.get('model'), AGENT_NAME + ".zip")) and not os.path.isfile(os.path.join(PATHS.get('model'), "best_model.zip")):
-            raise FileNotFoundError("Couldn't find model named %s.zip' or 'best_model.zip' in '%s'" % (AGENT_NAME, PATHS.get('model')))
+        # a training resumed from a checkpoint may have crashed before the first best model
+        if args.resume and find_latest_checkpoint(PATHS.get('checkpoints')) is not None:
+            pass
+        elif not os.path.isfile(os.path.join(PATHS.get('model'), agent_name + ".zip")) and not os.path.isfile(os.path.join(PATHS.get('model'), "best_model.zip")):
+            raise FileNotFoundError("Couldn't find model named %s.zip' or 'best_model.zip' in '%s'" % (agent_name, PATHS.get('model')))
     # evaluation log enabled
     if args.eval_log:
         if not os.path.exists(PATHS.get('eval')):
@@ -97,6 +95,24 @@ def get_paths(agent_name: str, args) -> dict:
 if __name__ == "__main__":
     args, _ = parse_training_args()
 
+    import rospy
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.vec_env import SubprocVecEnv, DummyVecEnv, VecNormalize
+    from stable_baselines3.common.monitor import Monitor
+
+    from task_generator.task_generator.tasks import get_predefined_task
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.scripts.custom_policy import MLP_ARENA2D_POLICY, policy_kwargs_drl_local_planner, policy_kwargs_navrep
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.envs.flatland_gym_env import FlatlandEnv
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.envs.shared_memory_vec_env import SharedMemoryVecEnv
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.envs.trajectory_recorder import TrajectoryRecorder
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.custom_mlp_utils import get_act_fn
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.async_eval_callback import AsyncEvalCallback
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.checkpoints import MODEL_FILE, AsyncCheckpointCallback, restore_rng_state
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.eval_callback import NormalizedEvalCallback
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.eval_stats import RecentEpisodeOutcomes
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.staged_train_callback import EvalOutcomeRecorder, InitiateNewTrainStage
+    from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.step_profiler_callback import StepProfilerCallback
+
     rospy.init_node("train_node")
 
     # generate agent name and model specific paths
@@ -108,27 +124,77 @@ if __name__ == "__main__":
     # initialize hyperparameters (save to/ load from json)
     hyperparams_obj = agent_hyperparams(
         AGENT_NAME, robot, gamma, n_steps, ent_coef, learning_rate, vf_coef,max_grad_norm, gae_lambda, batch_size, 
-        n_epochs, clip_range, reward_fnc, discrete_action_space, normalize, task_mode, start_stage)
+        n_epochs, clip_range, reward_fnc, discrete_action_space, normalize, task_mode, start_stage, num_stacked_scans=num_stacked_scans)
     params = initialize_hyperparameters(agent_name=AGENT_NAME, PATHS=PATHS, hyperparams_obj=hyperparams_obj, load_target=args.load)
 
+    # continue from the latest checkpoint
+    checkpoint = None
+    if args.resume:
+        checkpoint = find_latest_checkpoint(PATHS.get('checkpoints'))
+        if checkpoint is None:
+            raise FileNotFoundError("Couldn't find a checkpoint in '%s'" % PATHS.get('checkpoints'))
+        checkpoint_state = load_checkpoint_state(checkpoint)
+        print("Resuming from %s (%d timesteps)" % (checkpoint, checkpoint_state['num_timesteps']))
+        if checkpoint_state['curr_stage'] is not None:
+            # the envs start on the stage of the checkpoint
+            params['curr_stage'] = checkpoint_state['curr_stage']
+            get_hyperparameters_store(PATHS).update(curr_stage=params['curr_stage'])
+
+    # all tasks of this training follow the curriculum on their own topic
+    next_stage_topic = get_next_stage_topic(AGENT_NAME)
+
     # instantiate gym environment
-    n_envs = 1
-    task_manager = get_predefined_task(params['task_mode'], params['curr_stage'], PATHS)
-    env = DummyVecEnv(
-        [lambda: FlatlandEnv(task_manager, PATHS.get('robot_setting'), PATHS.get('robot_as'), params['reward_fnc'], params['discrete_action_space'], goal_radius=1.00, max_steps_per_episode=200)] * n_envs)
+    if args.n_envs == 1:
+        # training and evaluation share the single simulation
+        eval_ns = ""
+        task_manager = get_predefined_task(params['task_mode'], params['curr_stage'], PATHS, persist_stage=True, next_stage_topic=next_stage_topic)
+        train_env = FlatlandEnv(task_manager, PATHS.get('robot_setting'), PATHS.get('robot_as'), params['reward_fnc'], params['discrete_action_space'], goal_radius=1.00, max_steps_per_episode=200, num_stacked_scans=params['num_stacked_scans'], profile_steps=args.profile)
+        if args.record:
+            train_env = TrajectoryRecorder(train_env, PATHS['trajectories'])
+        # bound to its own name, 'env' is replaced by the vec env
+        env = DummyVecEnv([lambda train_env=train_env: train_env])
+    else:
+        # one simulation per env in the namespaces sim_1, ..., sim_n (see start_training.launch)
+        eval_ns = "eval_sim"
+        if not args.async_eval:
+            # the task of the evaluation simulation owns the curriculum stage in 'hyperparameters.json'
+            task_manager = get_predefined_task(params['task_mode'], params['curr_stage'], PATHS, ns=eval_ns, persist_stage=True, next_stage_topic=next_stage_topic)
+        vec_env_cls = SharedMemoryVecEnv if args.shared_memory else SubprocVecEnv
+        env = vec_env_cls(
+            [make_envs(f"sim_{i+1}", params, PATHS, max_steps_per_episode=200, profile_steps=args.profile, next_stage_topic=next_stage_topic) for i in range(args.n_envs)])
     if params['normalize']:
-        env = VecNormalize(env, training=True, norm_obs=True, norm_reward=False, clip_reward=15)
+        vec_normalize_path = os.path.join(checkpoint if checkpoint is not None else PATHS.get('model'), VEC_NORMALIZE_FILE)
+        if args.load is not None and os.path.isfile(vec_normalize_path):
+            # continues with the observation statistics of the checkpoint or the best model
+            env = VecNormalize.load(vec_normalize_path, env)
+            env.training = True
+        else:
+            env = VecNormalize(env, training=True, norm_obs=True, norm_reward=False, clip_reward=15)
 
     # instantiate eval environment
-    trainstage_cb = InitiateNewTrainStage(TaskManager=task_manager, TreshholdType="rew", rew_threshold=14.5, task_mode=params['task_mode'], verbose=1)
-    eval_env = Monitor(FlatlandEnv(
-        task_manager, PATHS.get('robot_setting'), PATHS.get('robot_as'), params['reward_fnc'], params['discrete_action_space'], goal_radius=1.00, max_steps_per_episode=250),
-        PATHS.get('eval'), info_keywords=("done_reason",))
-    eval_env = DummyVecEnv([lambda: eval_env])
-    if params['normalize']:
-        eval_env = VecNormalize(eval_env, training=False, norm_obs=True, norm_reward=False, clip_reward=15)
-    eval_cb = EvalCallback(
-        eval_env, n_eval_episodes=20, eval_freq=15000, log_path=PATHS.get('eval'), best_model_save_path=PATHS.get('model'), deterministic=True, callback_on_new_best=trainstage_cb)
+    n_eval_episodes = 20
+    # outcomes of the latest evaluation run, for success rate thresholds (TreshholdType="succ_per")
+    eval_outcomes = RecentEpisodeOutcomes(window=n_eval_episodes)
+    trainstage_cb = InitiateNewTrainStage(
+        TreshholdType=args.threshold_type, rew_threshold=args.threshold, succ_per_threshold=args.threshold, task_mode=params['task_mode'], eval_outcomes=eval_outcomes, verbose=1, next_stage_topic=next_stage_topic)
+    if args.async_eval:
+        # the evaluation envs run in their own processes on the simulations eval_sim, eval_sim_2, ... (see start_training.launch)
+        eval_env_fns = []
+        for ns in ["eval_sim"] + [f"eval_sim_{i}" for i in range(2, args.n_eval_envs + 1)]:
+            eval_env_fn = make_envs(ns, params, dict(PATHS, trajectories=None), max_steps_per_episode=250, persist_stage=(ns == "eval_sim"), next_stage_topic=next_stage_topic)
+            monitor_path = os.path.join(PATHS['eval'], ns) if PATHS.get('eval') else None
+            eval_env_fns.append(lambda eval_env_fn=eval_env_fn, monitor_path=monitor_path: Monitor(eval_env_fn(), monitor_path, info_keywords=("done_reason",)))
+        eval_cb = AsyncEvalCallback(
+            eval_env_fns, n_eval_episodes=n_eval_episodes, eval_freq=15000, log_path=PATHS.get('eval'), best_model_save_path=PATHS.get('model'), deterministic=True, callback_after_eval=trainstage_cb, eval_outcomes=eval_outcomes)
+    else:
+        monitored_eval_env = Monitor(EvalOutcomeRecorder(FlatlandEnv(
+            task_manager, PATHS.get('robot_setting'), PATHS.get('robot_as'), params['reward_fnc'], params['discrete_action_space'], goal_radius=1.00, max_steps_per_episode=250, ns=eval_ns, num_stacked_scans=params['num_stacked_scans']),
+            eval_outcomes), PATHS.get('eval'), info_keywords=("done_reason",))
+        eval_env = DummyVecEnv([lambda monitored_eval_env=monitored_eval_env: monitored_eval_env])
+        if params['normalize']:
+            eval_env = VecNormalize(eval_env, training=False, norm_obs=True, norm_reward=False, clip_reward=15)
+        eval_cb = NormalizedEvalCallback(
+            eval_env, n_eval_episodes=n_eval_episodes, eval_freq=15000, log_path=PATHS.get('eval'), best_model_save_path=PATHS.get('model'), deterministic=True, callback_after_eval=trainstage_cb)
 
     # determine mode
     if args.custom_mlp:
@@ -149,6 +215,9 @@ if __name__ == "__main__":
                 policy_kwargs = policy_kwargs_drl_local_planner
             else:
                 policy_kwargs = policy_kwargs_navrep
+            # feed the stacked scans as input channels of the feature extractor
+            policy_kwargs = dict(policy_kwargs, features_extractor_kwargs=dict(
+                policy_kwargs['features_extractor_kwargs'], num_stacked_scans=params['num_stacked_scans']))
 
             model = PPO("CnnPolicy", env, policy_kwargs = policy_kwargs, 
                 gamma = gamma, n_steps = n_steps, ent_coef = ent_coef, learning_rate = learning_rate, vf_coef = vf_coef, 
@@ -156,7 +225,11 @@ if __name__ == "__main__":
                 clip_range = clip_range, tensorboard_log = PATHS.get('tb'), verbose = 1)
     else:
         # load flag
-        if os.path.isfile(os.path.join(PATHS.get('model'), AGENT_NAME + ".zip")):
+        if checkpoint is not None:
+            model = PPO.load(os.path.join(checkpoint, MODEL_FILE), env)
+            # the simulation can't be restored, the first rollout starts with new episodes
+            model._last_obs = None
+        elif os.path.isfile(os.path.join(PATHS.get('model'), AGENT_NAME + ".zip")):
             model = PPO.load(os.path.join(PATHS.get('model'), AGENT_NAME), env)
         elif os.path.isfile(os.path.join(PATHS.get('model'), "best_model.zip")):
             model = PPO.load(os.path.join(PATHS.get('model'), "best_model"), env)
@@ -168,7 +241,15 @@ if __name__ == "__main__":
         n_timesteps = args.n
 
     # start training
-    model.learn(total_timesteps = n_timesteps, callback=eval_cb, reset_num_timesteps = False)
+    callbacks = [eval_cb]
+    if args.checkpoint_freq > 0:
+        callbacks.append(AsyncCheckpointCallback(
+            PATHS.get('checkpoints'), args.checkpoint_freq, get_stage=lambda: get_hyperparameters_store(PATHS).read().get('curr_stage')))
+    if args.profile:
+        callbacks.append(StepProfilerCallback(log_freq=2000, verbose=1))
+    if checkpoint is not None:
+        restore_rng_state(checkpoint)
+    model.learn(total_timesteps = n_timesteps, callback=callbacks, reset_num_timesteps = False)
 
     # update the timesteps the model has trained in total
     update_total_timesteps_json(hyperparams_obj, n_timesteps, PATHS)
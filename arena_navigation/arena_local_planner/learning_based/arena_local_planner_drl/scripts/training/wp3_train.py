@@ -1,5 +1,6 @@
 import os
 import rospy
+import rospkg
 
 from datetime import datetime as dt
 
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# the tests import rl_agent like the installed catkin package and the tools by their full path from the repository root
+_DRL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_REPO_ROOT = os.path.abspath(os.path.join(_DRL_DIR, '..', '..', '..', '..'))
+for path in (_DRL_DIR, _REPO_ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
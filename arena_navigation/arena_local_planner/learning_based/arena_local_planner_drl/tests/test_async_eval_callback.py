@@ -0,0 +1,51 @@
+import multiprocessing as mp
+import threading
+
+import pytest
+
+pytest.importorskip("gym")
+pytest.importorskip("stable_baselines3")
+
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper  # noqa: E402
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.async_eval_callback import _eval_worker  # noqa: E402
+
+
+class ClosableEnv:
+    def close(self):
+        pass
+
+
+def _broken_env():
+    raise RuntimeError("simulation not available")
+
+
+def _start_worker(env_fn):
+    remote, work_remote = mp.Pipe()
+    # the worker closes the parent end it got, which is still needed by the test in the same process
+    unused_remote, _ = mp.Pipe()
+    worker = threading.Thread(target=_eval_worker, args=(work_remote, unused_remote, CloudpickleWrapper(env_fn)),
+                              daemon=True)
+    worker.start()
+    return remote, worker
+
+
+def test_failed_env_creation_is_reported(tmp_path):
+    remote, worker = _start_worker(_broken_env)
+    remote.send(("evaluate", (str(tmp_path / "missing.zip"), None, 1, True)))
+    status, error = remote.recv()
+    assert status == "error" and "simulation not available" in error
+    remote.send(("close", None))
+    worker.join(timeout=10)
+    assert not worker.is_alive()
+
+
+def test_failed_evaluation_is_reported_and_the_worker_keeps_running(tmp_path):
+    remote, worker = _start_worker(ClosableEnv)
+    for _ in range(2):
+        remote.send(("evaluate", (str(tmp_path / "missing.zip"), None, 1, True)))
+        status, error = remote.recv()
+        assert status == "error" and "Traceback" in error
+    remote.send(("close", None))
+    worker.join(timeout=10)
+    assert not worker.is_alive()
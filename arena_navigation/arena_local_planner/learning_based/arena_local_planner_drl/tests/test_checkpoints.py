@@ -0,0 +1,37 @@
+import json
+import os
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.train_agent_utils import (
+    CHECKPOINT_NAME_PREFIX, CHECKPOINT_STATE_FILE, find_latest_checkpoint, load_checkpoint_state)
+
+
+def _make_checkpoint(directory: str, num_timesteps: int, suffix: str = "", with_state: bool = True) -> str:
+    path = os.path.join(directory, CHECKPOINT_NAME_PREFIX + "%012d" % num_timesteps + suffix)
+    os.makedirs(path)
+    if with_state:
+        with open(os.path.join(path, CHECKPOINT_STATE_FILE), "w") as file:
+            json.dump({"num_timesteps": num_timesteps, "curr_stage": 1}, file)
+    return path
+
+
+def test_latest_complete_checkpoint(tmp_path):
+    _make_checkpoint(str(tmp_path), 1000)
+    latest = _make_checkpoint(str(tmp_path), 2000)
+    # a checkpoint is only complete with its state file
+    _make_checkpoint(str(tmp_path), 3000, with_state=False)
+    assert find_latest_checkpoint(str(tmp_path)) == latest
+    assert load_checkpoint_state(latest)["num_timesteps"] == 2000
+
+
+def test_tmp_folders_are_ignored(tmp_path):
+    latest = _make_checkpoint(str(tmp_path), 1000)
+    # crashed after the state file but before the folder was renamed
+    _make_checkpoint(str(tmp_path), 2000, suffix=".tmp")
+    assert find_latest_checkpoint(str(tmp_path)) == latest
+
+
+def test_no_checkpoint(tmp_path):
+    assert find_latest_checkpoint(str(tmp_path)) is None
+    assert find_latest_checkpoint(str(tmp_path / "missing")) is None
+    _make_checkpoint(str(tmp_path), 1000, suffix=".tmp")
+    assert find_latest_checkpoint(str(tmp_path)) is None
@@ -0,0 +1,54 @@
+import pytest
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.eval_stats import (
+    DONE_REASON_COLLISION, DONE_REASON_SUCCESS, EpisodeOutcomes, RecentEpisodeOutcomes, wilson_interval)
+
+
+def _outcomes(successes: int, failures: int) -> EpisodeOutcomes:
+    outcomes = EpisodeOutcomes()
+    for _ in range(successes):
+        outcomes.add(DONE_REASON_SUCCESS)
+    for _ in range(failures):
+        outcomes.add(DONE_REASON_COLLISION)
+    return outcomes
+
+
+def test_wilson_interval_at_the_bounds():
+    assert wilson_interval(0, 10) == pytest.approx((0.0, 0.2775), abs=1e-4)
+    assert wilson_interval(10, 10) == pytest.approx((0.7225, 1.0), abs=1e-4)
+
+
+def test_wilson_interval_is_symmetric_at_one_half():
+    ci_low, ci_high = wilson_interval(50, 100)
+    assert (ci_low, ci_high) == pytest.approx((0.4038, 0.5962), abs=1e-4)
+    assert 0.5 - ci_low == pytest.approx(ci_high - 0.5)
+
+
+def test_wilson_interval_without_episodes():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+
+
+@pytest.mark.parametrize('successes, failures', [(0, 40), (40, 0)])
+def test_clear_cases_stop_early(successes, failures):
+    assert _outcomes(successes, failures).is_estimate_tight(0.05)
+
+
+def test_uncertain_case_needs_more_episodes():
+    assert not _outcomes(20, 20).is_estimate_tight(0.05)
+    # (1.96 / (2 * 0.05))**2 = 384 episodes
+    assert not _outcomes(190, 190).is_estimate_tight(0.05)
+    assert _outcomes(200, 200).is_estimate_tight(0.05)
+
+
+def test_min_episodes_are_always_run():
+    assert not _outcomes(0, 9).is_estimate_tight(0.5)
+    assert _outcomes(0, 10).is_estimate_tight(0.5)
+
+
+def test_recent_outcomes_drop_the_oldest_episode():
+    outcomes = RecentEpisodeOutcomes(window=3)
+    for done_reason in (DONE_REASON_SUCCESS, DONE_REASON_COLLISION, DONE_REASON_COLLISION):
+        outcomes.add(done_reason)
+    assert outcomes.is_full and outcomes.successes == 1
+    outcomes.add(DONE_REASON_COLLISION)
+    assert outcomes.n == 3 and outcomes.successes == 0
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("stable_baselines3")
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.inference_server import (  # noqa: E402
+    InferenceError, InferenceServer)
+
+
+class SumPolicy:
+    """ action is the sum of the observation, fails for negative observations """
+
+    def eval(self):
+        pass
+
+    def predict(self, observations: np.ndarray, deterministic: bool = False):
+        if (observations < 0).any():
+            raise ValueError("negative observation")
+        return observations.sum(axis=1), None
+
+
+@pytest.fixture
+def server():
+    server = InferenceServer({"agent": SumPolicy()}, num_clients=1).start()
+    yield server
+    server.stop()
+
+
+def test_predict(server):
+    client = server.clients[0].for_agent("agent")
+    action, _ = client.predict(np.array([1.0, 2.0]))
+    assert action == 3.0
+
+
+def test_errors_are_raised_by_the_client_and_the_server_keeps_running(server):
+    client = server.clients[0].for_agent("agent")
+    with pytest.raises(InferenceError, match="negative observation"):
+        client.predict(np.array([-1.0, 2.0]))
+    with pytest.raises(InferenceError, match="KeyError"):
+        server.clients[0].for_agent("unknown").predict(np.array([1.0, 2.0]))
+    action, _ = client.predict(np.array([1.0, 2.0]))
+    assert action == 3.0
+    assert server.num_requests == 1
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from rl_agent.utils.reward import RewardCalculator
+
+ROBOT_RADIUS = 0.2
+SAFE_DIST = 0.35
+GOAL_RADIUS = 0.25
+
+
+class PreviousRewardCalculator():
+    """ the hard coded rule_00 and rule_01 the reward rules in configs/reward_rules.yaml replaced """
+
+    def __init__(self, rule: str):
+        self.w_away, self.punishment_not_moving = {'rule_00': (0.25, 0.0001), 'rule_01': (0.4, 0.01)}[rule]
+        self.last_goal_dist = None
+
+    def get_reward(self, laser_scan: np.ndarray, goal_in_robot_frame):
+        reward = 0
+        info = {'is_done': False}
+        if goal_in_robot_frame[0] < GOAL_RADIUS:
+            reward = 15
+            info = {'is_done': True, 'done_reason': 2}
+        if laser_scan.min() < SAFE_DIST:
+            reward -= 0.15
+        if laser_scan.min() <= ROBOT_RADIUS:
+            reward -= 10
+            info = {'is_done': True, 'done_reason': 1}
+        if self.last_goal_dist is not None:
+            delta = self.last_goal_dist - goal_in_robot_frame[0]
+            w = self.w_away if delta < 0 else 0.25
+            reward += -self.punishment_not_moving if delta == 0 else round(w * delta, 3)
+        self.last_goal_dist = goal_in_robot_frame[0]
+        return reward, info
+
+
+@pytest.mark.parametrize('rule', ['rule_00', 'rule_01'])
+def test_rules_match_previous_rules(rule):
+    rng = np.random.RandomState(0)
+    calculator = RewardCalculator(ROBOT_RADIUS, SAFE_DIST, GOAL_RADIUS, rule)
+    for _ in range(50):
+        previous = PreviousRewardCalculator(rule)
+        calculator.reset()
+        goal_dist = rng.uniform(0, 5)
+        for _ in range(40):
+            laser_scan = rng.uniform(0.1, 3.0, size=360).astype(np.float32)
+            # the robot sometimes stands still, which is punished separately
+            if rng.rand() > 0.2:
+                goal_dist = rng.uniform(0, 5)
+            goal_in_robot_frame = (goal_dist, rng.uniform(-np.pi, np.pi))
+
+            expected_reward, expected_info = previous.get_reward(laser_scan, goal_in_robot_frame)
+            reward, info = calculator.get_reward(laser_scan, goal_in_robot_frame)
+
+            # np.round and round may disagree on the last rounded digit
+            assert reward == pytest.approx(expected_reward, abs=1e-3 + 1e-9)
+            assert info == expected_info
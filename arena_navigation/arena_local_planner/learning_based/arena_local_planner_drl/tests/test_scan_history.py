@@ -0,0 +1,44 @@
+import numpy as np
+
+from rl_agent.utils.scan_history import ScanDelay, ScanHistory
+
+
+def _scan(value: float, num_beams: int = 4) -> np.ndarray:
+    return np.full(num_beams, value, dtype=np.float32)
+
+
+def test_history_is_ordered_oldest_first():
+    history = ScanHistory(3, 4)
+    for value in range(1, 6):
+        history.append(_scan(value))
+        expected = [max(value - 2, 1), max(value - 1, 1), value]
+        np.testing.assert_array_equal(history.get()[:, 0], expected)
+
+
+def test_history_is_padded_with_the_first_scan_after_reset():
+    history = ScanHistory(3, 4)
+    for value in range(1, 5):
+        history.append(_scan(value))
+    history.reset()
+    history.append(_scan(7))
+    np.testing.assert_array_equal(history.get(), np.full((3, 4), 7))
+
+
+def test_delay_returns_the_scan_of_delay_steps_ago():
+    delay = ScanDelay(2)
+    delayed = [delay.append(_scan(value))[0] for value in range(1, 6)]
+    # the first scan is repeated until delay scans arrived
+    assert delayed == [1, 1, 1, 2, 3]
+
+
+def test_delay_starts_over_after_reset():
+    delay = ScanDelay(2)
+    for value in range(1, 5):
+        delay.append(_scan(value))
+    delay.reset()
+    assert delay.append(_scan(9))[0] == 9
+
+
+def test_zero_delay_returns_the_current_scan():
+    delay = ScanDelay(0)
+    assert [delay.append(_scan(value))[0] for value in range(1, 4)] == [1, 2, 3]
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+gym = pytest.importorskip("gym")
+pytest.importorskip("stable_baselines3")
+
+from rl_agent.envs.shared_memory_vec_env import SharedMemoryVecEnv  # noqa: E402
+
+
+class CountingEnv(gym.Env):
+    """ observation is (env offset, number of steps), every episode lasts episode_length steps """
+
+    def __init__(self, offset: int, episode_length: int = 3):
+        self.observation_space = gym.spaces.Box(low=0, high=np.inf, shape=(2,), dtype=np.float32)
+        self.action_space = gym.spaces.Discrete(2)
+        self._offset = offset
+        self._episode_length = episode_length
+        self._steps = 0
+
+    def _obs(self):
+        return np.array([self._offset, self._steps], dtype=np.float32)
+
+    def reset(self):
+        self._steps = 0
+        return self._obs()
+
+    def step(self, action):
+        self._steps += 1
+        return self._obs(), float(self._steps), self._steps == self._episode_length, {}
+
+
+@pytest.fixture
+def vec_env():
+    # fork: the env factories do not have to be importable in the workers
+    env = SharedMemoryVecEnv([lambda offset=offset: CountingEnv(offset) for offset in range(2)], start_method="fork")
+    yield env
+    env.close()
+
+
+def test_step_results(vec_env):
+    vec_env.reset()
+    for step in range(1, 7):
+        obs, rewards, dones, infos = vec_env.step(np.zeros(2, dtype=np.int64))
+        steps_in_episode = (step - 1) % 3 + 1
+        done = steps_in_episode == 3
+        np.testing.assert_array_equal(obs, [[0, 0 if done else steps_in_episode], [1, 0 if done else steps_in_episode]])
+        np.testing.assert_array_equal(rewards, [steps_in_episode] * 2)
+        np.testing.assert_array_equal(dones, [done] * 2)
+        if done:
+            np.testing.assert_array_equal(infos[0]["terminal_observation"], [0, 3])
+
+
+def test_previous_observation_survives_the_next_step(vec_env):
+    last_obs = vec_env.reset()
+    for _ in range(4):
+        expected_last_obs = last_obs.copy()
+        obs, _, _, _ = vec_env.step(np.zeros(2, dtype=np.int64))
+        # the algorithms store the previous observation after stepping
+        np.testing.assert_array_equal(last_obs, expected_last_obs)
+        assert not np.shares_memory(obs, last_obs)
+        last_obs = obs
+
+
+def test_buffers_are_reused(vec_env):
+    first_obs = vec_env.reset()
+    second_obs, _, _, _ = vec_env.step(np.zeros(2, dtype=np.int64))
+    third_obs, _, _, _ = vec_env.step(np.zeros(2, dtype=np.int64))
+    # no allocation per step, the slots of the shared block alternate
+    assert np.shares_memory(first_obs, third_obs)
+    assert not np.shares_memory(first_obs, second_obs)
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("gym")
+pytest.importorskip("rospy")
+pytest.importorskip("std_msgs")
+pytest.importorskip("stable_baselines3")
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.eval_stats import (  # noqa: E402
+    DONE_REASON_COLLISION, DONE_REASON_SUCCESS, RecentEpisodeOutcomes)
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.staged_train_callback import InitiateNewTrainStage  # noqa: E402
+
+
+def _callback(threshold: float, successes: int, episodes: int = 20) -> InitiateNewTrainStage:
+    outcomes = RecentEpisodeOutcomes(window=episodes)
+    for i in range(episodes):
+        outcomes.add(DONE_REASON_SUCCESS if i < successes else DONE_REASON_COLLISION)
+    # not staged, no ros publisher is needed to check the threshold
+    callback = InitiateNewTrainStage("succ_per", succ_per_threshold=threshold, task_mode="random", eval_outcomes=outcomes)
+    callback.parent = SimpleNamespace(n_eval_episodes=episodes, last_mean_reward=0.0)
+    return callback
+
+
+@pytest.mark.parametrize("threshold, successes, reached", [
+    (0.8, 16, True), (0.8, 15, False), (1.0, 20, True), (1.0, 19, False)])
+def test_success_rate_threshold_is_reached_at_the_boundary(threshold, successes, reached):
+    assert _callback(threshold, successes)._is_threshold_reached() == reached
+
+
+def test_incomplete_evaluation_does_not_reach_the_threshold():
+    callback = _callback(0.8, 5, episodes=20)
+    callback.eval_outcomes.clear()
+    for _ in range(10):
+        callback.eval_outcomes.add(DONE_REASON_SUCCESS)
+    assert not callback._is_threshold_reached()
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+gym = pytest.importorskip("gym")
+
+from rl_agent.envs.trajectory_recorder import TrajectoryRecorder, TrajectoryStore  # noqa: E402
+
+
+class CountingEnv(gym.Env):
+    """ observation is the number of steps taken so far, every episode lasts episode_length steps """
+
+    def __init__(self, episode_length: int = 4):
+        self.observation_space = gym.spaces.Box(low=0, high=np.inf, shape=(2,), dtype=np.float32)
+        self.action_space = gym.spaces.Box(low=-1, high=1, shape=(2,), dtype=np.float32)
+        self._episode_length = episode_length
+        self._steps = 0
+
+    def _obs(self):
+        return np.full(2, self._steps, dtype=np.float32)
+
+    def reset(self):
+        self._steps = 0
+        return self._obs()
+
+    def step(self, action):
+        self._steps += 1
+        return self._obs(), float(self._steps), self._steps == self._episode_length, {}
+
+
+def _run_episodes(env: gym.Env, num_episodes: int):
+    for _ in range(num_episodes):
+        env.reset()
+        done = False
+        while not done:
+            _, _, done, _ = env.step(np.array([0.5, -0.5], dtype=np.float32))
+
+
+def test_round_trip(tmp_path):
+    recorder = TrajectoryRecorder(CountingEnv(), str(tmp_path), chunk_size=3)
+    _run_episodes(recorder, 2)
+    recorder.close()
+
+    store = TrajectoryStore(str(tmp_path))
+    assert len(store) == 8
+    assert store.observation_dim == 2 and not store.is_action_space_discrete
+    obs, actions, rewards, dones, episodes = store.load()
+    # the observation of a transition is the one the action was chosen on
+    np.testing.assert_array_equal(obs[:, 0], [0, 1, 2, 3] * 2)
+    np.testing.assert_array_equal(actions, np.tile([0.5, -0.5], (8, 1)))
+    np.testing.assert_array_equal(rewards, [1, 2, 3, 4] * 2)
+    np.testing.assert_array_equal(dones, [False, False, False, True] * 2)
+    np.testing.assert_array_equal(episodes, [0] * 4 + [1] * 4)
+
+
+def test_resume_continues_the_recording(tmp_path):
+    recorder = TrajectoryRecorder(CountingEnv(), str(tmp_path), chunk_size=3)
+    _run_episodes(recorder, 1)
+    recorder.close()
+
+    recorder = TrajectoryRecorder(CountingEnv(), str(tmp_path), chunk_size=3)
+    _run_episodes(recorder, 1)
+    recorder.close()
+
+    store = TrajectoryStore(str(tmp_path))
+    assert len(store) == 8
+    rewards, episodes = store.load("rewards", "episodes")
+    np.testing.assert_array_equal(rewards, [1, 2, 3, 4] * 2)
+    np.testing.assert_array_equal(episodes, [0] * 4 + [1] * 4)
+
+
+def test_resume_rejects_another_observation_space(tmp_path):
+    recorder = TrajectoryRecorder(CountingEnv(), str(tmp_path))
+    _run_episodes(recorder, 1)
+    recorder.close()
+
+    env = CountingEnv()
+    env.observation_space = gym.spaces.Box(low=0, high=np.inf, shape=(3,), dtype=np.float32)
+    with pytest.raises(ValueError):
+        TrajectoryRecorder(env, str(tmp_path))
+
+
+def test_store_without_recording(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        TrajectoryStore(str(tmp_path))
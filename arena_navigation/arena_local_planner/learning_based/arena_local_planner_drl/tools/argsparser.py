@@ -15,6 +15,16 @@ def training_args(parser):
     parser.add_argument('--n', type=int, help='timesteps in total to be generated for training')
     parser.add_argument('-log', '--eval_log', action='store_true', help='enables storage of evaluation data')
     parser.add_argument('--tb', action='store_true', help='enables tensorboard logging')
+    parser.add_argument('--n_envs', type=int, default=1, help='number of parallel training environments, each one connected to its own namespaced simulation')
+    parser.add_argument('--shared_memory', action='store_true', help='transfers observations of parallel environments through shared memory instead of pipes')
+    parser.add_argument('--async_eval', action='store_true', help='evaluates in the background on the simulations eval_sim, eval_sim_2, ... while training goes on')
+    parser.add_argument('--n_eval_envs', type=int, default=1, help='number of evaluation environments of --async_eval')
+    parser.add_argument('--record', action='store_true', help='records the trajectories of the training environments to training_logs/trajectories')
+    parser.add_argument('--profile', action='store_true', help='records the durations of the phases of the env steps and the learner and logs them (to tensorboard with --tb)')
+    parser.add_argument('--checkpoint_freq', type=int, default=100000, help='timesteps between two checkpoints of the full training state, 0 disables them')
+    parser.add_argument('--resume', action='store_true', help='continues the training of the agent given by --load from its latest checkpoint')
+    parser.add_argument('--threshold_type', type=str, choices=['rew', 'succ_per'], default='rew', help='metric of an evaluation which advances the training curriculum: mean reward (rew) or success rate (succ_per)')
+    parser.add_argument('--threshold', type=float, help='value of the metric which advances the training curriculum (default: 14.5 for rew, 0.8 for succ_per)')
 
 
 def run_agent_args(parser):
@@ -22,6 +32,49 @@ def run_agent_args(parser):
     parser.add_argument('--load', type=str, metavar="[agent name]", help='agent to be loaded for training')
     parser.add_argument('-s', '--scenario', type=str, metavar="[scenario name]", default='scenario1', help='name of scenario file for deployment')
     parser.add_argument('-v', '--verbose', choices=['0', '1'], default='1')
+    parser.add_argument('--async', dest='async_mode', action='store_true', help='drives the env through its asyncio interface')
+    parser.add_argument('--quantized', action='store_true', help='runs the policy with int8 quantized linear layers on the cpu')
+
+
+def benchmark_quantization_args(parser):
+    parser.add_argument('--load', type=str, metavar="[agent name]", help='agent to be benchmarked')
+    parser.add_argument('--observations', type=str, metavar="[path]", help='.npy file with recorded observations of shape [n, obs_dim]')
+    parser.add_argument('--n', type=int, default=1000, help='number of observations sampled from the observation space if none are given')
+
+
+def test_agent_args(parser):
+    """ program arguments of the noise robustness sweep """
+    parser.add_argument('--no-gpu', action='store_true', help='disables gpu for evaluation')
+    parser.add_argument('--load', type=str, nargs='+', metavar="[agent name]", help='agents to be evaluated')
+    parser.add_argument('--noise_levels', type=float, nargs='+', default=list(range(1, 12)), help='levels of the gaussian noise')
+    parser.add_argument('--noise_mode', type=int, nargs='+', default=[1], help='noise modes added to the laser scan, see rl_agent/utils/noise.py')
+    parser.add_argument('--delays', type=int, nargs='+', default=[0], help='number of steps the observed laser scan lags behind')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0], help='random seeds')
+    parser.add_argument('--episodes', type=int, default=100, help='(maximum) number of episodes per cell of the sweep')
+    parser.add_argument('--ci_half_width', type=float, help='stops a cell early once the half width of the 95%% confidence interval of its success rate is below this value')
+    parser.add_argument('--min_episodes', type=int, default=10, help='number of episodes every cell runs at least when stopping early')
+    parser.add_argument('--stage', type=int, help='training stage to evaluate on, defaults to the current stage of each agent')
+    parser.add_argument('--n_envs', type=int, default=1, help='number of simulations (sim_1 ... sim_n) evaluating in parallel')
+    parser.add_argument('--output', type=str, help='csv file the results are written to')
+    parser.add_argument('--batched_inference', action='store_true', help='evaluates the policies for all simulations in batches in the main process')
+
+
+def offline_noise_eval_args(parser):
+    """ program arguments of the offline noise evaluation """
+    parser.add_argument('--load', type=str, metavar="[agent name]", help='agent to be evaluated')
+    parser.add_argument('--trajectories', type=str, nargs='+', metavar="[path]", help='recorded trajectories, defaults to the ones recorded while training the agent')
+    parser.add_argument('--noise_levels', type=float, nargs='+', default=list(range(1, 12)), help='levels of the gaussian noise')
+    parser.add_argument('--noise_modes', type=int, nargs='+', default=[1, 2, 3, 4], help='noise modes evaluated one by one, see rl_agent/utils/noise.py')
+    parser.add_argument('--max_obs', type=int, default=20000, help='maximum number of recorded observations to evaluate on')
+    parser.add_argument('--batch_size', type=int, default=1024, help='number of observations corrupted and evaluated at once')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the noise')
+    parser.add_argument('--output', type=str, help='csv file the results are written to')
+
+
+def export_agent_args(parser):
+    parser.add_argument('--load', type=str, metavar="[agent name]", help='agent to be exported')
+    parser.add_argument('--format', type=str, choices=['torchscript', 'onnx'], default='torchscript', help='format of the exported policy')
+    parser.add_argument('--output', type=str, help='file the policy is exported to, defaults to policy.pt/policy.onnx in the agent folder')
 
 
 def custom_mlp_args(parser):
@@ -46,6 +99,22 @@ def process_training_args(parsed_args):
     """ argument check function """
     if parsed_args.no_gpu:
         os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+    if parsed_args.n_envs < 1:
+        raise ValueError("Number of environments has to be a positive integer!")
+    if parsed_args.async_eval and parsed_args.n_envs == 1:
+        raise ValueError("Asynchronous evaluation needs its own simulation, train with more than one environment!")
+    if parsed_args.n_eval_envs < 1:
+        raise ValueError("Number of evaluation environments has to be a positive integer!")
+    if parsed_args.resume and parsed_args.load is None:
+        raise ValueError("--resume continues the training of an agent, give its name with --load!")
+    if parsed_args.checkpoint_freq < 0:
+        raise ValueError("The checkpoint frequency can't be negative!")
+    if parsed_args.threshold is None:
+        parsed_args.threshold = 14.5 if parsed_args.threshold_type == "rew" else 0.8
+    elif parsed_args.threshold_type == "succ_per" and not 0 < parsed_args.threshold <= 1:
+        raise ValueError("The success rate threshold has to be in (0, 1]!")
+    if parsed_args.shared_memory and parsed_args.n_envs == 1:
+        print("[shared memory] only used with more than one environment, will be ignored..")
     if parsed_args.custom_mlp:
         setattr(parsed_args, 'net_arch', get_net_arch(parsed_args))
     else:
@@ -64,6 +133,22 @@ def process_run_agent_args(parsed_args):
         raise Exception("No agent name was given!")
 
 
+def process_test_agent_args(parsed_args):
+    if parsed_args.no_gpu:
+        os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+    if parsed_args.load is None:
+        raise Exception("No agent name was given!")
+    if parsed_args.n_envs < 1:
+        raise ValueError("Number of environments has to be a positive integer!")
+    if parsed_args.ci_half_width is not None and not 0 < parsed_args.ci_half_width < 0.5:
+        raise ValueError("Half width of the confidence interval has to be in (0, 0.5)!")
+
+
+def process_export_agent_args(parsed_args):
+    if parsed_args.load is None:
+        raise Exception("No agent name was given!")
+
+
 def parse_training_args(args=None, ignore_unknown=False):
     """ parser for training script """
     arg_populate_funcs = [training_args, custom_mlp_args]
@@ -80,6 +165,38 @@ def parse_run_agent_args(args=None, ignore_unknown=False):
     return parse_various_args(args, arg_populate_funcs, arg_check_funcs, ignore_unknown)
 
 
+def parse_test_agent_args(args=None, ignore_unknown=False):
+    """ parser for the noise robustness sweep """
+    arg_populate_funcs = [test_agent_args]
+    arg_check_funcs = [process_test_agent_args]
+
+    return parse_various_args(args, arg_populate_funcs, arg_check_funcs, ignore_unknown)
+
+
+def parse_offline_noise_eval_args(args=None, ignore_unknown=False):
+    """ parser for the offline noise evaluation """
+    arg_populate_funcs = [offline_noise_eval_args]
+    arg_check_funcs = [process_export_agent_args]
+
+    return parse_various_args(args, arg_populate_funcs, arg_check_funcs, ignore_unknown)
+
+
+def parse_export_agent_args(args=None, ignore_unknown=False):
+    """ parser for the export script """
+    arg_populate_funcs = [export_agent_args]
+    arg_check_funcs = [process_export_agent_args]
+
+    return parse_various_args(args, arg_populate_funcs, arg_check_funcs, ignore_unknown)
+
+
+def parse_benchmark_quantization_args(args=None, ignore_unknown=False):
+    """ parser for the quantization benchmark """
+    arg_populate_funcs = [benchmark_quantization_args]
+    arg_check_funcs = [process_export_agent_args]
+
+    return parse_various_args(args, arg_populate_funcs, arg_check_funcs, ignore_unknown)
+
+
 def parse_various_args(args, arg_populate_funcs, arg_check_funcs, ignore_unknown):
     """ generic arg parsing function """
     parser = argparse.ArgumentParser()
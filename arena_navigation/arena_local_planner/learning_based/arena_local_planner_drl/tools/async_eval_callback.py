@@ -0,0 +1,260 @@
+import multiprocessing as mp
+import os
+import tempfile
+import traceback
+from typing import Callable, List, Optional
+
+import gym
+import numpy as np
+from stable_baselines3 import PPO
+from stable_baselines3.common import logger
+from stable_baselines3.common.callbacks import BaseCallback, EventCallback
+from stable_baselines3.common.vec_env import unwrap_vec_normalize
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.utils.rate_limited_logging import get_logger
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.eval_stats import RecentEpisodeOutcomes
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.policy_export import freeze_vec_normalize, save_vec_normalize
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.train_agent_utils import VEC_NORMALIZE_FILE
+
+_logger = get_logger("async_eval")
+
+
+def _normalize_obs(obs: np.ndarray, normalization) -> np.ndarray:
+    if normalization is None:
+        return obs
+    obs_rms, clip_obs, epsilon = normalization
+    return np.clip((obs - obs_rms.mean) / np.sqrt(obs_rms.var + epsilon), -clip_obs, clip_obs)
+
+
+def _run_eval_episode(policy, env: gym.Env, normalization, deterministic: bool):
+    """ :return: reward, length and done reason of one episode """
+    obs = env.reset()
+    done, info = False, {}
+    episode_reward, episode_length = 0.0, 0
+    while not done:
+        action, _ = policy.predict(_normalize_obs(obs, normalization), deterministic=deterministic)
+        obs, reward, done, info = env.step(action)
+        episode_reward += reward
+        episode_length += 1
+    return episode_reward, episode_length, info.get('done_reason')
+
+
+def _eval_worker(remote, parent_remote, env_fn_wrapper: CloudpickleWrapper) -> None:
+    """ answers every evaluation with ("ok", episodes) or, if it failed, with ("error", traceback) """
+    parent_remote.close()
+    env, env_error = None, None
+    try:
+        env = env_fn_wrapper.var()
+    except Exception:
+        # reported with the first evaluation
+        env_error = traceback.format_exc()
+    while True:
+        try:
+            cmd, data = remote.recv()
+            if cmd == "evaluate":
+                if env_error is not None:
+                    remote.send(("error", env_error))
+                    continue
+                try:
+                    snapshot_path, normalization, n_episodes, deterministic = data
+                    policy = PPO.load(snapshot_path, device="cpu").policy
+                    episodes = [_run_eval_episode(policy, env, normalization, deterministic) for _ in range(n_episodes)]
+                except Exception:
+                    remote.send(("error", traceback.format_exc()))
+                else:
+                    remote.send(("ok", episodes))
+            elif cmd == "close":
+                if env is not None:
+                    env.close()
+                remote.close()
+                break
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the eval worker")
+        except EOFError:
+            break
+
+
+class AsyncEvalCallback(EventCallback):
+    """
+    Evaluates the agent like EvalCallback, but in the background: the episodes run on a pool of evaluation
+    environments in their own processes while the training goes on. At every evaluation the current policy is
+    saved as a snapshot, which the workers load and evaluate. The results are collected as soon as all workers
+    have finished, logged like the ones of EvalCallback and a new best snapshot becomes the best model, its
+    observation statistics are saved as VEC_NORMALIZE_FILE next to it.
+    Then callback_on_new_best is called, and callback_after_eval (e.g. InitiateNewTrainStage) after every
+    evaluation, both with this callback as parent.
+
+    While an evaluation is running, further evaluations are skipped. The policy is evaluated on the observation
+    statistics of the training env at the time of the snapshot. If an evaluation fails in a worker, its traceback
+    is logged and the asynchronous evaluation is disabled for the rest of the training, the training goes on.
+
+    :param env_fns: functions creating the evaluation environments, one process each. Every environment needs
+        its own simulation, e.g. make_envs("eval_sim", ...)
+    :param callback_on_new_best: callback triggered when a new best model is found
+    :param callback_after_eval: callback triggered after every evaluation
+    :param n_eval_episodes: number of episodes per evaluation, distributed over the environments
+    :param eval_freq: evaluates the agent every eval_freq calls of the callback
+    :param log_path: folder the evaluations ('evaluations.npz') are saved to, None to disable
+    :param best_model_save_path: folder the best model is saved to, None to disable
+    :param deterministic: whether the evaluation uses the deterministic actions
+    :param eval_outcomes: buffer the done reasons of the evaluation episodes are added to, see InitiateNewTrainStage
+    :param start_method: method used to start the worker processes, see SubprocVecEnv
+    """
+
+    def __init__(self, env_fns: List[Callable[[], gym.Env]], callback_on_new_best: Optional[BaseCallback] = None,
+                 n_eval_episodes: int = 20, eval_freq: int = 10000, log_path: str = None, best_model_save_path: str = None,
+                 deterministic: bool = True, eval_outcomes: RecentEpisodeOutcomes = None, verbose: int = 1,
+                 start_method: Optional[str] = None, callback_after_eval: Optional[BaseCallback] = None):
+        super(AsyncEvalCallback, self).__init__(callback_on_new_best, verbose=verbose)
+        self.callback_after_eval = callback_after_eval
+        if callback_after_eval is not None:
+            callback_after_eval.parent = self
+        self.n_eval_episodes = n_eval_episodes
+        self.eval_freq = eval_freq
+        self.best_mean_reward = -np.inf
+        self.last_mean_reward = -np.inf
+        self.deterministic = deterministic
+        self.eval_outcomes = eval_outcomes
+        self.best_model_save_path = best_model_save_path
+        if log_path is not None:
+            log_path = os.path.join(log_path, "evaluations")
+        self.log_path = log_path
+        self.evaluations_results = []
+        self.evaluations_timesteps = []
+        self.evaluations_length = []
+
+        snapshot_dir = best_model_save_path if best_model_save_path is not None else tempfile.mkdtemp()
+        self._snapshot_path = os.path.join(snapshot_dir, "eval_snapshot.zip")
+        # episodes per worker
+        n_envs = len(env_fns)
+        self._episodes_per_env = [n_eval_episodes // n_envs + (1 if i < n_eval_episodes % n_envs else 0) for i in range(n_envs)]
+        # timesteps of the running evaluation, None if no evaluation is running
+        self._eval_timesteps = None
+        # observation statistics of the snapshot, None if the observations aren't normalized
+        self._snapshot_vec_normalize = None
+
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        ctx = mp.get_context(start_method)
+        self.remotes, work_remotes = zip(*[ctx.Pipe() for _ in range(n_envs)])
+        self.processes = []
+        for work_remote, remote, env_fn in zip(work_remotes, self.remotes, env_fns):
+            process = ctx.Process(target=_eval_worker, args=(work_remote, remote, CloudpickleWrapper(env_fn)), daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+    def _init_callback(self) -> None:
+        if self.callback_after_eval is not None:
+            self.callback_after_eval.init_callback(self.model)
+        for path in (self.best_model_save_path, self.log_path and os.path.dirname(self.log_path)):
+            if path is not None:
+                os.makedirs(path, exist_ok=True)
+
+    def _on_step(self) -> bool:
+        continue_training = True
+        # only checks the pipes, doesn't wait for the workers
+        if self._eval_timesteps is not None and all(remote.poll() for remote in self._busy_remotes()):
+            continue_training = self._collect_results()
+        if self.eval_freq > 0 and self.n_calls % self.eval_freq == 0:
+            if self._eval_timesteps is None:
+                self._start_evaluation()
+            elif self.verbose > 0:
+                print("Eval num_timesteps={}, skipped, the previous evaluation is still running".format(self.num_timesteps))
+        return continue_training
+
+    def _busy_remotes(self):
+        return [remote for remote, n_episodes in zip(self.remotes, self._episodes_per_env) if n_episodes > 0]
+
+    def _start_evaluation(self):
+        self.model.save(self._snapshot_path)
+        vec_normalize = unwrap_vec_normalize(self.training_env)
+        self._snapshot_vec_normalize = None if vec_normalize is None else freeze_vec_normalize(vec_normalize)
+        normalization = None
+        if vec_normalize is not None and vec_normalize.norm_obs:
+            normalization = (self._snapshot_vec_normalize.obs_rms, vec_normalize.clip_obs, vec_normalize.epsilon)
+        for remote, n_episodes in zip(self.remotes, self._episodes_per_env):
+            if n_episodes > 0:
+                remote.send(("evaluate", (self._snapshot_path, normalization, n_episodes, self.deterministic)))
+        self._eval_timesteps = self.num_timesteps
+
+    def _receive_episodes(self) -> Optional[list]:
+        """ :return: the episodes of all workers, None if the evaluation failed in one of them """
+        episodes, errors = [], []
+        for remote in self._busy_remotes():
+            try:
+                status, data = remote.recv()
+            except EOFError:
+                status, data = "error", "The eval worker process died"
+            if status == "ok":
+                episodes.extend(data)
+            else:
+                errors.append(data)
+        if errors:
+            _logger.error("Evaluation at num_timesteps=%s failed, the asynchronous evaluation is disabled:\n%s",
+                          self._eval_timesteps, "\n".join(errors))
+            self.eval_freq = 0
+            return None
+        return episodes
+
+    def _collect_results(self) -> bool:
+        episodes = self._receive_episodes()
+        timesteps, self._eval_timesteps = self._eval_timesteps, None
+        if episodes is None:
+            self.close()
+            return True
+        episode_rewards = [reward for reward, _, _ in episodes]
+        episode_lengths = [length for _, length, _ in episodes]
+        if self.eval_outcomes is not None:
+            for _, _, done_reason in episodes:
+                self.eval_outcomes.add(done_reason)
+
+        if self.log_path is not None:
+            self.evaluations_timesteps.append(timesteps)
+            self.evaluations_results.append(episode_rewards)
+            self.evaluations_length.append(episode_lengths)
+            np.savez(self.log_path, timesteps=self.evaluations_timesteps, results=self.evaluations_results,
+                     ep_lengths=self.evaluations_length)
+
+        mean_reward, std_reward = np.mean(episode_rewards), np.std(episode_rewards)
+        mean_ep_length, std_ep_length = np.mean(episode_lengths), np.std(episode_lengths)
+        self.last_mean_reward = mean_reward
+        if self.verbose > 0:
+            print(f"Eval num_timesteps={timesteps}, episode_reward={mean_reward:.2f} +/- {std_reward:.2f}")
+            print(f"Episode length: {mean_ep_length:.2f} +/- {std_ep_length:.2f}")
+        logger.record("eval/mean_reward", float(mean_reward))
+        logger.record("eval/mean_ep_length", float(mean_ep_length))
+
+        continue_training = True
+        if mean_reward > self.best_mean_reward:
+            if self.verbose > 0:
+                print("New best mean reward!")
+            if self.best_model_save_path is not None:
+                # the evaluated snapshot, not the current model, which has trained on in the meantime
+                os.replace(self._snapshot_path, os.path.join(self.best_model_save_path, "best_model.zip"))
+                if self._snapshot_vec_normalize is not None:
+                    save_vec_normalize(self._snapshot_vec_normalize, os.path.join(self.best_model_save_path, VEC_NORMALIZE_FILE))
+            self.best_mean_reward = mean_reward
+            if self.callback is not None:
+                continue_training = self._on_event()
+        if self.callback_after_eval is not None:
+            continue_training = self.callback_after_eval.on_step() and continue_training
+        return continue_training
+
+    def _on_training_end(self) -> None:
+        if self._eval_timesteps is not None:
+            # waits for the last evaluation
+            self._collect_results()
+        self.close()
+
+    def close(self):
+        for remote in self.remotes:
+            try:
+                remote.send(("close", None))
+            except BrokenPipeError:
+                # the worker already died
+                pass
+        for process in self.processes:
+            process.join()
+        self.remotes, self.processes = [], []
@@ -0,0 +1,73 @@
+"""
+Checks that the command line tools of the DRL package start fast: runs '<script> --help' of each script
+in a fresh interpreter and fails if one of them takes longer than the budget. Heavy modules (ros, torch,
+stable baselines, the envs) have to be imported after the arguments are parsed to stay within it.
+
+    python tools/check_import_time.py --budget 0.5
+
+Run it from the root of the workspace (the directory containing arena_navigation). With -v the slowest
+imports of each script are listed (python -X importtime).
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+DRL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = (
+    os.path.join('scripts', 'training', 'train_agent.py'),
+    os.path.join('scripts', 'training', 'test_agent.py'),
+    os.path.join('scripts', 'training', 'offline_noise_eval.py'),
+    os.path.join('scripts', 'deployment', 'export_agent.py'),
+    os.path.join('scripts', 'deployment', 'benchmark_quantization.py'),
+)
+
+
+def startup_time(script: str, repeats: int = 3) -> float:
+    """ best wall time of 'python <script> --help' out of 'repeats' runs """
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script, '--help'], check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def slowest_imports(script: str, n: int = 5) -> list:
+    """ the n imports with the highest cumulative time in us, as reported by python -X importtime """
+    result = subprocess.run([sys.executable, '-X', 'importtime', script, '--help'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        imports.append((int(cumulative), module.strip()))
+    return sorted(imports, reverse=True)[:n]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=float, default=0.5, help='maximum startup time of a script in seconds')
+    parser.add_argument('-v', '--verbose', action='store_true', help='lists the slowest imports of each script')
+    args = parser.parse_args()
+
+    # the scripts import the package by its path from the root of the workspace
+    os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')]))
+
+    exceeded = []
+    for script in SCRIPTS:
+        path = os.path.join(DRL_DIR, script)
+        duration = startup_time(path)
+        print("%-50s %.3f s" % (script, duration))
+        if args.verbose:
+            for cumulative, module in slowest_imports(path):
+                print("    %8.1f ms  %s" % (cumulative / 1000, module))
+        if duration > args.budget:
+            exceeded.append(script)
+
+    if exceeded:
+        print("startup time budget of %.2f s exceeded by: %s" % (args.budget, ", ".join(exceeded)))
+        sys.exit(1)
+    print("all scripts start within %.2f s" % args.budget)
@@ -0,0 +1,148 @@
+import io
+import json
+import os
+import pickle
+import random
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import torch as th
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.vec_env import unwrap_vec_normalize
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.train_agent_utils import CHECKPOINT_NAME_PREFIX, CHECKPOINT_STATE_FILE, VEC_NORMALIZE_FILE
+
+# shards of a checkpoint besides VEC_NORMALIZE_FILE, CHECKPOINT_STATE_FILE is written last and lists the others.
+# Finding and reading checkpoints doesn't need torch, see find_latest_checkpoint() in train_agent_utils.py
+MODEL_FILE = "model.zip"
+RNG_FILE = "rng.pkl"
+
+
+def capture_rng_state() -> dict:
+    """ states of the random number generators of the learner process (python, numpy, torch) """
+    state = {"random": random.getstate(), "numpy": np.random.get_state(), "torch": th.get_rng_state()}
+    if th.cuda.is_available():
+        state["torch_cuda"] = th.cuda.get_rng_state_all()
+    return state
+
+
+def restore_rng_state(checkpoint: str):
+    """ sets the random number generators to their state at the time of the checkpoint """
+    with open(os.path.join(checkpoint, RNG_FILE), "rb") as file:
+        state = pickle.load(file)
+    random.setstate(state["random"])
+    np.random.set_state(state["numpy"])
+    th.set_rng_state(state["torch"])
+    if "torch_cuda" in state and th.cuda.is_available():
+        th.cuda.set_rng_state_all(state["torch_cuda"])
+
+
+def _write_file(path: str, data: bytes):
+    with open(path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _write_checkpoint(directory: str, state: dict, shards: Dict[str, bytes], keep_last: int) -> str:
+    """ writes the shards to a temporary folder, which is renamed when it is complete. A crash while writing
+    leaves a '.tmp' folder behind, which is never loaded. """
+    name = CHECKPOINT_NAME_PREFIX + "%012d" % state["num_timesteps"]
+    path = os.path.join(directory, name)
+    tmp_path = path + ".tmp"
+    for old_path in (tmp_path, path):
+        if os.path.isdir(old_path):
+            shutil.rmtree(old_path)
+    os.makedirs(tmp_path)
+    for shard, data in shards.items():
+        _write_file(os.path.join(tmp_path, shard), data)
+    _write_file(os.path.join(tmp_path, CHECKPOINT_STATE_FILE), json.dumps(state, indent=4).encode("utf-8"))
+    os.replace(tmp_path, path)
+
+    # only the latest keep_last checkpoints are kept, incomplete ones are left overs of a crash
+    names = sorted(name for name in os.listdir(directory) if name.startswith(CHECKPOINT_NAME_PREFIX))
+    complete = [name for name in names if not name.endswith(".tmp")]
+    incomplete = [name for name in names if name.endswith(".tmp")]
+    for old_name in complete[:-keep_last] + incomplete:
+        shutil.rmtree(os.path.join(directory, old_name), ignore_errors=True)
+    return path
+
+
+class AsyncCheckpointCallback(BaseCallback):
+    """
+    Saves the full training state every checkpoint_freq timesteps, so that a crashed or stopped training can
+    be continued (train_agent.py --load [agent] --resume). A checkpoint is a folder with one file (shard) per part:
+        model.zip: policy, optimizer and the state of PPO (like model.save())
+        vec_normalize.pkl: observation statistics of the training env, if normalized
+        rng.pkl: states of the random number generators of the learner process
+        state.json: timesteps and curriculum stage, written last
+    The state is copied to memory between two rollouts, where the PPO update of the last rollout is complete
+    and learn() continues after a resume. The files are written by a background thread while the training goes on.
+    If the previous checkpoint is still being written, the checkpoint is skipped.
+
+    :param save_path: folder of the checkpoints, e.g. agents/[agent]/checkpoints
+    :param checkpoint_freq: minimum number of timesteps between two checkpoints
+    :param get_stage: returns the current stage of the training curriculum, None if there is none
+    :param keep_last: number of checkpoints kept, older ones are deleted
+    """
+
+    def __init__(self, save_path: str, checkpoint_freq: int, get_stage: Callable[[], Optional[int]] = None,
+                 keep_last: int = 2, verbose: int = 1):
+        super(AsyncCheckpointCallback, self).__init__(verbose)
+        if keep_last < 1:
+            raise ValueError("At least the latest checkpoint has to be kept (keep_last >= 1)")
+        self.save_path = save_path
+        self.checkpoint_freq = checkpoint_freq
+        self.get_stage = get_stage
+        self.keep_last = keep_last
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+        self._last_checkpoint_timesteps = None
+
+    def _init_callback(self) -> None:
+        os.makedirs(self.save_path, exist_ok=True)
+        # the first checkpoint is written checkpoint_freq timesteps after the start (or the resume)
+        self._last_checkpoint_timesteps = self.num_timesteps
+
+    def _on_rollout_start(self) -> None:
+        if self.num_timesteps - self._last_checkpoint_timesteps >= self.checkpoint_freq:
+            self._checkpoint()
+
+    def _on_step(self) -> bool:
+        return True
+
+    def _checkpoint(self):
+        if self._pending is not None:
+            if not self._pending.done():
+                if self.verbose > 0:
+                    print("Checkpoint at num_timesteps={} skipped, the previous one is still being written".format(self.num_timesteps))
+                return
+            # raises the errors of the previous checkpoint
+            self._pending.result()
+
+        shards = {}
+        model_buffer = io.BytesIO()
+        self.model.save(model_buffer)
+        shards[MODEL_FILE] = model_buffer.getvalue()
+        vec_normalize = unwrap_vec_normalize(self.training_env)
+        if vec_normalize is not None:
+            # VecNormalize.__getstate__ leaves out the env
+            shards[VEC_NORMALIZE_FILE] = pickle.dumps(vec_normalize)
+        shards[RNG_FILE] = pickle.dumps(capture_rng_state())
+        state = {
+            "num_timesteps": int(self.num_timesteps),
+            "curr_stage": self.get_stage() if self.get_stage is not None else None,
+            "shards": sorted(shards)
+        }
+        self._pending = self._executor.submit(_write_checkpoint, self.save_path, state, shards, self.keep_last)
+        self._last_checkpoint_timesteps = self.num_timesteps
+        if self.verbose > 0:
+            print("Checkpoint at num_timesteps={}".format(self.num_timesteps))
+
+    def _on_training_end(self) -> None:
+        # waits for the last checkpoint
+        if self._pending is not None:
+            self._pending.result()
+        self._executor.shutdown(wait=True)
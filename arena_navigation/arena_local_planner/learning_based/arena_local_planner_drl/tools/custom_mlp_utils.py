@@ -1,4 +1,3 @@
-import torch as th
 import argparse
 
 
@@ -31,6 +30,8 @@ def parse_string(string: str):
 
 def get_act_fn(act_fn_string: str):
     """ function to convert str into pytorch activation function class """
+    # torch is imported here, so that parsing the arguments doesn't require it
+    import torch as th
     if act_fn_string == "relu":
         return th.nn.ReLU
     elif act_fn_string == "sigmoid":
@@ -0,0 +1,45 @@
+import os
+from typing import Optional
+
+from stable_baselines3.common.callbacks import BaseCallback, EvalCallback
+from stable_baselines3.common.vec_env import unwrap_vec_normalize
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.policy_export import save_vec_normalize
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.train_agent_utils import VEC_NORMALIZE_FILE
+
+
+class NormalizedEvalCallback(EvalCallback):
+    """
+    EvalCallback which saves the observation statistics of the training env (VecNormalize) together with the
+    best model, as VEC_NORMALIZE_FILE next to 'best_model.zip'. They are the statistics the best model was
+    evaluated with (EvalCallback syncs them to the evaluation env before every evaluation) and are needed to
+    run, export or continue training the agent.
+
+    Takes the same parameters as EvalCallback and
+    :param callback_after_eval: callback triggered after every evaluation, e.g. InitiateNewTrainStage
+    """
+
+    def __init__(self, *args, callback_after_eval: Optional[BaseCallback] = None, **kwargs):
+        super(NormalizedEvalCallback, self).__init__(*args, **kwargs)
+        self.callback_after_eval = callback_after_eval
+        if callback_after_eval is not None:
+            callback_after_eval.parent = self
+
+    def _init_callback(self) -> None:
+        super(NormalizedEvalCallback, self)._init_callback()
+        if self.callback_after_eval is not None:
+            self.callback_after_eval.init_callback(self.model)
+
+    def _on_step(self) -> bool:
+        best_mean_reward = self.best_mean_reward
+        continue_training = super(NormalizedEvalCallback, self)._on_step()
+        is_evaluated = self.eval_freq > 0 and self.n_calls % self.eval_freq == 0
+        if not is_evaluated:
+            return continue_training
+        if self.last_mean_reward > best_mean_reward and self.best_model_save_path is not None:
+            vec_normalize = unwrap_vec_normalize(self.training_env)
+            if vec_normalize is not None:
+                save_vec_normalize(vec_normalize, os.path.join(self.best_model_save_path, VEC_NORMALIZE_FILE))
+        if self.callback_after_eval is not None:
+            continue_training = self.callback_after_eval.on_step() and continue_training
+        return continue_training
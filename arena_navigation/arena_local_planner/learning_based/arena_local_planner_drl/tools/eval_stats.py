@@ -0,0 +1,109 @@
+import math
+from collections import deque
+from typing import Tuple
+
+# done reasons of FlatlandEnv
+DONE_REASON_TIMEOUT = 0
+DONE_REASON_COLLISION = 1
+DONE_REASON_SUCCESS = 2
+
+
+def wilson_interval(successes: int, n: int, z: float = 1.96) -> Tuple[float, float]:
+    """ Wilson score interval of a success rate, also well-behaved for rates close to 0 or 1 and small n
+
+    :param successes: number of successful episodes
+    :param n: number of episodes
+    :param z: quantile of the standard normal distribution, 1.96 for a 95% interval
+    """
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denominator = 1 + z**2 / n
+    center = (p + z**2 / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+class EpisodeOutcomes:
+    """
+    Counts the outcomes of evaluation episodes by their done reason
+    (0 - exceeded max steps, 1 - collision, 2 - goal reached).
+
+    :param z: quantile of the standard normal distribution used for the confidence interval
+    """
+
+    def __init__(self, z: float = 1.96):
+        self.z = z
+        self.counts = [0, 0, 0]
+
+    def add(self, done_reason: int):
+        self.counts[done_reason] += 1
+
+    @property
+    def n(self) -> int:
+        return sum(self.counts)
+
+    @property
+    def successes(self) -> int:
+        return self.counts[DONE_REASON_SUCCESS]
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.n if self.n > 0 else 0.0
+
+    def confidence_interval(self) -> Tuple[float, float]:
+        return wilson_interval(self.successes, self.n, self.z)
+
+    def is_estimate_tight(self, max_half_width: float, min_episodes: int = 10) -> bool:
+        """ stopping rule of the sequential evaluation: the success rate is known precisely enough once the
+        half width of the confidence interval drops below max_half_width. Clear cases (success rate close to
+        0 or 1) stop after few episodes, uncertain ones need up to (z / (2 * max_half_width))**2 episodes.
+        min_episodes guards against stopping on a lucky streak at the very beginning.
+
+        :param max_half_width: half width of the confidence interval at which the evaluation can stop
+        :param min_episodes: number of episodes which are always run
+        """
+        if self.n < min_episodes:
+            return False
+        ci_low, ci_high = self.confidence_interval()
+        return (ci_high - ci_low) / 2 <= max_half_width
+
+    def as_dict(self) -> dict:
+        ci_low, ci_high = self.confidence_interval()
+        return {
+            'episodes': self.n,
+            'successes': self.successes,
+            'collisions': self.counts[DONE_REASON_COLLISION],
+            'timeouts': self.counts[DONE_REASON_TIMEOUT],
+            'success_rate': round(self.success_rate, 4),
+            'ci_low': round(ci_low, 4),
+            'ci_high': round(ci_high, 4)
+        }
+
+
+class RecentEpisodeOutcomes(EpisodeOutcomes):
+    """
+    Outcomes of the last 'window' episodes, e.g. of the latest evaluation run. Adding an episode is O(1),
+    the outcome of the oldest episode is dropped from the counts once the window is full.
+
+    :param window: number of episodes considered
+    :param z: quantile of the standard normal distribution used for the confidence interval
+    """
+
+    def __init__(self, window: int, z: float = 1.96):
+        super(RecentEpisodeOutcomes, self).__init__(z)
+        self._done_reasons = deque(maxlen=window)
+
+    def add(self, done_reason: int):
+        if len(self._done_reasons) == self._done_reasons.maxlen:
+            self.counts[self._done_reasons[0]] -= 1
+        self._done_reasons.append(done_reason)
+        super(RecentEpisodeOutcomes, self).add(done_reason)
+
+    @property
+    def is_full(self) -> bool:
+        return len(self._done_reasons) == self._done_reasons.maxlen
+
+    def clear(self):
+        self._done_reasons.clear()
+        self.counts = [0, 0, 0]
@@ -0,0 +1,134 @@
+import multiprocessing as mp
+import threading
+import time
+import traceback
+from multiprocessing import connection
+from typing import Dict
+
+import numpy as np
+import torch as th
+from stable_baselines3.common.policies import BasePolicy
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.utils.rate_limited_logging import get_logger
+
+_logger = get_logger("inference_server")
+
+# inference_mode is the cheaper no_grad of newer torch versions
+_inference_mode = th.inference_mode if hasattr(th, "inference_mode") else th.no_grad
+
+
+class InferenceError(RuntimeError):
+    """ raised by InferenceClient.predict() if the server failed to compute the action, contains the traceback of the server """
+
+
+class InferenceClient:
+    """
+    Drop-in replacement of model.predict() for processes which don't hold the policy themselves.
+    The observation is sent to the InferenceServer, which answers with the action.
+
+    :param conn: client end of the pipe to the server
+    :param agent_name: name of the policy on the server the requests are meant for
+    """
+
+    def __init__(self, conn: connection.Connection, agent_name: str = None):
+        self._conn = conn
+        self.agent_name = agent_name
+
+    def for_agent(self, agent_name: str) -> "InferenceClient":
+        return InferenceClient(self._conn, agent_name)
+
+    def predict(self, observation: np.ndarray, state=None, mask=None, deterministic: bool = False):
+        """ same interface as the predict() of stable baselines for a single (not vectorized) observation """
+        self._conn.send((self.agent_name, observation, deterministic))
+        action, error = self._conn.recv()
+        if error is not None:
+            raise InferenceError("The inference server failed to predict the action for agent '%s':\n%s"
+                                 % (self.agent_name, error))
+        return action, None
+
+
+class InferenceServer:
+    """
+    Serves the policies for several environments running in other processes. The observations of all
+    clients which are waiting for an action are gathered, stacked per policy and evaluated in one forward
+    pass, then the actions are scattered back to the clients. Like this the cost of a forward pass is shared
+    by all environments stepping at the same time instead of being paid once per environment.
+
+    The server runs in a thread of the process holding the policies. Its clients are handed to the
+    environment processes (e.g. as arguments of the process), each process has to use its own client.
+    If the forward pass of a batch fails, the traceback is logged and sent to the clients of the batch, whose
+    predict() raises an InferenceError. The server keeps serving the other batches.
+
+    :param policies: policies by agent name, e.g. {name: PPO.load(path).policy}
+    :param num_clients: number of processes requesting actions
+    :param max_wait: time in seconds the server waits for further requests once the first one arrived
+    :param ctx: multiprocessing context the pipes are created with
+    """
+
+    def __init__(self, policies: Dict[str, BasePolicy], num_clients: int, max_wait: float = 0.001, ctx=None):
+        ctx = ctx or mp
+        self._policies = policies
+        for policy in policies.values():
+            policy.eval()
+        self._max_wait = max_wait
+        pipes = [ctx.Pipe() for _ in range(num_clients)]
+        self._conns = [server_conn for server_conn, _ in pipes]
+        self.clients = [InferenceClient(client_conn) for _, client_conn in pipes]
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        # number of forward passes and served requests, batch size = requests / forward passes
+        self.num_forward_passes = 0
+        self.num_requests = 0
+
+    def start(self) -> "InferenceServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        for conn in self._conns:
+            conn.close()
+
+    def _serve(self):
+        open_conns = list(self._conns)
+        while open_conns and not self._stopped.is_set():
+            ready = connection.wait(open_conns, timeout=0.1)
+            if not ready:
+                continue
+            if len(ready) < len(open_conns) and self._max_wait > 0:
+                # give the other clients the chance to join the batch
+                time.sleep(self._max_wait)
+                ready = connection.wait(open_conns, timeout=0)
+
+            # requests grouped by (agent name, deterministic)
+            requests = {}
+            for conn in ready:
+                try:
+                    agent_name, observation, deterministic = conn.recv()
+                except EOFError:
+                    # the client process has finished
+                    open_conns.remove(conn)
+                    continue
+                requests.setdefault((agent_name, deterministic), []).append((conn, observation))
+
+            for (agent_name, deterministic), batch in requests.items():
+                try:
+                    observations = np.stack([observation for _, observation in batch])
+                    with _inference_mode():
+                        actions, _ = self._policies[agent_name].predict(observations, deterministic=deterministic)
+                except Exception:
+                    error = traceback.format_exc()
+                    _logger.error("Inference of a batch of %d requests for agent '%s' failed:\n%s",
+                                  len(batch), agent_name, error)
+                    replies = [(None, error)] * len(batch)
+                else:
+                    replies = [(action, None) for action in actions]
+                    self.num_forward_passes += 1
+                    self.num_requests += len(batch)
+                for (conn, _), reply in zip(batch, replies):
+                    try:
+                        conn.send(reply)
+                    except (BrokenPipeError, ConnectionResetError):
+                        # the client process died while waiting
+                        open_conns.remove(conn)
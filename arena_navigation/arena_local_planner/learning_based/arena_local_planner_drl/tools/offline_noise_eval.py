@@ -0,0 +1,105 @@
+import time
+from collections import namedtuple
+from typing import List
+
+import gym
+import numpy as np
+import torch as th
+from stable_baselines3.common.policies import ActorCriticPolicy
+from stable_baselines3.common.vec_env import VecNormalize
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.utils.noise import Noise
+
+# one noise mode (see rl_agent/utils/noise.py) with a noise level, the level only scales the gaussian noise (mode 1)
+NoiseCell = namedtuple('NoiseCell', ['noise_mode', 'noise_level'])
+
+RESULT_FIELDS = list(NoiseCell._fields) + ['observations', 'kl', 'action_agreement', 'value_drift', 'duration']
+
+# the observation of FlatlandEnv ends with the distance and angle to the goal, everything before are laser scans
+NUM_GOAL_FEATURES = 2
+
+
+def build_noise_cells(noise_modes: List[int], noise_levels: List[float]) -> List[NoiseCell]:
+    """ every noise mode on its own, the gaussian noise with every level, the other modes don't have a level """
+    cells = []
+    for noise_mode in noise_modes:
+        levels = noise_levels if noise_mode == 1 else [1]
+        cells.extend(NoiseCell(noise_mode, noise_level) for noise_level in levels)
+    return cells
+
+
+def _policy_outputs(policy: ActorCriticPolicy, observations: th.Tensor):
+    """ action distribution, deterministic action and value of a batch of (normalized) observations """
+    latent_pi, latent_vf, latent_sde = policy._get_latent(observations)
+    distribution = policy._get_action_dist_from_latent(latent_pi, latent_sde)
+    return distribution, distribution.get_actions(deterministic=True), policy.value_net(latent_vf).flatten()
+
+
+def evaluate_noise_offline(policy: ActorCriticPolicy, observations: np.ndarray, cells: List[NoiseCell], max_range: float,
+                           vec_normalize: VecNormalize = None, batch_size: int = 1024, action_tolerance: float = 0.05,
+                           seed: int = 0) -> List[dict]:
+    """
+    Measures how much the noise of each cell changes the decisions of a policy on recorded observations,
+    without a simulation: the laser scans of the observations are corrupted in batches by Noise.add_noise_batch()
+    and the policy is evaluated on the clean and the noisy batch.
+
+    Per cell the mean over all observations of
+        kl: KL divergence of the action distribution on the noisy from the one on the clean observation
+        action_agreement: share of observations the deterministic action stays the same, continuous actions
+            count as the same if no component differs by more than action_tolerance times its range
+        value_drift: absolute change of the value estimate
+
+    :param policy: policy of the trained PPO model
+    :param observations: raw (not normalized) observations of FlatlandEnv in the order they were recorded,
+        e.g. of a TrajectoryStore, shape [n, obs_dim]
+    :param max_range: maximum range of the laser scanner, the noisy scans are clipped to it
+    :param vec_normalize: VecNormalize of the training, None if the observations weren't normalized
+    :param seed: seed of the noise, every cell gets the same random numbers
+    :return: one dict with the RESULT_FIELDS per cell
+    """
+    policy = policy.to("cpu").eval()
+    is_discrete = isinstance(policy.action_space, gym.spaces.Discrete)
+    if not is_discrete:
+        action_low, action_high = policy.action_space.low, policy.action_space.high
+        max_deviation = action_tolerance * (action_high - action_low)
+    num_scan_values = observations.shape[1] - NUM_GOAL_FEATURES
+
+    noises = [Noise(noise_mode=[cell.noise_mode], noise_level=cell.noise_level) for cell in cells]
+    rngs = [np.random.default_rng(seed) for _ in cells]
+    sums = np.zeros((len(cells), 3))
+    durations = np.zeros(len(cells))
+
+    def normalize(obs: np.ndarray) -> th.Tensor:
+        if vec_normalize is not None:
+            obs = vec_normalize.normalize_obs(obs)
+        return th.as_tensor(obs, dtype=th.float32)
+
+    with th.no_grad():
+        for start in range(0, len(observations), batch_size):
+            clean_obs = np.asarray(observations[start:start + batch_size], dtype=np.float32)
+            clean_dist, clean_actions, clean_values = _policy_outputs(policy, normalize(clean_obs))
+            if not is_discrete:
+                clean_actions = np.clip(clean_actions.numpy(), action_low, action_high)
+
+            for idx, (noise, rng) in enumerate(zip(noises, rngs)):
+                cell_start = time.time()
+                noisy_obs = clean_obs.copy()
+                noisy_obs[:, :num_scan_values] = noise.add_noise_batch(clean_obs[:, :num_scan_values], max_range, rng)
+                noisy_dist, noisy_actions, noisy_values = _policy_outputs(policy, normalize(noisy_obs))
+
+                kl = th.distributions.kl_divergence(clean_dist.distribution, noisy_dist.distribution)
+                if kl.dim() > 1:
+                    # independent dimensions of the continuous action
+                    kl = kl.sum(dim=1)
+                if is_discrete:
+                    agreement = (clean_actions == noisy_actions).numpy()
+                else:
+                    deviation = np.abs(clean_actions - np.clip(noisy_actions.numpy(), action_low, action_high))
+                    agreement = np.all(deviation <= max_deviation, axis=1)
+                sums[idx] += (kl.sum().item(), agreement.sum(), th.abs(noisy_values - clean_values).sum().item())
+                durations[idx] += time.time() - cell_start
+
+    means = sums / max(len(observations), 1)
+    return [dict(cell._asdict(), observations=len(observations), kl=round(float(kl), 6), action_agreement=round(float(agreement), 4),
+                 value_drift=round(float(value_drift), 6), duration=round(float(duration), 2))
+            for cell, (kl, agreement, value_drift), duration in zip(cells, means, durations)]
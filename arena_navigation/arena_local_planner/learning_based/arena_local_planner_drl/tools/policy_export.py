@@ -0,0 +1,146 @@
+import json
+import os
+import pickle
+
+import gym
+import numpy as np
+import torch as th
+from torch import nn
+from stable_baselines3.common.policies import ActorCriticPolicy
+from stable_baselines3.common.vec_env import VecNormalize
+
+EXPORT_FORMATS = ("torchscript", "onnx")
+
+
+class DeterministicPolicy(nn.Module):
+    """
+    The part of an actor critic policy needed to act: observation normalization, feature extractor
+    (e.g. CNN_NAVREP, DRL_LOCAL_PLANNER), policy latent network and the most likely action. The value
+    network and the action distribution are left out.
+
+    :param policy: policy of the trained PPO model
+    :param vec_normalize: VecNormalize of the training, its observation statistics are frozen into the module.
+        None if the observations weren't normalized.
+    """
+
+    def __init__(self, policy: ActorCriticPolicy, vec_normalize: VecNormalize = None):
+        super(DeterministicPolicy, self).__init__()
+        self.features_extractor = policy.features_extractor
+        self.mlp_extractor = policy.mlp_extractor
+        self.action_net = policy.action_net
+        self.is_discrete = isinstance(policy.action_space, gym.spaces.Discrete)
+        self.normalize_obs = vec_normalize is not None and vec_normalize.norm_obs
+
+        obs_dim = policy.observation_space.shape[0]
+        if self.normalize_obs:
+            obs_mean = vec_normalize.obs_rms.mean
+            obs_std = np.sqrt(vec_normalize.obs_rms.var + vec_normalize.epsilon)
+            clip_obs = vec_normalize.clip_obs
+        else:
+            obs_mean, obs_std, clip_obs = np.zeros(obs_dim), np.ones(obs_dim), np.inf
+        self.register_buffer("obs_mean", th.as_tensor(obs_mean, dtype=th.float32))
+        self.register_buffer("obs_std", th.as_tensor(obs_std, dtype=th.float32))
+        self.clip_obs = float(clip_obs)
+
+        if self.is_discrete:
+            action_low, action_high = np.zeros(1), np.zeros(1)
+        else:
+            action_low, action_high = policy.action_space.low, policy.action_space.high
+        self.register_buffer("action_low", th.as_tensor(action_low, dtype=th.float32))
+        self.register_buffer("action_high", th.as_tensor(action_high, dtype=th.float32))
+
+    def forward(self, observations: th.Tensor) -> th.Tensor:
+        """
+        :param observations: batch of raw observations of the env, shape [batch, obs_dim]
+        :return: (th.Tensor) actions, indices of the discrete actions or clipped continuous actions
+        """
+        if self.normalize_obs:
+            observations = th.clamp((observations - self.obs_mean) / self.obs_std, -self.clip_obs, self.clip_obs)
+        latent_pi, _ = self.mlp_extractor(self.features_extractor(observations.float()))
+        action_out = self.action_net(latent_pi)
+        if self.is_discrete:
+            return th.argmax(action_out, dim=1)
+        return th.max(th.min(action_out, self.action_high), self.action_low)
+
+
+class FusedPolicy:
+    """
+    CPU inference with the observation normalization fused into the network (see DeterministicPolicy), can be
+    used in place of model.predict() on the raw observations of an env that isn't wrapped into VecNormalize.
+
+    :param policy: policy of the trained PPO model
+    :param vec_normalize: VecNormalize whose observation statistics are applied inside the network,
+        None if the observations are already normalized (or weren't normalized in training)
+    """
+
+    def __init__(self, policy: ActorCriticPolicy, vec_normalize: VecNormalize = None):
+        self.observation_space = policy.observation_space
+        self.action_space = policy.action_space
+        self._module = self._build_module(DeterministicPolicy(policy, vec_normalize).to("cpu").eval())
+
+    def _build_module(self, module: DeterministicPolicy) -> nn.Module:
+        return module
+
+    def predict(self, observation: np.ndarray, state=None, mask=None, deterministic: bool = True):
+        """ same interface as the predict() of stable baselines, always acts deterministically """
+        observations = np.asarray(observation, dtype=np.float32)
+        is_single = observations.ndim == 1
+        with th.no_grad():
+            actions = self._module(th.from_numpy(observations[None] if is_single else observations)).numpy()
+        return (actions[0] if is_single else actions), state
+
+
+def load_vec_normalize(path: str) -> VecNormalize:
+    """ loads the statistics saved with VecNormalize.save() or save_vec_normalize() without the need of an env """
+    with open(path, "rb") as file:
+        vec_normalize = pickle.load(file)
+    # frozen, the statistics of a saved agent are not updated anymore
+    vec_normalize.training = False
+    return vec_normalize
+
+
+def freeze_vec_normalize(vec_normalize: VecNormalize) -> VecNormalize:
+    """ copy of the statistics of a VecNormalize, detached from its env (like VecNormalize.save() and load) """
+    # VecNormalize.__getstate__ leaves out the env
+    return pickle.loads(pickle.dumps(vec_normalize))
+
+
+def save_vec_normalize(vec_normalize: VecNormalize, path: str):
+    """ like VecNormalize.save(), but the file is replaced atomically, a reader never sees a half written file """
+    with open(path + ".tmp", "wb") as file:
+        pickle.dump(vec_normalize, file)
+    os.replace(path + ".tmp", path)
+
+
+def export_policy(policy: ActorCriticPolicy, path: str, vec_normalize: VecNormalize = None, export_format: str = "torchscript"):
+    """
+    Freezes the policy and the observation statistics into a TorchScript (.pt) or ONNX (.onnx) file which
+    can be run without stable baselines, see tools/policy_runtime.py. A json file with the same name
+    describes the in- and output of the network.
+
+    :param policy: policy of the trained PPO model
+    :param path: file the network is written to
+    :param vec_normalize: VecNormalize of the training, None if the observations weren't normalized
+    :param export_format: 'torchscript' or 'onnx'
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError("Unknown export format '%s', choose one of %s" % (export_format, EXPORT_FORMATS))
+    module = DeterministicPolicy(policy, vec_normalize).to("cpu").eval()
+    example_obs = th.as_tensor(policy.observation_space.sample()[None], dtype=th.float32)
+
+    with th.no_grad():
+        if export_format == "torchscript":
+            traced = th.jit.trace(module, example_obs)
+            th.jit.save(th.jit.freeze(traced) if hasattr(th.jit, "freeze") else traced, path)
+        else:
+            th.onnx.export(module, example_obs, path, input_names=["observation"], output_names=["action"],
+                           dynamic_axes={"observation": {0: "batch"}, "action": {0: "batch"}}, opset_version=11)
+
+    metadata = {
+        "format": export_format,
+        "observation_dim": int(policy.observation_space.shape[0]),
+        "discrete_action_space": module.is_discrete,
+        "normalized_observations": module.normalize_obs
+    }
+    with open(os.path.splitext(path)[0] + ".json", "w") as file:
+        json.dump(metadata, file, indent=4)
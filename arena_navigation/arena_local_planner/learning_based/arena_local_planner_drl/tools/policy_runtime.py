@@ -0,0 +1,55 @@
+"""
+Minimal runtime for policies exported with tools/policy_export.py. It only needs torch (TorchScript) or
+onnxruntime (ONNX), stable baselines and the env are not imported.
+"""
+import json
+import os
+
+import numpy as np
+
+
+class ExportedPolicy:
+    """
+    Runs an exported policy on raw observations, the observation normalization is part of the network.
+
+    :param path: exported .pt or .onnx file
+    :param num_threads: number of CPU threads used for the inference, one is the fastest for single observations
+    """
+
+    def __init__(self, path: str, num_threads: int = 1):
+        with open(os.path.splitext(path)[0] + ".json", "r") as file:
+            self.metadata = json.load(file)
+        self.is_discrete = self.metadata["discrete_action_space"]
+
+        if self.metadata["format"] == "onnx":
+            try:
+                import onnxruntime
+            except ImportError:
+                raise ImportError("Running ONNX policies requires onnxruntime, install it with 'pip install onnxruntime'")
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = num_threads
+            self._session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+            self._predict = self._predict_onnx
+        else:
+            import torch as th
+            th.set_num_threads(num_threads)
+            self._th = th
+            self._module = th.jit.load(path, map_location="cpu")
+            self._predict = self._predict_torchscript
+
+    def _predict_torchscript(self, observations: np.ndarray) -> np.ndarray:
+        with self._th.no_grad():
+            return self._module(self._th.from_numpy(observations)).numpy()
+
+    def _predict_onnx(self, observations: np.ndarray) -> np.ndarray:
+        return self._session.run(None, {"observation": observations})[0]
+
+    def predict(self, observation: np.ndarray) -> np.ndarray:
+        """
+        :param observation: a single observation [obs_dim] or a batch [batch, obs_dim]
+        :return: action(s), index of the discrete action or [linear, angular] velocity
+        """
+        observations = np.asarray(observation, dtype=np.float32)
+        is_single = observations.ndim == 1
+        actions = self._predict(observations[None] if is_single else observations)
+        return actions[0] if is_single else actions
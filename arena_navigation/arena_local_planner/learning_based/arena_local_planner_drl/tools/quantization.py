@@ -0,0 +1,33 @@
+import copy
+
+import torch as th
+from torch import nn
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.policy_export import DeterministicPolicy, FusedPolicy
+
+# torch >= 1.10 moved the quantization api to torch.ao
+_quantization = th.ao.quantization if hasattr(th, "ao") else th.quantization
+
+
+def quantize_dynamic(module: nn.Module) -> nn.Module:
+    """
+    Dynamic int8 quantization: the weights of the Linear layers are stored as int8, activations are
+    quantized on the fly. PyTorch offers dynamic quantization only for Linear (and recurrent) layers,
+    the Conv1d layers of CNN_NAVREP and DRL_LOCAL_PLANNER stay in float32.
+    The given module is not changed, the quantized copy runs on the CPU.
+    """
+    module = copy.deepcopy(module).to("cpu").eval()
+    return _quantization.quantize_dynamic(module, {nn.Linear}, dtype=th.qint8, inplace=True)
+
+
+class QuantizedPolicy(FusedPolicy):
+    """
+    CPU inference with the dynamically quantized network of a policy, can be used in place of model.predict().
+
+    :param policy: policy of the trained PPO model
+    :param vec_normalize: VecNormalize whose observation statistics are applied inside the network,
+        None if the observations are already normalized (or weren't normalized in training)
+    """
+
+    def _build_module(self, module: DeterministicPolicy) -> nn.Module:
+        return quantize_dynamic(module)
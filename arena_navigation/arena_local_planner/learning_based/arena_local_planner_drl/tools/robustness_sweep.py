@@ -0,0 +1,188 @@
+import csv
+import itertools
+import multiprocessing as mp
+import os
+import random
+import time
+from collections import OrderedDict, namedtuple
+from typing import List
+
+import numpy as np
+import rospy
+from stable_baselines3 import PPO
+from stable_baselines3.common.vec_env import DummyVecEnv, VecNormalize
+
+from task_generator.task_generator.tasks import get_predefined_task
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.envs.flatland_gym_env import FlatlandEnv
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.eval_stats import EpisodeOutcomes
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.inference_server import InferenceServer
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.train_agent_utils import VEC_NORMALIZE_FILE, agent_hyperparams, load_hyperparameters_json
+
+# one cell of the sweep grid, evaluated with 'episodes' episodes in one simulation
+SweepCell = namedtuple('SweepCell', ['agent', 'noise_level', 'delay', 'seed'])
+
+# settings of the env of an agent, agents with equal settings share the env of a worker
+EnvConfig = namedtuple('EnvConfig', ['task_mode', 'stage', 'reward_fnc', 'discrete_action_space', 'num_stacked_scans'])
+
+RESULT_FIELDS = list(SweepCell._fields) + [
+    'episodes', 'successes', 'collisions', 'timeouts', 'success_rate', 'ci_low', 'ci_high', 'namespace', 'duration']
+
+# state of a sweep worker process, set up by _init_worker()
+_worker = {}
+
+
+def build_cells(agents: List[str], noise_levels: List[float], delays: List[int], seeds: List[int]) -> List[SweepCell]:
+    return [SweepCell(*cell) for cell in itertools.product(agents, noise_levels, delays, seeds)]
+
+
+def get_env_config(agent_name: str, PATHS: dict, stage: int = None) -> EnvConfig:
+    """ settings of the env an agent is evaluated in, read from its 'hyperparameters.json'
+
+    :param stage: training stage to evaluate on, defaults to the current stage of the agent
+    """
+    params = load_hyperparameters_json(agent_hyperparams, _agent_paths(PATHS, agent_name))
+    return EnvConfig(params['task_mode'], stage if stage is not None else params['curr_stage'], params['reward_fnc'],
+                     params['discrete_action_space'], params['num_stacked_scans'])
+
+
+def _agent_paths(PATHS: dict, agent_name: str) -> dict:
+    return dict(PATHS, model=os.path.join(PATHS['agents'], agent_name))
+
+
+def run_episode(model, env: FlatlandEnv, vec_normalize: VecNormalize = None) -> int:
+    """ runs one episode with the deterministic policy of the model
+
+    :param model: PPO model or InferenceClient, actions of continuous action spaces are clipped by their predict()
+    :param vec_normalize: VecNormalize holding the observation statistics of the training, None if not normalized
+    :return: done reason of the episode (0 - exceeded max steps, 1 - collision, 2 - goal reached)
+    """
+    obs = env.reset()
+    done, info = False, {}
+    while not done:
+        if vec_normalize is not None:
+            obs = vec_normalize.normalize_obs(obs)
+        action, _ = model.predict(obs, deterministic=True)
+        obs, _, done, info = env.step(action)
+    return info['done_reason']
+
+
+def _init_worker(namespaces, PATHS: dict, settings: dict, env_config: EnvConfig, inference_clients: list):
+    # a simulation can only hold one task, all agents of the worker are evaluated in the same env
+    worker_idx, ns = namespaces.get()
+    rospy.init_node(f"sweep_worker_{ns}", disable_signals=True)
+    task_manager = get_predefined_task(env_config.task_mode, env_config.stage, PATHS, ns=ns)
+    env = FlatlandEnv(
+        task_manager, PATHS.get('robot_setting'), PATHS.get('robot_as'), env_config.reward_fnc, env_config.discrete_action_space,
+        goal_radius=settings['goal_radius'], max_steps_per_episode=settings['max_steps_per_episode'], ns=ns,
+        num_stacked_scans=env_config.num_stacked_scans, noise_model=settings['noise_model'], curriculum_noise=False)
+    inference_client = inference_clients[worker_idx] if inference_clients else None
+    _worker.update(ns=ns, PATHS=PATHS, settings=settings, env=env, agents={}, inference_client=inference_client)
+
+
+def _load_agent(agent_name: str):
+    """ model and observation normalization of an agent, loaded once per worker """
+    if agent_name not in _worker['agents']:
+        PATHS = _agent_paths(_worker['PATHS'], agent_name)
+        params = load_hyperparameters_json(agent_hyperparams, PATHS)
+        if _worker['inference_client'] is not None:
+            model = _worker['inference_client'].for_agent(agent_name)
+        else:
+            model = PPO.load(os.path.join(PATHS['model'], "best_model"))
+
+        vec_normalize = None
+        vec_normalize_path = os.path.join(PATHS['model'], VEC_NORMALIZE_FILE)
+        if params['normalize'] and os.path.isfile(vec_normalize_path):
+            env = _worker['env']
+            vec_normalize = VecNormalize.load(vec_normalize_path, DummyVecEnv([lambda: env]))
+            vec_normalize.training = False
+        _worker['agents'][agent_name] = (model, vec_normalize)
+    return _worker['agents'][agent_name]
+
+
+def _run_cell(cell: SweepCell) -> dict:
+    model, vec_normalize = _load_agent(cell.agent)
+    env = _worker['env']
+    random.seed(cell.seed)
+    np.random.seed(cell.seed)
+    # the task draws the layouts from its own generator, a layout prefetched under the previous seed is dropped
+    env.task.seed(cell.seed)
+    env.observation_collector.set_noise_level(cell.noise_level)
+    env.observation_collector.set_scan_delay(cell.delay)
+
+    settings = _worker['settings']
+    start = time.time()
+    outcomes = EpisodeOutcomes()
+    while outcomes.n < settings['episodes']:
+        if settings['ci_half_width'] is not None and outcomes.is_estimate_tight(settings['ci_half_width'], settings['min_episodes']):
+            break
+        outcomes.add(run_episode(model, env, vec_normalize))
+    return dict(cell._asdict(), **outcomes.as_dict(), namespace=_worker['ns'], duration=round(time.time() - start, 1))
+
+
+def run_sweep(cells: List[SweepCell], namespaces: List[str], PATHS: dict, output_path: str, episodes: int = 100,
+              noise_model: List[int] = None, goal_radius: float = 1.0, max_steps_per_episode: int = 200, stage: int = None,
+              ci_half_width: float = None, min_episodes: int = 10, batched_inference: bool = False):
+    """
+    Evaluates all cells of the sweep in parallel, one worker process per simulation namespace. Every worker
+    creates one task and env in its simulation and keeps it, and the models it loaded, over all cells it gets.
+    Agents whose envs differ (see EnvConfig) are evaluated one group after another, each group by new workers,
+    since a simulation can only hold the obstacles of one task. The result of every cell is appended to the csv file at
+    'output_path' as soon as it is finished, so an interrupted sweep keeps its results.
+
+    :param namespaces: namespaces of the simulations to be used, e.g. ["sim_1", "sim_2"]
+    :param PATHS: paths as in the training script, 'agents' is the folder containing the agents
+    :param episodes: number of episodes per cell, the maximum number if ci_half_width is given
+    :param noise_model: noise modes added to the laser scan, the noise level of a cell scales the gaussian noise.
+        Defaults to [1]
+    :param stage: training stage the agents are evaluated on, defaults to the current stage of each agent
+    :param ci_half_width: enables early stopping, a cell ends as soon as the half width of the confidence
+        interval of its success rate is below this value (see EpisodeOutcomes.is_estimate_tight)
+    :param min_episodes: number of episodes every cell runs at least when early stopping is enabled
+    :param batched_inference: the policies are evaluated by an InferenceServer in this process, which batches
+        the observations of all workers, instead of by every worker on its own
+    """
+    if noise_model is None:
+        noise_model = [1]
+    settings = dict(episodes=episodes, noise_model=noise_model, goal_radius=goal_radius,
+                    max_steps_per_episode=max_steps_per_episode,
+                    ci_half_width=ci_half_width, min_episodes=min_episodes)
+    ctx = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+    namespace_queue = ctx.Queue()
+
+    groups = OrderedDict()
+    env_configs = {agent: get_env_config(agent, PATHS, stage) for agent in sorted({cell.agent for cell in cells})}
+    for cell in cells:
+        groups.setdefault(env_configs[cell.agent], []).append(cell)
+
+    inference_server = None
+    if batched_inference:
+        agents = sorted({cell.agent for cell in cells})
+        policies = {agent: PPO.load(os.path.join(PATHS['agents'], agent, "best_model")).policy for agent in agents}
+        inference_server = InferenceServer(policies, len(namespaces), ctx=ctx).start()
+    inference_clients = inference_server.clients if inference_server is not None else None
+
+    start = time.time()
+    i = 0
+    with open(output_path, 'w', newline='') as result_file:
+        writer = csv.DictWriter(result_file, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        for env_config, group_cells in groups.items():
+            if len(groups) > 1:
+                print("evaluating %d cells in env %s" % (len(group_cells), env_config))
+            # the tasks of the new workers remove the obstacles the workers of the previous group left behind
+            for worker_idx, ns in enumerate(namespaces):
+                namespace_queue.put((worker_idx, ns))
+            with ctx.Pool(len(namespaces), initializer=_init_worker,
+                          initargs=(namespace_queue, PATHS, settings, env_config, inference_clients)) as pool:
+                for result in pool.imap_unordered(_run_cell, group_cells):
+                    i += 1
+                    writer.writerow(result)
+                    result_file.flush()
+                    print("[%d/%d] agent %s, noise level %s, delay %s, seed %s: success rate %.3f [%.3f, %.3f] after %d episodes"
+                          % (i, len(cells), result['agent'], result['noise_level'], result['delay'], result['seed'],
+                             result['success_rate'], result['ci_low'], result['ci_high'], result['episodes']))
+    print("sweep of %d cells finished in %.1f s, results saved to %s" % (len(cells), time.time() - start, output_path))
+    if inference_server is not None:
+        inference_server.stop()
+        print("batched inference: %d requests in %d forward passes"
+              % (inference_server.num_requests, inference_server.num_forward_passes))
@@ -0,0 +1,17 @@
+import functools
+
+
+@functools.lru_cache(maxsize=None)
+def _ros_pack():
+    # rospkg is only imported once a path is actually needed
+    import rospkg
+    return rospkg.RosPack()
+
+
+@functools.lru_cache(maxsize=None)
+def get_package_path(package: str) -> str:
+    """ path of a ros package, every package is only looked up once per process
+
+    :param package: name of the package, e.g. 'arena_local_planner_drl'
+    """
+    return _ros_pack().get_path(package)
@@ -1,38 +1,89 @@
+import gym
+import rospy
+from std_msgs.msg import Bool
 from stable_baselines3.common.callbacks import BaseCallback
-from task_generator.task_generator.tasks import StagedRandomTask
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.tools.eval_stats import RecentEpisodeOutcomes
+
+
+class EvalOutcomeRecorder(gym.Wrapper):
+    """
+    Adds the done reason of every finished episode of the wrapped (evaluation) env to an outcome buffer,
+    which makes the success rate of the latest evaluation available to InitiateNewTrainStage.
+
+    :param env: env whose info contains 'done_reason' at the end of an episode, e.g. FlatlandEnv
+    :param outcomes: buffer of the recent outcomes, its window should be the number of evaluation episodes
+    """
+    def __init__(self, env: gym.Env, outcomes: RecentEpisodeOutcomes):
+        super(EvalOutcomeRecorder, self).__init__(env)
+        self.outcomes = outcomes
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        if done:
+            self.outcomes.add(info['done_reason'])
+        return obs, reward, done, info
+
 
 class InitiateNewTrainStage(BaseCallback):
     """
-    Introduces new training stage when threshhold reached.
-    It must be used with "EvalCallback".
+    Introduces new training stage when threshhold reached by an evaluation.
+    It must be used as callback_after_eval of NormalizedEvalCallback or AsyncEvalCallback, so that the
+    thresholds are checked after every evaluation, not only after those with a new best mean reward.
+    The new stage is announced on next_stage_topic to which the task managers of all (training and evaluation)
+    environments of the training are subscribed, regardless of the process they live in.
 
-    :param TaskManager (obj, StagedRandomTask): holds task specific methods and stages
     :param TheshholdType (str): checks threshhold for either percentage of successful episodes (succ_per) or mean reward (rew)
     :param StartAt (int): stage to start training with
     :param rew_threshold (int): mean reward threshold to trigger new stage
     :param succ_per_threshold (float): threshold percentage of succesful episodes to trigger new stage
     :param task_mode (str): training task mode, if not 'staged' callback won't be called
+    :param eval_outcomes (RecentEpisodeOutcomes): outcomes of the evaluation episodes recorded by an EvalOutcomeRecorder
+        around the evaluation env, needed for succ_per
+    :param next_stage_topic (str): topic of the training run, see get_next_stage_topic() in train_agent_utils.py
     :param verbose:
     """
-    def __init__(self, TaskManager: StagedRandomTask, TreshholdType: str, rew_threshold: float = 10, succ_per_threshold: float = 0.8, task_mode: str = "staged", verbose = 0):
+    def __init__(self, TreshholdType: str, rew_threshold: float = 10, succ_per_threshold: float = 0.8, task_mode: str = "staged", eval_outcomes: RecentEpisodeOutcomes = None, verbose = 0, next_stage_topic: str = None):
         super(InitiateNewTrainStage, self).__init__(verbose = verbose)
-        self.task_manager = TaskManager
         self.threshhold_type = TreshholdType
         self.rew_threshold = rew_threshold
         self.succ_per_threshold = succ_per_threshold
+        if TreshholdType == "succ_per" and eval_outcomes is None:
+            raise ValueError("Threshold type 'succ_per' needs the outcomes of the evaluation episodes (eval_outcomes)")
+        self.eval_outcomes = eval_outcomes
         self.verbose = verbose
         self.activated = bool(task_mode == "staged")
+        if self.activated:
+            if next_stage_topic is None:
+                raise ValueError("The staged training needs the topic its tasks follow the curriculum on (next_stage_topic)")
+            self._publisher_next_stage = rospy.Publisher(next_stage_topic, Bool, queue_size=1)
 
     def _on_step(self) -> bool:
-        assert self.parent is not None, "'InitiateNewTrainStage' callback must be used " "with an 'EvalCallback'"
+        assert self.parent is not None, "'InitiateNewTrainStage' callback must be used " "as 'callback_after_eval' of an evaluation callback"
         
         if self.activated:
             if self.parent.n_eval_episodes < 10:
                 raise Warning("Only %d evaluation episodes considered for threshold monitoring" % self.parent.n_eval_episodes)
 
-            #TODO: access eval episodes to calculate percentage (consider editing EvalCallBack of stablebaselines3)
-            if (self.threshhold_type == "rew" and self.parent.best_mean_reward > self.rew_threshold) or (self.threshhold_type == "succ_per" and 99 > self.succ_per_threshold):
-                self.task_manager.next_stage()
-                self.parent.best_mean_reward = 0
+            if self._is_threshold_reached():
+                self._publisher_next_stage.publish(Bool(data=True))
+                # best_mean_reward is kept, the best model of the previous stage isn't replaced by a worse one
+                if self.eval_outcomes is not None:
+                    # episodes of the previous stage don't count for the next one
+                    self.eval_outcomes.clear()
+
+        return True
+
+    def _is_threshold_reached(self) -> bool:
+        if self.threshhold_type == "rew":
+            return self.parent.last_mean_reward > self.rew_threshold
+        # reaching the threshold is enough, a threshold of 1.0 can only be reached, not exceeded
+        return self.threshhold_type == "succ_per" and self._success_rate() >= self.succ_per_threshold
 
-        return True
\ No newline at end of file
+    def _success_rate(self) -> float:
+        """ success rate of the latest evaluation, 0 until a complete evaluation was recorded """
+        if not self.eval_outcomes.is_full:
+            return 0.0
+        if self.verbose > 0:
+            print("success rate of the last %d evaluation episodes: %.1f%%" % (self.eval_outcomes.n, self.eval_outcomes.success_rate * 100))
+        return self.eval_outcomes.success_rate
@@ -0,0 +1,104 @@
+import time
+from collections import defaultdict
+
+import numpy as np
+from stable_baselines3.common import logger
+from stable_baselines3.common.callbacks import BaseCallback
+
+from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.utils.step_profiler import StepProfiler
+
+
+def _tensorboard_writer():
+    """ the SummaryWriter of the logger of the training, None if tensorboard logging is disabled """
+    for output_format in logger.Logger.CURRENT.output_formats:
+        if isinstance(output_format, logger.TensorBoardOutputFormat):
+            return output_format.writer
+    return None
+
+
+class StepProfilerCallback(BaseCallback):
+    """
+    Shows where the time of a training run goes. Collects the phases recorded by the training envs
+    (FlatlandEnv(profile_steps=True): action_publish, sync_wait, sim_step, sim_step_iterations, noise, reward,
+    task_reset) and measures the phases of the learner:
+        policy_forward: forward pass of the policy while collecting the rollout
+        env_step: step of the vec env as seen by the learner (waits for the slowest env) and the bookkeeping
+            of the rollout, i.e. the time between two steps without policy_forward
+        policy_update: PPO update (forward and backward passes over the rollout buffer) between two rollouts
+
+    Every log_freq calls the mean of every phase is recorded to the logger ("profiler/env/<phase>",
+    "profiler/learner/<phase>", durations in seconds) and its distribution is logged as histogram to
+    tensorboard, if enabled.
+
+    :param log_freq: number of calls (steps of the vec env) between two logs
+    :param verbose: prints the phases sorted by their total time at every log
+    """
+
+    def __init__(self, log_freq: int = 10000, verbose: int = 0):
+        super(StepProfilerCallback, self).__init__(verbose)
+        self.log_freq = log_freq
+        self.profiler = StepProfiler()
+        self._step_start = None
+        self._update_start = None
+        self._forward_duration = 0.0
+
+    def _init_callback(self) -> None:
+        # on_policy_algorithm calls policy.forward() directly, a forward hook wouldn't see it. The update
+        # uses evaluate_actions(), so only the forward passes of the rollout are timed.
+        policy_forward = self.model.policy.forward
+
+        def timed_forward(*args, **kwargs):
+            start = time.perf_counter()
+            result = policy_forward(*args, **kwargs)
+            self._forward_duration += time.perf_counter() - start
+            return result
+
+        self.model.policy.forward = timed_forward
+
+    def _on_rollout_start(self) -> None:
+        if self._update_start is not None:
+            self.profiler.record("policy_update", time.perf_counter() - self._update_start)
+        self._step_start = time.perf_counter()
+        self._forward_duration = 0.0
+
+    def _on_step(self) -> bool:
+        now = time.perf_counter()
+        self.profiler.record("policy_forward", self._forward_duration)
+        self.profiler.record("env_step", now - self._step_start - self._forward_duration)
+        self._step_start = now
+        self._forward_duration = 0.0
+        if self.n_calls % self.log_freq == 0:
+            self._log()
+        return True
+
+    def _on_rollout_end(self) -> None:
+        self._update_start = time.perf_counter()
+
+    def _on_training_end(self) -> None:
+        # removes the timing wrapper of _init_callback()
+        del self.model.policy.forward
+
+    def _log(self):
+        env_samples = defaultdict(list)
+        for profile in self.training_env.env_method("pop_step_profile"):
+            for phase, samples in profile.items():
+                env_samples[phase].append(samples)
+        phases = {"env/" + phase: np.concatenate(samples) for phase, samples in env_samples.items()}
+        phases.update(("learner/" + phase, samples) for phase, samples in self.profiler.pop().items())
+
+        writer = _tensorboard_writer()
+        for phase, samples in phases.items():
+            if len(samples) == 0:
+                continue
+            logger.record("profiler/" + phase, float(np.mean(samples)))
+            if writer is not None:
+                writer.add_histogram("profiler/" + phase, samples, self.num_timesteps)
+        if writer is not None:
+            writer.flush()
+
+        if self.verbose > 0:
+            print("profile of the last %d steps (total time, mean, 95th percentile):" % self.log_freq)
+            durations = {phase: samples for phase, samples in phases.items() if not phase.endswith("_iterations") and len(samples) > 0}
+            for phase, samples in sorted(durations.items(), key=lambda item: -item[1].sum()):
+                print("    {:28s}{:9.2f} s {:9.2f} ms {:9.2f} ms".format(
+                    phase, samples.sum(), samples.mean() * 1000, np.percentile(samples, 95) * 1000))
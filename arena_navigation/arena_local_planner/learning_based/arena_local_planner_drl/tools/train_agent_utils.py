@@ -1,7 +1,20 @@
 import os
 import datetime
 import json
+import re
+from typing import Optional
 
+from task_generator.task_generator.run_state_store import get_run_state_store
+
+# file in the agent folder the observation statistics of VecNormalize are saved to
+VEC_NORMALIZE_FILE = "vec_normalize.pkl"
+# file in the agent folder with the hyperparameters and the state of the training (n_timesteps, curr_stage)
+HYPERPARAMETERS_FILE = "hyperparameters.json"
+# folder in the agent folder the checkpoints are written to, one sub folder per checkpoint (see tools/checkpoints.py)
+CHECKPOINT_DIR = "checkpoints"
+CHECKPOINT_NAME_PREFIX = "step_"
+# file of a checkpoint which is written last and lists the others
+CHECKPOINT_STATE_FILE = "state.json"
 
 class agent_hyperparams(object):
     """ Class containing agent specific hyperparameters (for documentation purposes)
@@ -27,9 +40,10 @@ class agent_hyperparams(object):
     :param task_mode: Mode tasks will be generated in (custom, random, staged).
     :param curr_stage: In case of staged training which stage to start with.
     :param n_timesteps: The number of timesteps trained on in total.
+    :param num_stacked_scans: Number of consecutive laser scans the agent observes.
     """
     def __init__(self, agent_name: str, robot: str, gamma: float, n_steps: int, ent_coef: float, learning_rate: float, vf_coef: float, max_grad_norm: float, gae_lambda: float,
-                 batch_size: int, n_epochs: int, clip_range: float, reward_fnc: str, discrete_action_space: bool, normalize: bool, task_mode: str, curr_stage: int = 0, n_timesteps: int = 0):
+                 batch_size: int, n_epochs: int, clip_range: float, reward_fnc: str, discrete_action_space: bool, normalize: bool, task_mode: str, curr_stage: int = 0, n_timesteps: int = 0, num_stacked_scans: int = 1):
         self.agent_name = agent_name
         self.robot = robot 
         self.gamma = gamma 
@@ -48,6 +62,7 @@ class agent_hyperparams(object):
         self.task_mode = task_mode
         self.curr_stage = curr_stage
         self.n_timesteps = n_timesteps
+        self.num_stacked_scans = num_stacked_scans
 
 
 def initialize_hyperparameters(agent_name: str, PATHS: dict, hyperparams_obj: agent_hyperparams, load_target: str):
@@ -72,10 +87,7 @@ def write_hyperparameters_json(hyperparams_obj: agent_hyperparams, PATHS: dict):
     :param hyperparams_obj(object, agent_hyperparams): object containing containing model specific hyperparameters
     :param PATHS: dictionary containing model specific paths
     """
-    doc_location = os.path.join(PATHS.get('model'), "hyperparameters.json")
-
-    with open(doc_location, "w", encoding='utf-8') as target:
-        json.dump(hyperparams_obj.__dict__, target, ensure_ascii=False, indent=4)
+    get_hyperparameters_store(PATHS).write(hyperparams_obj.__dict__)
 
 
 def load_hyperparameters_json(hyperparams_obj: agent_hyperparams, PATHS: dict):
@@ -85,11 +97,11 @@ def load_hyperparameters_json(hyperparams_obj: agent_hyperparams, PATHS: dict):
     :param hyperparams_obj(object, agent_hyperparams): object containing containing model specific hyperparameters
     :param PATHS: dictionary containing model specific paths
     """
-    doc_location = os.path.join(PATHS.get('model'), "hyperparameters.json")
-
-    if os.path.isfile(doc_location):
-        with open(doc_location, "r") as file:
-            hyperparams = json.load(file)
+    store = get_hyperparameters_store(PATHS)
+    if store.exists():
+        hyperparams = store.read()
+        # parameters introduced after the agent was trained
+        hyperparams.setdefault('num_stacked_scans', 1)
         check_hyperparam_format(hyperparams_obj=hyperparams_obj, loaded_hyperparams=hyperparams, PATHS=PATHS)
         return hyperparams
     else:
@@ -103,18 +115,99 @@ def update_total_timesteps_json(hyperparams_obj: agent_hyperparams, timesteps: i
     :param hyperparams_obj(object, agent_hyperparams): object containing containing model specific hyperparameters
     :param PATHS: dictionary containing model specific paths
     """
-    doc_location = os.path.join(PATHS.get('model'), "hyperparameters.json")
-    hyperparams = load_hyperparameters_json(hyperparams_obj=hyperparams_obj, PATHS=PATHS)
-    
-    try:
-        curr_timesteps = int(hyperparams['n_timesteps']) + timesteps
-        hyperparams['n_timesteps'] = curr_timesteps
-    except Exception:
-        raise Warning("Parameter 'total_timesteps' not found or not of type Integer in 'hyperparameter.json'!")
-    else:
-        with open(doc_location, "w", encoding='utf-8') as target:
-            json.dump(hyperparams, target, ensure_ascii=False, indent=4)
-    
+    load_hyperparameters_json(hyperparams_obj=hyperparams_obj, PATHS=PATHS)
+
+    def add_timesteps(hyperparams: dict):
+        try:
+            hyperparams['n_timesteps'] = int(hyperparams['n_timesteps']) + timesteps
+        except Exception:
+            raise Warning("Parameter 'total_timesteps' not found or not of type Integer in 'hyperparameter.json'!")
+
+    # read-modify-write under the lock of the store, the curriculum may update curr_stage at the same time
+    get_hyperparameters_store(PATHS).modify(add_timesteps)
+
+
+def get_hyperparameters_store(PATHS: dict):
+    """
+    Store of the 'hyperparameters.json' of the agent, see RunStateStore
+
+    :param PATHS: dictionary containing model specific paths
+    """
+    return get_run_state_store(os.path.join(PATHS.get('model'), HYPERPARAMETERS_FILE))
+
+
+def find_latest_checkpoint(directory: str) -> Optional[str]:
+    """
+    The complete checkpoint with the most timesteps in directory, None if there is none
+
+    :param directory: folder of the checkpoints, e.g. PATHS['checkpoints']
+    """
+    if not os.path.isdir(directory):
+        return None
+    # '.tmp' folders are left overs of a crash while writing, even if their state file was written already
+    checkpoints = [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                   if name.startswith(CHECKPOINT_NAME_PREFIX) and not name.endswith(".tmp")
+                   and os.path.isfile(os.path.join(directory, name, CHECKPOINT_STATE_FILE))]
+    return checkpoints[-1] if checkpoints else None
+
+
+def load_checkpoint_state(checkpoint: str) -> dict:
+    """
+    The content of the state file of a checkpoint: num_timesteps, curr_stage and the list of shards
+
+    :param checkpoint: folder of the checkpoint, as returned by find_latest_checkpoint()
+    """
+    with open(os.path.join(checkpoint, CHECKPOINT_STATE_FILE), "r") as file:
+        return json.load(file)
+
+
+def get_next_stage_topic(agent_name: str) -> str:
+    """
+    Topic the training curriculum of a training run is advanced on (see InitiateNewTrainStage), unique per run so
+    that several trainings, or a training and an evaluation, on one ros master don't advance each other's curriculum
+
+    :param agent_name: Precise agent name (as generated by get_agent_name())
+    """
+    return "/%s_%d/next_stage" % (re.sub(r"[^A-Za-z0-9_]", "_", agent_name), os.getpid())
+
+
+def make_envs(ns: str, params: dict, PATHS: dict, max_steps_per_episode: int = 200, profile_steps: bool = False, persist_stage: bool = False,
+              next_stage_topic: str = None):
+    """
+    Returns a function creating a FlatlandEnv connected to the simulation in namespace 'ns'.
+    Intended to be used with SubprocVecEnv: every env runs in its own process and therefore
+    initializes its own ros node, task manager and observation collector.
+
+    :param ns: namespace of the simulation, e.g. "sim_1"
+    :param params: dictionary containing the agent specific hyperparameters
+    :param PATHS: dictionary containing model specific paths, if PATHS['trajectories'] is set the env
+        records its trajectories to PATHS['trajectories']/ns
+    :param max_steps_per_episode: maximum number of steps per episode
+    :param profile_steps: the env records the durations of its phases, see StepProfilerCallback
+    :param persist_stage: the task of the env writes the curriculum stage to 'hyperparameters.json'
+    :param next_stage_topic: topic the task of the env follows the training curriculum on, see get_next_stage_topic()
+    """
+    def _init():
+        # imported in the env process, loading and inspecting hyperparameters doesn't need ros
+        import rospy
+        from task_generator.task_generator.tasks import get_predefined_task
+        from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.envs.flatland_gym_env import FlatlandEnv
+
+        if not rospy.core.is_initialized():
+            rospy.init_node(f"train_env_{ns}", disable_signals=True)
+        task_manager = get_predefined_task(params['task_mode'], params['curr_stage'], PATHS, ns=ns, persist_stage=persist_stage, next_stage_topic=next_stage_topic)
+        env = FlatlandEnv(
+            task_manager, PATHS.get('robot_setting'), PATHS.get('robot_as'), params['reward_fnc'], params['discrete_action_space'],
+            goal_radius=1.00, max_steps_per_episode=max_steps_per_episode, ns=ns, num_stacked_scans=params['num_stacked_scans'],
+            profile_steps=profile_steps)
+        if PATHS.get('trajectories') is not None:
+            # every env records to its own directory
+            from arena_navigation.arena_local_planner.learning_based.arena_local_planner_drl.rl_agent.envs.trajectory_recorder import TrajectoryRecorder
+            env = TrajectoryRecorder(env, os.path.join(PATHS['trajectories'], ns))
+        return env
+
+    return _init
+
 
 def print_hyperparameters(hyperparams_obj: agent_hyperparams):
     print("\n--------------------------------")
@@ -0,0 +1,45 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import rospy
+
+# positions of one episode: robot start and goal (Pose2D) and the poses of the active obstacles
+# {name: (x, y, theta)}, sampled for the map and obstacles of the given layout version (see RandomTask)
+TaskLayout = namedtuple('TaskLayout', ['version', 'start_pos', 'goal_pos', 'obstacle_poses'])
+
+
+class LayoutPrefetcher:
+    """ Samples the layout of the next episode in a background thread while the current episode runs, so that
+    a reset only has to move the robot and the obstacles. Sampling the free positions on the map is pure python
+    and doesn't call any service of the simulation.
+    """
+
+    def __init__(self, sample_layout: Callable[[], TaskLayout]):
+        """
+        Args:
+            sample_layout (Callable[[], TaskLayout]): samples a new layout, it must not change the simulation
+        """
+        self._sample_layout = sample_layout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="layout_prefetcher")
+        self._future = None
+
+    def prefetch(self):
+        """ starts sampling the next layout, unless one is prefetched already """
+        if self._future is None:
+            self._future = self._executor.submit(self._sample_layout)
+
+    def pop(self) -> Optional[TaskLayout]:
+        """ the prefetched layout, waits for it if the sampling is still running.
+
+        Returns:
+            the layout, None if nothing was prefetched or the sampling failed
+        """
+        future, self._future = self._future, None
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            rospy.logwarn("prefetching the task layout failed: %r" % e)
+            return None
@@ -23,30 +23,33 @@ class ObstaclesManager:
     A manager class using flatland provided services to spawn, move and delete obstacles.
     """
 
-    def __init__(self, map_: OccupancyGrid, is_training=True):
+    def __init__(self, map_: OccupancyGrid, is_training=True, ns: str = ""):
         """
         Args:
             map_ (OccupancyGrid):
             is_training (bool, optional): is it training or testing. Defaults to True.
+            ns (str, optional): namespace of the simulation the obstacles belong to, e.g. "sim_1". Defaults to "".
             plugin_name: The name of the plugin which is used to control the movement of the obstacles, Currently we use "RandomMove" for training and Tween2 for evaluation.
                 The Plugin Tween2 can move the the obstacle along a trajectory which can be assigned by multiple waypoints with a constant velocity.Defaults to "RandomMove".
         """
+        self.ns = ns
+        self.ns_prefix = "" if ns == "" else "/" + ns + "/"
         # a list of publisher to move the obstacle to the start pos.
         self._move_all_obstacles_start_pos_pubs = []
 
         # setup proxy to handle  services provided by flatland
-        rospy.wait_for_service('move_model', timeout=20)
-        rospy.wait_for_service('delete_model', timeout=20)
-        rospy.wait_for_service('spawn_model', timeout=20)
+        rospy.wait_for_service(f'{self.ns_prefix}move_model', timeout=20)
+        rospy.wait_for_service(f'{self.ns_prefix}delete_model', timeout=20)
+        rospy.wait_for_service(f'{self.ns_prefix}spawn_model', timeout=20)
         if is_training:
-            rospy.wait_for_service('step_world', timeout=20)
+            rospy.wait_for_service(f'{self.ns_prefix}step_world', timeout=20)
         # allow for persistent connections to services
         self._srv_move_model = rospy.ServiceProxy(
-            'move_model', MoveModel, persistent=True)
+            f'{self.ns_prefix}move_model', MoveModel, persistent=True)
         self._srv_delete_model = rospy.ServiceProxy(
-            'delete_model', DeleteModel, persistent=True)
+            f'{self.ns_prefix}delete_model', DeleteModel, persistent=True)
         self._srv_spawn_model = rospy.ServiceProxy(
-            'spawn_model', SpawnModel, persistent=True)
+            f'{self.ns_prefix}spawn_model', SpawnModel, persistent=True)
         # self._srv_sim_step = rospy.ServiceProxy('step_world', StepWorld, persistent=True)
 
         self.update_map(map_)
@@ -93,7 +96,7 @@ class ObstaclesManager:
                 spawn_request = SpawnModelRequest()
                 spawn_request.yaml_path = model_yaml_file_path
                 spawn_request.name = f'{name_prefix}_{instance_idx:02d}'
-                spawn_request.ns = rospy.get_namespace()
+                spawn_request.ns = self.ns if self.ns != "" else rospy.get_namespace()
                 # x, y, theta = get_random_pos_on_map(self._free_space_indices, self.map,)
                 # set the postion of the obstacle out of the map to hidden them
                 if len(start_pos) == 0:
@@ -249,11 +252,32 @@ class ObstaclesManager:
             active_obstacle_rate (float): a parameter change the number of the obstacles within the map
             forbidden_zones (list): a list of tuples with the format (x,y,r),where the the obstacles should not be reset.
         """
-        active_obstacle_names = random.sample(self.obstacle_name_list, int(
-            len(self.obstacle_name_list) * active_obstacle_rate))
-        non_active_obstacle_names = set(
-            self.obstacle_name_list) - set(active_obstacle_names)
+        self.move_obstacles(self.sample_pos_obstacles_random(active_obstacle_rate, forbidden_zones))
 
+    def sample_pos_obstacles_random(self, active_obstacle_rate: float = 1, forbidden_zones: Union[list, None] = None, rng=random) -> dict:
+        """sample the positions of reset_pos_obstacles_random() without moving the obstacles, e.g. to prepare the next
+        episode in the background (see LayoutPrefetcher).
+
+        Args:
+            active_obstacle_rate (float): a parameter change the number of the obstacles within the map
+            forbidden_zones (list): a list of tuples with the format (x,y,r),where the the obstacles should not be reset.
+            rng (random.Random): generator the positions are drawn from, defaults to the module random
+        Returns:
+            a dict {obstacle name: (x, y, theta)} of the active obstacles
+        """
+        # the obstacles and the map can be replaced in the meantime
+        obstacle_names, map_, free_space_indices = list(self.obstacle_name_list), self.map, self._free_space_indices
+        active_obstacle_names = rng.sample(obstacle_names, int(len(obstacle_names) * active_obstacle_rate))
+        # TODO 0.2 is the obstacle radius. it should be set automatically in future.
+        return {obstacle_name: get_random_pos_on_map(free_space_indices, map_, 0.2, forbidden_zones, rng=rng)
+                for obstacle_name in active_obstacle_names}
+
+    def move_obstacles(self, obstacle_poses: dict):
+        """move the obstacles to the given poses, all other obstacles are moved to the outside of the map
+
+        Args:
+            obstacle_poses (dict): {obstacle name: (x, y, theta)} of the active obstacles
+        """
         # non_active obstacles will be moved to outside of the map
         resolution = self.map.info.resolution
         pos_non_active_obstacle = Pose2D()
@@ -262,16 +286,13 @@ class ObstaclesManager:
         pos_non_active_obstacle.y = self.map.info.origin.position.y - \
             resolution * self.map.info.width
 
-        for obstacle_name in active_obstacle_names:
+        for obstacle_name, (x, y, theta) in obstacle_poses.items():
             move_model_request = MoveModelRequest()
             move_model_request.name = obstacle_name
-            # TODO 0.2 is the obstacle radius. it should be set automatically in future.
-            move_model_request.pose.x, move_model_request.pose.y, move_model_request.pose.theta = get_random_pos_on_map(
-                self._free_space_indices, self.map, 0.2, forbidden_zones)
-
+            move_model_request.pose.x, move_model_request.pose.y, move_model_request.pose.theta = x, y, theta
             self._srv_move_model(move_model_request)
 
-        for non_active_obstacle_name in non_active_obstacle_names:
+        for non_active_obstacle_name in set(self.obstacle_name_list) - set(obstacle_poses):
             move_model_request = MoveModelRequest()
             move_model_request.name = non_active_obstacle_name
             move_model_request.pose = pos_non_active_obstacle
@@ -332,7 +353,7 @@ class ObstaclesManager:
         move_with_traj['move_to_start_pos_topic'] = obstacle_name + \
             '/move_to_start_pos'
         move_to_start_pos_pub = rospy.Publisher(
-            move_with_traj['move_to_start_pos_topic'], Empty, queue_size=1)
+            self.ns_prefix + move_with_traj['move_to_start_pos_topic'], Empty, queue_size=1)
         move_with_traj['waypoints'] = waypoints
         move_with_traj['is_waypoint_relative'] = is_waypoint_relative
         move_with_traj['mode'] = mode
@@ -540,6 +561,8 @@ class ObstaclesManager:
             for t in topics:
                 # the format of the topic is (topic_name,message_name)
                 topic_name = t[0]
+                if not topic_name.startswith(self.ns_prefix):
+                    continue
                 object_name = topic_name.split("/")[-1]
                 if object_name.startswith(self._obstacle_name_prefix):
                     self.remove_obstacle(object_name)
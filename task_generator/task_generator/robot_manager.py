@@ -1,5 +1,6 @@
 # from math import ceil, sqrt
 import math
+import random
 import yaml
 import os
 import threading
@@ -21,22 +22,25 @@ class RobotManager:
     is managed
     """
 
-    def __init__(self, map_: OccupancyGrid, robot_yaml_path: str, is_training_mode: bool):
+    def __init__(self, map_: OccupancyGrid, robot_yaml_path: str, is_training_mode: bool, ns: str = ""):
         """[summary]
 
         Args:
             map_ (OccupancyGrid): the map info
             robot_yaml_path (str): the file name of the robot yaml file.
             is_training_mode (bool): a flag to indicate the mode (training or test)
+            ns (str, optional): namespace of the simulation the robot belongs to, e.g. "sim_1". Defaults to "".
         """
+        self.ns = ns
+        self.ns_prefix = "" if ns == "" else "/" + ns + "/"
         self.is_training_mode = is_training_mode
         self._get_robot_configration(robot_yaml_path)
         # setup proxy to handle  services provided by flatland
-        rospy.wait_for_service('move_model', timeout=20)
+        rospy.wait_for_service(f'{self.ns_prefix}move_model', timeout=20)
         #rospy.wait_for_service('step_world', timeout=20)
-        self._srv_move_model = rospy.ServiceProxy('move_model', MoveModel)
+        self._srv_move_model = rospy.ServiceProxy(f'{self.ns_prefix}move_model', MoveModel)
         # it's only needed in training mode to send the clock signal.
-        self._step_world = rospy.ServiceProxy("step_world", StepWorld)
+        self._step_world = rospy.ServiceProxy(f'{self.ns_prefix}step_world', StepWorld)
 
         # subcriber
         # self._global_path_sub = rospy.Subscriber(
@@ -49,7 +53,7 @@ class RobotManager:
         # self._initialpose_pub = rospy.Publisher(
         #     'initialpose', PoseWithCovarianceStamped, queue_size=1)
         self._goal_pub = rospy.Publisher(
-            '/goal', PoseStamped, queue_size=1, latch=True)
+            f'{self.ns_prefix}goal' if self.ns != "" else '/goal', PoseStamped, queue_size=1, latch=True)
 
         self.update_map(map_)
 
@@ -176,6 +180,33 @@ class RobotManager:
         else:
             return start_pos_, goal_pos_
 
+    def sample_start_pos_goal_pos(self, min_dist=1, max_try_times=20, rng=random):
+        """sample a random start position and goal position without moving the robot, e.g. to prepare the next
+        episode in the background (see LayoutPrefetcher).
+
+        Args:
+            min_dist (float): minimum distance between start_pos and goal_pos
+            max_try_times (int): number of samples until an exception is raised
+            rng (random.Random): generator the positions are drawn from, defaults to the module random
+        Exception:
+            rospy.ServiceException("can not generate a start position and a goal position of the robot")
+        Returns:
+            start_pos (Pose2D), goal_pos (Pose2D)
+        """
+        # the map can be replaced by update_map() in the meantime
+        map_, free_space_indices = self.map, self._free_space_indices
+        for _ in range(max_try_times):
+            start_pos = Pose2D()
+            start_pos.x, start_pos.y, start_pos.theta = get_random_pos_on_map(
+                free_space_indices, map_, self.ROBOT_RADIUS * 2, rng=rng)
+            goal_pos = Pose2D()
+            goal_pos.x, goal_pos.y, goal_pos.theta = get_random_pos_on_map(
+                free_space_indices, map_, self.ROBOT_RADIUS * 4, rng=rng)
+            if math.hypot(start_pos.x - goal_pos.x, start_pos.y - goal_pos.y) >= min_dist:
+                return start_pos, goal_pos
+        raise rospy.ServiceException(
+            "can not generate a start position and a goal position of the robot")
+
     def _validate_path(self):
         """ after publish the goal, the global planner should publish path. If it's not published within 0.1s, an exception will
         be raised.
@@ -0,0 +1,123 @@
+import copy
+import fcntl
+import json
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+# one store per file and process, so that all users share the cached state
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class RunStateStore:
+    """
+    State of a training run kept in a json file, e.g. the 'hyperparameters.json' of an agent, which is read and
+    updated by the training script, the staged task which persists the curriculum stage and the evaluation tools.
+
+    Updates are read-modify-write cycles under an exclusive lock (fcntl.flock on '<file>.lock'), so concurrent
+    writers in several processes don't lose each other's changes. The new content is written to a temporary file
+    which replaces the old one (os.replace), readers never see a half written file. Reads are served from memory
+    as long as the file hasn't changed.
+
+    Use get_run_state_store() instead of creating stores directly.
+
+    :param path: json file of the state
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cache = None
+        self._cache_key = None
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def read(self) -> dict:
+        """ current state, a copy which can be changed freely """
+        with self._lock:
+            return copy.deepcopy(self._read())
+
+    def write(self, state: dict):
+        """ replaces the whole state """
+        with self._locked():
+            self._write(state)
+
+    def modify(self, fn: Callable[[dict], None]) -> dict:
+        """ applies fn to the current state in place and writes the result, as one atomic update
+
+        :param fn: function changing the state dict, e.g. lambda state: state.update(curr_stage=2)
+        :return: the new state
+        """
+        with self._locked():
+            # the cache may be stale if another process wrote in the meantime, _read() checks that
+            state = copy.deepcopy(self._read())
+            fn(state)
+            self._write(state)
+            return copy.deepcopy(state)
+
+    def update(self, **changes) -> dict:
+        """ sets several entries in one update, e.g. store.update(curr_stage=2, n_timesteps=10000) """
+        return self.modify(lambda state: state.update(changes))
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            with open(self.path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self) -> dict:
+        file_stat = os.stat(self.path)
+        # os.replace gives every version of the file a new inode
+        key = (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size)
+        if key != self._cache_key:
+            with open(self.path, "r") as file:
+                self._cache = json.load(file)
+            self._cache_key = key
+        return self._cache
+
+    def _write(self, state: dict):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding='utf-8') as target:
+                # mkstemp creates the file with mode 0600, os.replace would carry it over to the state file
+                os.fchmod(target.fileno(), self._file_mode())
+                json.dump(state, target, ensure_ascii=False, indent=4)
+                target.flush()
+                os.fsync(target.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        file_stat = os.stat(self.path)
+        self._cache = copy.deepcopy(state)
+        self._cache_key = (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size)
+
+    def _file_mode(self) -> int:
+        """ mode of the existing state file, or the default mode of new files (0666 minus the umask) """
+        try:
+            return stat.S_IMODE(os.stat(self.path).st_mode)
+        except FileNotFoundError:
+            # the umask can only be read by setting it
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
+
+
+def get_run_state_store(path: str) -> RunStateStore:
+    """ the store of the json file at 'path', shared within the process """
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = RunStateStore(path)
+        return _stores[path]
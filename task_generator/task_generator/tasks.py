@@ -1,4 +1,5 @@
 import os
+import random
 from abc import ABC, abstractmethod
 from threading import Condition, Lock
 
@@ -10,10 +11,13 @@ import numpy as np
 from nav_msgs.msg import OccupancyGrid
 from nav_msgs.srv import GetMap
 from geometry_msgs.msg import Pose2D
+from std_msgs.msg import Bool
 from rospy.exceptions import ROSException
 
+from .layout_prefetcher import LayoutPrefetcher, TaskLayout
 from .obstacles_manager import ObstaclesManager
 from .robot_manager import RobotManager
+from .run_state_store import get_run_state_store
 from pathlib import Path
 
 
@@ -29,9 +33,14 @@ class ABSTask(ABC):
     def __init__(self, obstacles_manager: ObstaclesManager, robot_manager: RobotManager):
         self.obstacles_manager = obstacles_manager
         self.robot_manager = robot_manager
-        self._service_client_get_map = rospy.ServiceProxy("static_map", GetMap)
+        # all managers of one task live in the same simulation namespace
+        self.ns = robot_manager.ns
+        self.ns_prefix = robot_manager.ns_prefix
+        self._service_client_get_map = rospy.ServiceProxy(f"{self.ns_prefix}static_map", GetMap)
         self._map_lock = Lock()
-        rospy.Subscriber("map", OccupancyGrid, self._update_map)
+        # incremented whenever the map or the obstacles change, layouts sampled before are outdated
+        self._layout_version = 0
+        rospy.Subscriber(f"{self.ns_prefix}map", OccupancyGrid, self._update_map)
         # a mutex keep the map is not unchanged during reset task.
 
     @abstractmethod
@@ -40,18 +49,43 @@ class ABSTask(ABC):
         a funciton to reset the task. Make sure that _map_lock is used.
         """
 
+    def get_noise_config(self):
+        """
+        ranges the env samples the laser scan noise of the next episode from (see sample_noise_setting()
+        in arena_local_planner_drl/rl_agent/utils/noise.py). None keeps the noise the env was created with.
+        """
+        return None
+
+    def seed(self, seed: int):
+        """
+        seeds the random generator the task samples its episodes with, e.g. for reproducible evaluations
+        """
+        random.seed(seed)
+
     def _update_map(self, map_: OccupancyGrid):
         with self._map_lock:
             self.obstacles_manager.update_map(map_)
             self.robot_manager.update_map(map_)
+            self._layout_version += 1
 
 
 class RandomTask(ABSTask):
     """ Evertime the start position and end position of the robot is reset.
+    The layout of the next episode (start, goal and obstacle positions) is sampled in the background while the
+    current episode runs (see LayoutPrefetcher), reset() only moves the robot and the obstacles. The layouts are
+    drawn from a generator of the task, so the thread of the prefetcher doesn't share the module random.
     """
 
-    def __init__(self, obstacles_manager: ObstaclesManager, robot_manager: RobotManager):
+    def __init__(self, obstacles_manager: ObstaclesManager, robot_manager: RobotManager, prefetch_layouts: bool = True):
         super().__init__(obstacles_manager, robot_manager)
+        self._rng = random.Random()
+        self._layout_prefetcher = LayoutPrefetcher(self._sample_layout) if prefetch_layouts else None
+
+    def seed(self, seed: int):
+        if self._layout_prefetcher is not None:
+            # waits for the running sampling, the prefetched layout was drawn before the seed
+            self._layout_prefetcher.pop()
+        self._rng.seed(seed)
 
     def reset(self):
         """[summary]
@@ -61,21 +95,42 @@ class RandomTask(ABSTask):
             fail_times = 0
             while fail_times < max_fail_times:
                 try:
-                    start_pos, goal_pos = self.robot_manager.set_start_pos_goal_pos()
-                    self.obstacles_manager.reset_pos_obstacles_random(
-                        forbidden_zones=[
-                            (start_pos.x,
-                                start_pos.y,
-                                self.robot_manager.ROBOT_RADIUS),
-                            (goal_pos.x,
-                                goal_pos.y,
-                                self.robot_manager.ROBOT_RADIUS)])
+                    self._apply_layout(self._next_layout())
                     break
                 except rospy.ServiceException as e:
                     rospy.logwarn(repr(e))
                     fail_times += 1
             if fail_times == max_fail_times:
                 raise Exception("reset error!")
+            if self._layout_prefetcher is not None:
+                self._layout_prefetcher.prefetch()
+
+    def _next_layout(self) -> TaskLayout:
+        layout = self._layout_prefetcher.pop() if self._layout_prefetcher is not None else None
+        if layout is None or layout.version != self._layout_version:
+            # nothing prefetched or the map or the obstacles changed since
+            layout = self._sample_layout()
+        return layout
+
+    def _sample_layout(self) -> TaskLayout:
+        # runs in the thread of the prefetcher, it mustn't call any service of the simulation
+        version = self._layout_version
+        start_pos, goal_pos = self.robot_manager.sample_start_pos_goal_pos(rng=self._rng)
+        obstacle_poses = self.obstacles_manager.sample_pos_obstacles_random(
+            rng=self._rng,
+            forbidden_zones=[
+                (start_pos.x,
+                    start_pos.y,
+                    self.robot_manager.ROBOT_RADIUS),
+                (goal_pos.x,
+                    goal_pos.y,
+                    self.robot_manager.ROBOT_RADIUS)])
+        return TaskLayout(version, start_pos, goal_pos, obstacle_poses)
+
+    def _apply_layout(self, layout: TaskLayout):
+        self.robot_manager.move_robot(layout.start_pos)
+        self.robot_manager.publish_goal(layout.goal_pos.x, layout.goal_pos.y, layout.goal_pos.theta)
+        self.obstacles_manager.move_obstacles(layout.obstacle_poses)
 
 
 class ManualTask(ABSTask):
@@ -85,7 +140,7 @@ class ManualTask(ABSTask):
     def __init__(self, obstacles_manager: ObstaclesManager, robot_manager: RobotManager):
         super().__init__(obstacles_manager, robot_manager)
         # subscribe
-        rospy.Subscriber("manual_goal", Pose2D, self._set_goal_callback)
+        rospy.Subscriber(f"{self.ns_prefix}manual_goal", Pose2D, self._set_goal_callback)
         self._goal = Pose2D()
         self._new_goal_received = False
         self._manual_goal_con = Condition()
@@ -119,8 +174,17 @@ class ManualTask(ABSTask):
 
 
 class StagedRandomTask(RandomTask):
-    def __init__(self, obstacles_manager: ObstaclesManager, robot_manager: RobotManager, start_stage: int = 1, PATHS=None):
+    """ Random task following the training curriculum. The stage is advanced by messages on next_stage_topic. When
+    several simulations are trained in parallel, all tasks of the training listen on the same topic, so a single
+    message advances all of them. The topic is unique per training, trainings and evaluations sharing a ros master
+    don't advance each other. Tasks without a topic (e.g. of an evaluation) stay on their stage. Only the
+    task created with persist_stage=True writes the current stage to 'hyperparameters.json', so exactly one task
+    of a training should own the file.
+    """
+
+    def __init__(self, obstacles_manager: ObstaclesManager, robot_manager: RobotManager, start_stage: int = 1, PATHS=None, persist_stage: bool = False, next_stage_topic: str = None):
         super().__init__(obstacles_manager, robot_manager)
+        self._persist_stage = persist_stage
         if not isinstance(start_stage, int):
             raise ValueError("Given start_stage not an Integer!")
         self._curr_stage = start_stage
@@ -131,13 +195,28 @@ class StagedRandomTask(RandomTask):
             raise IndexError(
                 "Start stage given for training curriculum out of bounds! Has to be between {1 to %d}!" % len(self._stages))
         self._initiate_stage()
+        self._sub_next_stage = None
+        if next_stage_topic is not None:
+            self._sub_next_stage = rospy.Subscriber(
+                next_stage_topic, Bool, self._next_stage_callback)
 
     def next_stage(self):
         if self._curr_stage < len(self._stages):
             self._curr_stage += 1
-            self._update_curr_stage_json()
+            if self._persist_stage:
+                self._update_curr_stage_json()
             self._remove_obstacles()
             self._initiate_stage()
+            self._layout_version += 1
+
+    def get_noise_config(self):
+        # stages without a 'noise' entry keep the noise the env was created with
+        return self._stages[self._curr_stage].get('noise')
+
+    def _next_stage_callback(self, msg: Bool):
+        if msg.data:
+            with self._map_lock:
+                self.next_stage()
 
     def _initiate_stage(self):
         static_obstacles = self._stages[self._curr_stage]['static']
@@ -163,20 +242,13 @@ class StagedRandomTask(RandomTask):
                 "Couldn't find 'training_curriculum.yaml' in %s " % self._PATHS.get('curriculum'))
 
     def _update_curr_stage_json(self):
+        # the store shares the lock of 'hyperparameters.json' with the training script, which updates
+        # n_timesteps concurrently
         file_location = os.path.join(
             self._PATHS.get('model'), "hyperparameters.json")
-        if os.path.isfile(file_location):
-            with open(file_location, "r") as file:
-                hyperparams = json.load(file)
-            try:
-                hyperparams['curr_stage'] = self._curr_stage
-            except Exception:
-                raise Warning(
-                    "Parameter 'curr_stage' not found in 'hyperparameters.json'!")
-            else:
-                with open(file_location, "w", encoding='utf-8') as target:
-                    json.dump(hyperparams, target,
-                              ensure_ascii=False, indent=4)
+        store = get_run_state_store(file_location)
+        if store.exists():
+            store.update(curr_stage=self._curr_stage)
         else:
             raise Warning("File not found %s" % file_location)
 
@@ -331,15 +403,25 @@ class ScenerioTask(ABSTask):
         json.dump(json_data, dst_json_path_.open('w'), indent=4)
 
 
-def get_predefined_task(mode="random", start_stage: int = 1, PATHS: dict = None):
+def get_predefined_task(mode="random", start_stage: int = 1, PATHS: dict = None, ns: str = "", persist_stage: bool = False, next_stage_topic: str = None):
+    """
+    Args:
+        ns (str, optional): namespace of the simulation the task is created for, e.g. "sim_1" or "eval_sim"
+            when several simulations run in parallel. Defaults to "" (single simulation).
+        persist_stage (bool, optional): the staged task writes the current stage to 'hyperparameters.json'.
+            Set it for one task per training only. Defaults to False.
+        next_stage_topic (str, optional): topic the staged task receives the stage changes of its training on,
+            None for tasks which stay on their stage, e.g. for evaluations. Defaults to None.
+    """
 
     # TODO extend get_predefined_task(mode="string") such that user can choose between task, if mode is
+    ns_prefix = "" if ns == "" else "/" + ns + "/"
 
     # check is it on traininig mode or test mode. if it's on training mode
     # flatland will provide an service called 'step_world' to change the simulation time
     # otherwise it will be bounded to real time.
     try:
-        rospy.wait_for_service('step_world', timeout=0.5)
+        rospy.wait_for_service(f'{ns_prefix}step_world', timeout=0.5)
         TRAINING_MODE = True
     except ROSException:
         TRAINING_MODE = False
@@ -350,21 +432,21 @@ def get_predefined_task(mode="random", start_stage: int = 1, PATHS: dict = None)
         # the configuration including the map service.
         steps = 400
         step_world = rospy.ServiceProxy(
-            'step_world', StepWorld, persistent=True)
+            f'{ns_prefix}step_world', StepWorld, persistent=True)
         for _ in range(steps):
             step_world()
 
     # get the map
-    service_client_get_map = rospy.ServiceProxy("static_map", GetMap)
+    service_client_get_map = rospy.ServiceProxy(f"{ns_prefix}static_map", GetMap)
     map_response = service_client_get_map()
 
     # use rospkg to get the path where the model config yaml file stored
     models_folder_path = rospkg.RosPack().get_path('simulator_setup')
     # robot's yaml file is needed to get its radius.
     robot_manager = RobotManager(map_response.map, os.path.join(
-        models_folder_path, 'robot', "myrobot.model.yaml"), TRAINING_MODE)
+        models_folder_path, 'robot', "myrobot.model.yaml"), TRAINING_MODE, ns)
 
-    obstacles_manager = ObstaclesManager(map_response.map, TRAINING_MODE)
+    obstacles_manager = ObstaclesManager(map_response.map, TRAINING_MODE, ns)
     # only generate 3 static obstaticles
     # obstacles_manager.register_obstacles(3, os.path.join(
     # models_folder_path, "obstacles", 'random.model.yaml'), 'static')
@@ -384,7 +466,7 @@ def get_predefined_task(mode="random", start_stage: int = 1, PATHS: dict = None)
         print("manual tasks requested")
     if mode == "staged":
         task = StagedRandomTask(
-            obstacles_manager, robot_manager, start_stage, PATHS)
+            obstacles_manager, robot_manager, start_stage, PATHS, persist_stage, next_stage_topic)
     if mode == "ScenerioTask":
         task = ScenerioTask(obstacles_manager, robot_manager,
                             PATHS['scenerios_json_path'])
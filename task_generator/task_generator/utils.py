@@ -17,13 +17,14 @@ def generate_freespace_indices(map_: OccupancyGrid) -> tuple:
     return indices_y_x
 
 
-def get_random_pos_on_map(free_space_indices, map_: OccupancyGrid, safe_dist: float, forbidden_zones: list = None):
+def get_random_pos_on_map(free_space_indices, map_: OccupancyGrid, safe_dist: float, forbidden_zones: list = None, rng=random):
     """
     Args:
         indices_y_x(tuple): a 2 elementary tuple stores the indices of the non-occupied cells, the first element is the y-axis indices,
             the second element is the x-axis indices.
         map (OccupancyGrid): map proviced by the ros map service
         forbidden_zones (list of 3 elementary tuple(x,y,r)): a list of zones which is forbidden
+        rng (random.Random, optional): generator the position is drawn from. Defaults to the module random.
     Returns:
        x_in_meters,y_in_meters,theta
     """
@@ -66,7 +67,7 @@ def get_random_pos_on_map(free_space_indices, map_: OccupancyGrid, safe_dist: fl
     n_check_failed = 0
     x_in_meters, y_in_meters = None, None
     while not pos_valid:
-        idx = random.randint(0, n_freespace_cells)
+        idx = rng.randint(0, n_freespace_cells)
         # in cells
         y_in_cells, x_in_cells = free_space_indices[0][idx], free_space_indices[1][idx]
         # convert x, y in meters
@@ -79,6 +80,6 @@ def get_random_pos_on_map(free_space_indices, map_: OccupancyGrid, safe_dist: fl
                 raise Exception(
                     "cann't find any no-occupied space please check the map information")
         # in radius
-    theta = random.uniform(-math.pi, math.pi)
+    theta = rng.uniform(-math.pi, math.pi)
 
     return x_in_meters, y_in_meters, theta
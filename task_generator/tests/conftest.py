@@ -0,0 +1,10 @@
+import os
+import sys
+
+# the modules are imported by their full path from the repository root, like the DRL tools do
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+# script which needs a running ROS master, not a pytest test
+collect_ignore = ["test_task_generation.py"]
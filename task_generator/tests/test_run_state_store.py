@@ -0,0 +1,62 @@
+import json
+import multiprocessing as mp
+import os
+import stat
+
+from task_generator.task_generator.run_state_store import RunStateStore, get_run_state_store
+
+NUM_PROCESSES = 4
+NUM_INCREMENTS = 25
+
+
+def _increment(path: str):
+    store = get_run_state_store(path)
+    for _ in range(NUM_INCREMENTS):
+        store.modify(lambda state: state.update(counter=state["counter"] + 1))
+
+
+def test_concurrent_modify_loses_no_update(tmp_path):
+    path = str(tmp_path / "hyperparameters.json")
+    get_run_state_store(path).write({"counter": 0})
+
+    ctx = mp.get_context("spawn")
+    processes = [ctx.Process(target=_increment, args=(path,)) for _ in range(NUM_PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    assert RunStateStore(path).read() == {"counter": NUM_PROCESSES * NUM_INCREMENTS}
+    # the store of this process notices the changes of the others
+    assert get_run_state_store(path).read()["counter"] == NUM_PROCESSES * NUM_INCREMENTS
+    # no temporary files are left behind
+    assert sorted(os.listdir(tmp_path)) == ["hyperparameters.json", "hyperparameters.json.lock"]
+
+
+def test_update_keeps_other_entries(tmp_path):
+    path = str(tmp_path / "hyperparameters.json")
+    store = RunStateStore(path)
+    store.write({"curr_stage": 1, "n_timesteps": 0})
+    assert store.update(curr_stage=2) == {"curr_stage": 2, "n_timesteps": 0}
+    with open(path) as file:
+        assert json.load(file) == {"curr_stage": 2, "n_timesteps": 0}
+
+
+def test_write_keeps_the_file_mode(tmp_path):
+    path = str(tmp_path / "hyperparameters.json")
+    with open(path, "w") as file:
+        json.dump({}, file)
+    os.chmod(path, 0o640)
+    RunStateStore(path).update(curr_stage=2)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+
+
+def test_new_file_gets_the_default_mode(tmp_path):
+    path = str(tmp_path / "hyperparameters.json")
+    umask = os.umask(0o022)
+    try:
+        RunStateStore(path).write({})
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644